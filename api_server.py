@@ -5,53 +5,712 @@ Provides a web service interface to the node ranking engine.
 Supports JSON-based requests and responses for easy frontend integration.
 
 Usage:
-    python api_server.py
+    python api_server.py                      # development server
+    gunicorn -c gunicorn.conf.py wsgi:app     # production, multi-worker
 
 Then make POST requests to:
     http://localhost:5000/api/rank
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Hashable, Iterator, List, Optional, Tuple, Union
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+import cProfile
+import hashlib
+import hmac
+import json
+import math
 import os
+import pstats
+import threading
+import time
 
 from node_ranking_engine import (
     rank_nodes,
-    load_nodes_from_csv,
-    compute_final_weights
+    rank_nodes_batch,
+    rank_nodes_scenarios,
+    rank_movement_analytics,
+    rank_stability,
+    rank_data_uncertainty,
+    emissions_breakpoints,
+    build_component_index,
+    validate_dominance_k,
+    explain_rankings,
+    validate_custom_weights,
+    ComponentIndex,
+    compute_final_weights,
+    CancelToken,
+    DEFAULT_NOISE_MODELS,
+    DeadlineExceeded,
+    RankingCancelled,
+    VALID_LOAD_TYPES,
+    VALID_RESOURCE_CONFIGS,
+    WEIGHT_COMPONENTS
 )
 
+from node_store import NodeStore
+
+from disk_cache import CompactResults, DiskResultCache
+
+from server_metrics import METRICS, memory_usage
+
+from sweep_jobs import SweepJobManager, expand_sweep
+
 from api_wrapper import (
     rank_nodes_from_frontend_json,
-    format_response_for_frontend
+    format_response_for_frontend,
+    parse_frontend_json
 )
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend access
 
-# Global variable to cache node data
+# Global variable to cache node data (the current snapshot's DataFrame, see get_store)
 NODES_DF = None
 DATA_FILE = "final_csv_v1.csv"
 
+# Seconds between checks of DATA_FILE for changes (0 disables the watcher)
+DATA_FILE_WATCH_INTERVAL_S = float(os.environ.get("DATA_FILE_WATCH_INTERVAL_S", "0"))
+
+# Token required by admin endpoints in the X-Admin-Token header (unset = admin
+# endpoints disabled)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Time budget (seconds) for computing a ranking within a request (0 = none).
+# Clients can ask for less with the X-Request-Timeout header. Rankings stop at
+# the next stage boundary once the budget is spent and the request gets 504.
+REQUEST_TIMEOUT_S = float(os.environ.get("REQUEST_TIMEOUT_S", "60"))
+
+# Admission control (per worker process): ranking endpoints are split into an
+# interactive class (the UI's /api/submit) and a batch class (scripted
+# /api/rank callers), each with its own concurrency limit and bounded wait
+# queue. Requests beyond the queue get 429; requests that wait longer than
+# ADMISSION_QUEUE_TIMEOUT_S get 503. Both carry Retry-After. Waiting requests
+# hold a server thread, so keep each class's concurrency + queue below the
+# threads per worker (API_THREADS in gunicorn.conf.py). /api/submit and
+# /api/rank only take a slot around an actual ranking computation, so cache
+# hits and requests coalesced onto an identical in-flight ranking never queue.
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_INTERACTIVE_CONCURRENCY = int(os.environ.get("ADMISSION_INTERACTIVE_CONCURRENCY", "2"))
+ADMISSION_INTERACTIVE_QUEUE = int(os.environ.get("ADMISSION_INTERACTIVE_QUEUE", "4"))
+ADMISSION_BATCH_CONCURRENCY = int(os.environ.get("ADMISSION_BATCH_CONCURRENCY", "1"))
+ADMISSION_BATCH_QUEUE = int(os.environ.get("ADMISSION_BATCH_QUEUE", "2"))
+ADMISSION_QUEUE_TIMEOUT_S = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_S", "10"))
+
+# Priority class of each admission-controlled endpoint (others are never queued)
+ENDPOINT_CLASSES = {
+    "/api/submit": "interactive",
+    "/api/rank": "batch",
+    "/api/rank/batch": "batch",
+    "/api/rank/compare": "batch",
+    "/api/rank/stability": "batch",
+    "/api/rank/uncertainty": "batch",
+    "/api/rank/breakpoints": "batch",
+    "/api/rank/pareto": "batch",
+}
+
+# Endpoints admitted around their computation (admission_slot) rather than
+# for the whole request
+COMPUTE_ADMITTED_ENDPOINTS = {"/api/submit", "/api/rank"}
+
+# Maximum time (seconds) a request waits on an identical in-flight ranking
+# before falling back to computing its own result
+SINGLE_FLIGHT_TIMEOUT_S = float(os.environ.get("SINGLE_FLIGHT_TIMEOUT_S", "30"))
+
+# Streaming response formats for /api/rank, the largest top_n allowed when
+# streaming, and how many result rows are serialized per chunk
+STREAM_FORMATS = ["ndjson", "json"]
+MAX_STREAM_TOP_N = int(os.environ.get("MAX_STREAM_TOP_N", "1000000"))
+STREAM_CHUNK_ROWS = 256
+
+# Bounds for the cache of full rankings used for pagination
+RANKING_CACHE_MAX_ENTRIES = int(os.environ.get("RANKING_CACHE_MAX_ENTRIES", "64"))
+RANKING_CACHE_MAX_ROWS = int(os.environ.get("RANKING_CACHE_MAX_ROWS", "2000000"))
+
+# Bound on cached component indexes used for custom-weight rankings (also
+# bounded by RANKING_CACHE_MAX_ROWS)
+COMPONENT_INDEX_MAX_ENTRIES = int(os.environ.get("COMPONENT_INDEX_MAX_ENTRIES", "16"))
+
+# SQLite file for the persistent ranking result cache (unset = disabled), and
+# its size bound
+RESULT_CACHE_FILE = os.environ.get("RESULT_CACHE_FILE")
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Largest number of weight samples accepted by /api/rank/stability
+MAX_STABILITY_SAMPLES = int(os.environ.get("MAX_STABILITY_SAMPLES", "20000"))
+
+# Largest number of perturbed datasets accepted by /api/rank/uncertainty
+MAX_UNCERTAINTY_SAMPLES = int(os.environ.get("MAX_UNCERTAINTY_SAMPLES", "5000"))
+
+# Largest number of frontier nodes returned by /api/rank/pareto
+MAX_PARETO_RESULTS = int(os.environ.get("MAX_PARETO_RESULTS", "10000"))
+
+# Page size for /api/submit results
+SUBMIT_PAGE_SIZE = 200
+
+# Maximum number of ranking requests accepted by /api/rank/batch
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "1000"))
+
+# Ranking requests slower than SLOW_QUERY_THRESHOLD_S are appended to this
+# JSONL file (unset = no slow-query log); see load_test.py to replay them
+SLOW_QUERY_LOG_FILE = os.environ.get("SLOW_QUERY_LOG_FILE")
+SLOW_QUERY_THRESHOLD_S = float(os.environ.get("SLOW_QUERY_THRESHOLD_S", "1.0"))
+
+# Precompute common rankings after loading data (see run_warmup); /api/ready
+# reports ready only once warm-up has finished. State sets that are frequent
+# in WARMUP_LOG_FILE (slow-query log format) are warmed too.
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "1") == "1"
+WARMUP_LOG_FILE = os.environ.get("WARMUP_LOG_FILE", SLOW_QUERY_LOG_FILE)
+WARMUP_TOP_STATE_SETS = int(os.environ.get("WARMUP_TOP_STATE_SETS", "20"))
+WARMUP_LOAD_SIZE_MW = 100
+WARMUP_EMISSIONS_PREFERENCE = 50
+
+# Directory for background sweep jobs (/api/jobs), worker processes per job
+# and the largest sweep accepted
+JOB_DIR = os.environ.get("JOB_DIR", "jobs")
+JOB_POOL_WORKERS = int(os.environ.get("JOB_POOL_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_JOB_RANKINGS = int(os.environ.get("MAX_JOB_RANKINGS", "100000"))
+
+# Allow ?profile=1 on any endpoint, and how many functions a profile lists
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILE_TOP_N = int(os.environ.get("PROFILE_TOP_N", "30"))
+
+
+# ============================================================================
+# REQUEST COALESCING
+# ============================================================================
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single computation.
+    
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait for the leader and receive the same
+    result (or exception). Waiters that exceed their timeout fall back to
+    running the function themselves, as do waiters whose leader's ranking
+    was cancelled (its deadline isn't theirs).
+    """
+    
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, "SingleFlight._Call"] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "timeouts": 0}
+    
+    def do(self, key: Hashable, fn: Callable[[], Any],
+           timeout: float = None) -> Tuple[Any, bool]:
+        """
+        Runs fn once per key among concurrent callers.
+        
+        Args:
+            key: Canonical request key
+            fn: Zero-argument function computing the result
+            timeout: Maximum seconds to wait on an in-flight call (None = forever)
+        
+        Returns:
+            (result, shared) where shared is True if the result came from
+            another caller's computation
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = SingleFlight._Call()
+                self._calls[key] = call
+                self.stats["leaders"] += 1
+        
+        if is_leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+        
+        if not call.done.wait(timeout):
+            # Leader is taking too long - compute independently
+            with self._lock:
+                self.stats["timeouts"] += 1
+            return fn(), False
+        
+        if isinstance(call.error, RankingCancelled):
+            return fn(), False
+        
+        with self._lock:
+            self.stats["coalesced"] += 1
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+    
+    def in_flight(self) -> int:
+        """Number of distinct computations currently running."""
+        return len(self._calls)
+
+
+RANKING_FLIGHTS = SingleFlight()
+
+
+def canonical_request_key(endpoint: str, params: Dict[str, Any]) -> str:
+    """
+    Builds a canonical key for a ranking request.
+    
+    Keys are stable under dict ordering so semantically identical
+    requests from different clients map to the same key.
+    """
+    return endpoint + ":" + json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def canonical_submit_params(frontend_json: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduces a frontend submission to the parameters that affect its result.
+    
+    State lists are sorted (the filter is order-independent) while points keep
+    their order and IDs since both appear in the response.
+    """
+    params = parse_frontend_json(frontend_json)
+    location = frontend_json.get("location", {})
+    mode = location.get("mode", "states")
+    
+    if params["location_filter"] and "states" in params["location_filter"]:
+        params["location_filter"] = {"states": sorted(set(params["location_filter"]["states"]))}
+    
+    params["mode"] = mode
+    if mode == "points":
+        params["points"] = [
+            [p.get("id"), float(p["lat"]), float(p["lng"])]
+            for p in location.get("selectedPoints", [])
+        ]
+    return params
+
+
+# ============================================================================
+# RANKING CACHE AND PAGINATION
+# ============================================================================
+
+class RankingCache:
+    """
+    Bounded LRU cache of full rankings, keyed by ranking ID.
+    
+    Each entry holds the complete ranking (already sorted) as CompactResults:
+    snapshot row positions plus the score and rank columns. Any page is an
+    O(page size) gather with no recomputation. The cache is bounded both by
+    entry count and by total cached rows.
+    """
+    
+    def __init__(self, max_entries: int, max_rows: int):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._rows = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+    
+    def get(self, ranking_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(ranking_id)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(ranking_id)
+            self.stats["hits"] += 1
+            return entry
+    
+    def put(self, ranking_id: str, entry: Dict[str, Any]):
+        rows = len(entry["results"])
+        with self._lock:
+            old = self._entries.pop(ranking_id, None)
+            if old is not None:
+                self._rows -= len(old["results"])
+            self._entries[ranking_id] = entry
+            self._rows += rows
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self._rows > self.max_rows
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= len(evicted["results"])
+                self.stats["evictions"] += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @property
+    def rows(self) -> int:
+        """Total result rows held across all entries."""
+        return self._rows
+
+
+RANKING_CACHE = RankingCache(RANKING_CACHE_MAX_ENTRIES, RANKING_CACHE_MAX_ROWS)
+
+# Component indexes for custom weights; entries hold "index" and, for the row
+# bound, "results" (the indexed nodes)
+COMPONENT_INDEX_CACHE = RankingCache(COMPONENT_INDEX_MAX_ENTRIES, RANKING_CACHE_MAX_ROWS)
+
+# Optional persistent cache shared by all workers on the host
+DISK_CACHE = DiskResultCache(RESULT_CACHE_FILE, RESULT_CACHE_MAX_BYTES) if RESULT_CACHE_FILE else None
+
+
+def get_full_ranking(kind: str, key_params: Dict[str, Any],
+                     compute: Callable[[Dict], pd.DataFrame], store: NodeStore) -> Dict[str, Any]:
+    """
+    Returns the cached full ranking for a request, computing it on a miss.
+    
+    Looks in RANKING_CACHE, then in DISK_CACHE (if enabled), then computes.
+    Concurrent misses for the same ranking share one lookup/computation, and
+    only that computation takes an admission slot (see admission_slot).
+    
+    Args:
+        kind: "rank" or "submit" (selects the response format for pages)
+        key_params: Canonical parameters identifying the ranking (excluding page size)
+        compute: Function returning the full ranked DataFrame, given a dict
+                 to fill with rank_nodes stage stats. Its rows must come from
+                 store.nodes_df; it may include only the 'node' column of the
+                 original columns (see rank_nodes(columns=...))
+        store: Dataset snapshot the ranking is computed on (its version is
+               part of the key)
+    
+    Returns:
+        Cache entry with "ranking_id", "kind", "version", "results" (full
+        ranking as CompactResults; gather pages with results.rows()) and
+        "stats" (stage timings and row counts)
+    """
+    version = store.version
+    key = canonical_request_key(kind, dict(key_params, dataset_version=version))
+    ranking_id = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    
+    # Profiled requests always compute, so the profile shows the ranking itself
+    in_request = has_request_context()
+    profiling = in_request and g.get("profiler") is not None
+    
+    from_disk = []
+    
+    def compute_entry():
+        cached = DISK_CACHE.get(key, store) if DISK_CACHE is not None and not profiling else None
+        if cached is not None:
+            results, stats = cached
+            from_disk.append(True)
+        else:
+            stats = {}
+            with admission_slot():
+                results = CompactResults.from_frame(compute(stats), store)
+            for stage, seconds in stats.get("timings", {}).items():
+                METRICS.observe("rank_stage_duration_seconds", seconds, {"stage": stage})
+            if DISK_CACHE is not None:
+                DISK_CACHE.put(key, results, stats)
+        entry = {"ranking_id": ranking_id, "kind": kind, "version": version,
+                 "results": results, "stats": stats}
+        RANKING_CACHE.put(ranking_id, entry)
+        return entry
+    
+    entry = None if profiling else RANKING_CACHE.get(ranking_id)
+    computed = entry is None
+    if profiling:
+        entry = compute_entry()
+    elif entry is None:
+        # Stop waiting on another request's computation at our own deadline
+        cancel = request_cancel_token()
+        remaining = cancel.remaining() if cancel is not None else None
+        timeout = SINGLE_FLIGHT_TIMEOUT_S if remaining is None else min(SINGLE_FLIGHT_TIMEOUT_S, remaining)
+        entry, shared = RANKING_FLIGHTS.do(key, compute_entry, timeout=timeout)
+        computed = not shared and not from_disk
+    
+    if in_request:
+        # Details for the slow-query log
+        g.ranking = {"params": key_params, "entry": entry, "computed": computed}
+    return entry
+
+
+def get_rank_entry(store: NodeStore, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the full ranking for /api/rank parameters (see parse_rank_params).
+    
+    Args:
+        store: Dataset snapshot to rank
+        params: Parsed request parameters (top_n is ignored)
+    
+    Returns:
+        Cache entry (see get_full_ranking)
+    """
+    ranking_params = {k: v for k, v in params.items() if k != "top_n"}
+    column_bounds = store.column_bounds() if params["location_filter"] is None else None
+    return get_full_ranking(
+        "rank", ranking_params,
+        lambda stats: rank_nodes(nodes_df=store.nodes_df, top_n=None, column_bounds=column_bounds,
+                                 stats=stats, cancel=request_cancel_token(),
+                                 columns=ranked_columns(store), **ranking_params),
+        store
+    )
+
+
+def ranked_columns(store: NodeStore) -> Optional[List[str]]:
+    """
+    Original columns full rankings need to copy: just 'node' when rows can be
+    gathered from the snapshot by node ID (see CompactResults), else all.
+    """
+    return ["node"] if store.nodes_unique() else None
+
+
+def get_entry_analytics(entry: Dict[str, Any], top_n: int) -> Dict[str, Any]:
+    """
+    Rank movement analytics for a cached full ranking, memoized per top_n.
+    
+    Args:
+        entry: Cache entry (see get_full_ranking)
+        top_n: Size of the top sets compared for overlap
+    
+    Returns:
+        See rank_movement_analytics
+    """
+    memo = entry.setdefault("analytics", {})
+    if top_n not in memo:
+        results = entry["results"]
+        nodes = pd.DataFrame({"node": results.column("node"), "state": results.column("state")})
+        memo[top_n] = rank_movement_analytics(
+            nodes, results.column("rank_baseline"), results.column("rank_scenario"), top_n
+        )
+    return memo[top_n]
+
+
+def get_component_index(store: NodeStore, params: Dict[str, Any]) -> ComponentIndex:
+    """
+    Returns the component index for /api/rank parameters, building it on a miss.
+    
+    The index only depends on the filter, load_type and resource_config, so
+    it is shared by every custom weight vector (and load size and emissions
+    preference) for that node set.
+    
+    Args:
+        store: Dataset snapshot to index
+        params: Parsed request parameters (see parse_rank_params)
+    
+    Returns:
+        ComponentIndex
+    """
+    index_params = {k: params[k] for k in ("load_type", "resource_config", "location_filter")}
+    key = canonical_request_key("index", dict(index_params, dataset_version=store.version))
+    entry = COMPONENT_INDEX_CACHE.get(key)
+    if entry is None:
+        column_bounds = store.column_bounds() if params["location_filter"] is None else None
+        
+        def build():
+            stats = {}
+            with admission_slot():
+                index = build_component_index(nodes_df=store.nodes_df, column_bounds=column_bounds,
+                                              stats=stats, cancel=request_cancel_token(), **index_params)
+            built = {"index": index, "results": index.components_df, "stats": stats}
+            COMPONENT_INDEX_CACHE.put(key, built)
+            return built
+        
+        cancel = request_cancel_token()
+        remaining = cancel.remaining() if cancel is not None else None
+        timeout = SINGLE_FLIGHT_TIMEOUT_S if remaining is None else min(SINGLE_FLIGHT_TIMEOUT_S, remaining)
+        entry, _ = RANKING_FLIGHTS.do(key, build, timeout=timeout)
+    return entry["index"]
+
+
+def get_submit_entry(store: NodeStore, frontend_json: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the full ranking for an /api/submit frontend payload.
+    
+    Args:
+        store: Dataset snapshot to rank
+        frontend_json: Frontend request (loadConfig and location)
+    
+    Returns:
+        Cache entry (see get_full_ranking)
+    """
+    return get_full_ranking(
+        "submit", canonical_submit_params(frontend_json),
+        lambda stats: rank_nodes_from_frontend_json(frontend_json, nodes_df=store.nodes_df,
+                                                    top_n=None, stats=stats,
+                                                    cancel=request_cancel_token(),
+                                                    columns=ranked_columns(store)),
+        store
+    )
+
+
+def make_cursor(ranking_id: str, offset: int, limit: int) -> str:
+    """Encodes a page position within a cached ranking."""
+    return f"{ranking_id}.{offset}.{limit}"
+
+
+def parse_cursor(cursor: str) -> Tuple[str, int, int]:
+    """Decodes a cursor into (ranking_id, offset, limit); raises ValueError if malformed."""
+    ranking_id, offset, limit = cursor.split(".")
+    return ranking_id, int(offset), int(limit)
+
+
+def next_cursor(entry: Dict[str, Any], offset: int, limit: int) -> Optional[str]:
+    """Returns the cursor for the page after [offset, offset + limit), or None at the end."""
+    if offset + limit >= len(entry["results"]):
+        return None
+    return make_cursor(entry["ranking_id"], offset + limit, limit)
+
+
+# ============================================================================
+# DATASET SNAPSHOTS AND HOT RELOAD
+# ============================================================================
+
+_STORE: Optional[NodeStore] = None
+_STORE_LOCK = threading.Lock()
+_RELOAD_LOCK = threading.Lock()
+_WATCHER_PID = None
+
+
+def get_store() -> NodeStore:
+    """
+    Returns the current dataset snapshot, loading it on first use.
+    
+    Request handlers should call this once and use the returned snapshot
+    throughout, so a concurrent reload never changes data mid-request.
+    """
+    global _STORE, NODES_DF
+    store = _STORE
+    if store is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                print(f"Loading node data from {DATA_FILE}...")
+                _STORE = NodeStore.from_csv(DATA_FILE)
+                NODES_DF = _STORE.nodes_df
+                print(f"Loaded {len(NODES_DF)} nodes (dataset version {_STORE.version})")
+            store = _STORE
+    start_data_watcher()
+    return store
+
 
 def load_data():
     """Load node data into memory on startup."""
-    global NODES_DF
-    if NODES_DF is None:
-        print(f"Loading node data from {DATA_FILE}...")
-        NODES_DF = load_nodes_from_csv(DATA_FILE)
-        print(f"Loaded {len(NODES_DF)} nodes")
-    return NODES_DF
+    return get_store().nodes_df
+
+
+def reload_data() -> NodeStore:
+    """
+    Builds a new snapshot from DATA_FILE and swaps it in atomically.
+    
+    The new snapshot is fully prepared before the swap; requests already
+    running keep the snapshot they started with. Caches are keyed by dataset
+    version, so entries for the old version are never served for the new one.
+    
+    Returns:
+        The current snapshot after the reload
+    """
+    global _STORE, NODES_DF
+    with _RELOAD_LOCK:
+        new_store = NodeStore.from_csv(DATA_FILE)
+        with _STORE_LOCK:
+            old_version = _STORE.version if _STORE is not None else None
+            _STORE = new_store
+            NODES_DF = new_store.nodes_df
+        if old_version != new_store.version:
+            print(f"Reloaded {len(new_store)} nodes: dataset version {old_version} -> {new_store.version}")
+            start_warmup(new_store)
+        return new_store
+
+
+def patch_data(updates) -> NodeStore:
+    """
+    Applies node column updates (see NodeStore.patch) and swaps in the result.
+    
+    Patches are serialized with reloads, so none is lost to a concurrent swap.
+    A later reload of DATA_FILE replaces all patched values.
+    
+    Args:
+        updates: List of {"node": ..., <column>: <value>, ...} dicts
+    
+    Returns:
+        The patched snapshot
+    """
+    global _STORE, NODES_DF
+    with _RELOAD_LOCK:
+        new_store = get_store().patch(updates)
+        with _STORE_LOCK:
+            _STORE = new_store
+            NODES_DF = new_store.nodes_df
+        return new_store
+
+
+def reload_data_async() -> bool:
+    """
+    Starts reload_data() in a background thread.
+    
+    Returns:
+        False if a reload is already in progress
+    """
+    if _RELOAD_LOCK.locked():
+        return False
+    
+    def run():
+        try:
+            reload_data()
+        except Exception:
+            import traceback
+            traceback.print_exc()
+    
+    threading.Thread(target=run, name="dataset-reload", daemon=True).start()
+    return True
+
+
+def start_data_watcher():
+    """
+    Starts a thread that reloads the dataset when DATA_FILE changes.
+    
+    Polls the file's modification time every DATA_FILE_WATCH_INTERVAL_S
+    seconds (disabled when 0). Replacing the file atomically (write to a
+    temporary file, then rename) is still recommended. Threads do not
+    survive fork, so this runs once per process (each pre-forked worker
+    starts its own watcher).
+    """
+    global _WATCHER_PID
+    if DATA_FILE_WATCH_INTERVAL_S <= 0 or _WATCHER_PID == os.getpid():
+        return
+    _WATCHER_PID = os.getpid()
+    
+    def watch():
+        last_seen = None
+        while True:
+            time.sleep(DATA_FILE_WATCH_INTERVAL_S)
+            try:
+                store = _STORE
+                mtime = os.path.getmtime(DATA_FILE)
+                # Only reload once the modification time has been stable for a
+                # full interval, so a file still being written is never loaded
+                if store is not None and mtime != store.source_mtime and mtime == last_seen:
+                    reload_data()
+                last_seen = mtime
+            except Exception:
+                import traceback
+                traceback.print_exc()
+    
+    threading.Thread(target=watch, name="dataset-watcher", daemon=True).start()
 
 
-def validate_request(data: Dict[str, Any]) -> tuple[bool, str]:
+def validate_request(data: Dict[str, Any], max_top_n: int = 1000) -> tuple[bool, str]:
     """
     Validates API request parameters.
     
+    Args:
+        data: Request body
+        max_top_n: Largest accepted top_n (streamed responses allow more)
+    
     Returns:
         (is_valid, error_message)
     """
@@ -114,189 +773,1739 @@ def validate_request(data: Dict[str, Any]) -> tuple[bool, str]:
         else:
             return False, "location_filter must have 'states' or 'lat'/'lon'/'radius_km'"
     
-    # Validate top_n if provided
-    if "top_n" in data:
+    # Validate top_n if provided
+    if "top_n" in data:
+        try:
+            top_n = int(data["top_n"])
+            if top_n < 1 or top_n > max_top_n:
+                return False, f"top_n must be between 1 and {max_top_n}"
+        except (ValueError, TypeError):
+            return False, "top_n must be an integer"
+    
+    return True, ""
+
+
+def _column_values(df: pd.DataFrame, column: str) -> list:
+    """Returns a column as a Python list with NaN replaced by None (None if missing)."""
+    if column not in df.columns:
+        return [None] * len(df)
+    return [None if isinstance(v, float) and v != v else v for v in df[column].tolist()]
+
+
+# Result columns read by iter_formatted_results (and explain_rankings)
+FORMATTED_COLUMNS = [
+    "node", "state", "iso", "county_state_pairs", "latitude", "longitude",
+    "score_baseline", "score_scenario", "rank_baseline", "rank_scenario",
+    "cost_score", "land_score", "emissions_score", "policy_score", "queue_score",
+    "price_variability_penalty_score", "effective_price_variability_penalty_score",
+    "avg_lmp", "avg_price_per_acre", "county_emissions_intensity_kg_per_mwh",
+    "queue_pending_mw"
+]
+
+
+def iter_formatted_results(df: Union[pd.DataFrame, CompactResults], chunk_size: int = 1000,
+                           explain_weights: Optional[Dict[str, float]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields ranking results formatted for JSON responses, one dict per row.
+    
+    Rows are formatted chunk_size at a time straight from the column arrays,
+    so memory held for formatting stays bounded regardless of result size.
+    CompactResults are gathered from the snapshot one chunk at a time.
+    With explain_weights, each row also gets "contributions" (weight x
+    component score per factor) and "explanation", computed per chunk by
+    explain_rankings().
+    """
+    def rounded(value, digits):
+        return round(value, digits) if value is not None else None
+    
+    for start in range(0, len(df), chunk_size):
+        if isinstance(df, CompactResults):
+            chunk = df.rows(start, start + chunk_size, columns=FORMATTED_COLUMNS)
+        else:
+            chunk = df.iloc[start:start + chunk_size]
+        col = {c: _column_values(chunk, c) for c in FORMATTED_COLUMNS}
+        if explain_weights is not None:
+            explained = explain_rankings(chunk, explain_weights)
+            contributions = {c: explained[f"{c}_contribution"].tolist() for c in WEIGHT_COMPONENTS}
+            explanations = explained["explanation"].tolist()
+            top_factors = explained["top_factors"].tolist()
+        
+        for i in range(len(chunk)):
+            record = {
+                # Node identification
+                "node": col["node"][i],
+                "state": col["state"][i],
+                "iso": col["iso"][i],
+                "county_state_pairs": col["county_state_pairs"][i],
+                "latitude": rounded(col["latitude"][i], 6),
+                "longitude": rounded(col["longitude"][i], 6),
+                
+                # Scores and ranks
+                "score_baseline": round(col["score_baseline"][i], 4),
+                "score_scenario": round(col["score_scenario"][i], 4),
+                "rank_baseline": int(col["rank_baseline"][i]) if col["rank_baseline"][i] is not None else None,
+                "rank_scenario": int(col["rank_scenario"][i]),
+                
+                # Component scores
+                "component_scores": {
+                    "cost": round(col["cost_score"][i], 3),
+                    "land": round(col["land_score"][i], 3),
+                    "emissions": round(col["emissions_score"][i], 3),
+                    "policy": round(col["policy_score"][i], 3),
+                    "queue": round(col["queue_score"][i], 3),
+                    "variability_baseline": round(col["price_variability_penalty_score"][i], 3),
+                    "variability_scenario": round(col["effective_price_variability_penalty_score"][i], 3),
+                },
+                
+                # Raw metrics (for display/explanation)
+                "raw_metrics": {
+                    "avg_lmp": rounded(col["avg_lmp"][i], 2),
+                    "avg_price_per_acre": rounded(col["avg_price_per_acre"][i], 0),
+                    "emissions_intensity": rounded(col["county_emissions_intensity_kg_per_mwh"][i], 1),
+                    "queue_pending_mw": rounded(col["queue_pending_mw"][i], 1),
+                }
+            }
+            if explain_weights is not None:
+                record["contributions"] = {c: round(contributions[c][i], 4) for c in WEIGHT_COMPONENTS}
+                record["top_factors"] = top_factors[i]
+                record["explanation"] = explanations[i]
+            yield record
+
+
+def format_results(df: Union[pd.DataFrame, CompactResults], explain_weights: Optional[Dict[str, float]] = None) -> list:
+    """
+    Formats ranking results for JSON response.
+    
+    Converts DataFrame to list of dicts with clean formatting (plus
+    explanations with explain_weights, see iter_formatted_results()).
+    """
+    return list(iter_formatted_results(df, explain_weights=explain_weights))
+
+
+def format_stability_rows(results: pd.DataFrame) -> list:
+    """
+    Formats rank_stability() / rank_data_uncertainty() results for JSON response.
+    """
+    rows = []
+    for row in results.to_dict(orient="records"):
+        for key in ("score_scenario", "top_n_probability", "rank_mean", "rank_std",
+                    "rank_p5", "rank_p50", "rank_p95"):
+            row[key] = round(row[key], 4)
+        rows.append(row)
+    return rows
+
+
+def format_frontier_rows(df: pd.DataFrame) -> list:
+    """
+    Formats pareto_frontier() results for JSON response.
+    """
+    col = {c: _column_values(df, c) for c in [
+        "node", "state", "iso", "latitude", "longitude", "cost_score", "land_score",
+        "emissions_score", "policy_score", "queue_score", "effective_price_variability_penalty_score"
+    ]}
+    return [{
+        "node": col["node"][i],
+        "state": col["state"][i],
+        "iso": col["iso"][i],
+        "latitude": round(col["latitude"][i], 6) if col["latitude"][i] is not None else None,
+        "longitude": round(col["longitude"][i], 6) if col["longitude"][i] is not None else None,
+        "component_scores": {
+            "cost": round(col["cost_score"][i], 3),
+            "land": round(col["land_score"][i], 3),
+            "emissions": round(col["emissions_score"][i], 3),
+            "policy": round(col["policy_score"][i], 3),
+            "queue": round(col["queue_score"][i], 3),
+            "variability": round(col["effective_price_variability_penalty_score"][i], 3),
+        }
+    } for i in range(len(df))]
+
+
+def parse_rank_params(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extracts rank_nodes() keyword arguments from a validated /api/rank request.
+    """
+    return {
+        "load_type": data["load_type"],
+        "load_size_mw": float(data["load_size_mw"]),
+        "emissions_preference": float(data["emissions_preference"]),
+        "resource_config": data["resource_config"],
+        "location_filter": data.get("location_filter"),
+        "top_n": int(data.get("top_n", 200))
+    }
+
+
+def build_rank_response(params: Dict[str, Any], weights: Dict[str, float],
+                        results_list: list) -> Dict[str, Any]:
+    """
+    Builds the /api/rank response body for a successful ranking.
+    """
+    return {
+        "success": True,
+        "num_results": len(results_list),
+        "parameters": dict(params),
+        "weights": {k: round(v, 4) for k, v in weights.items()},
+        "results": results_list
+    }
+
+
+# ============================================================================
+# BACKGROUND SWEEP JOBS
+# ============================================================================
+
+_JOBS_LOCK = threading.Lock()
+_JOB_MANAGER = None
+
+
+def get_job_manager() -> SweepJobManager:
+    """Returns the sweep job manager, creating JOB_DIR on first use."""
+    global _JOB_MANAGER
+    with _JOBS_LOCK:
+        if _JOB_MANAGER is None:
+            os.makedirs(JOB_DIR, exist_ok=True)
+            _JOB_MANAGER = SweepJobManager(JOB_DIR, JOB_POOL_WORKERS)
+        return _JOB_MANAGER
+
+
+def job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds progress and links to a job status for API responses."""
+    job = {k: v for k, v in job.items() if k != "pid"}
+    total = job["total_rankings"]
+    job["progress"] = round(job["completed_rankings"] / total, 4) if total else 1.0
+    job["status_url"] = f"/api/jobs/{job['job_id']}"
+    if job["status"] == "done":
+        job["results_url"] = f"/api/jobs/{job['job_id']}/results"
+    return job
+
+
+# ============================================================================
+# STARTUP WARM-UP
+# ============================================================================
+
+# _WARMUP_LOCK guards _WARMUP; _WARMUP_RUN_LOCK lets one warm-up run at a time
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_RUN_LOCK = threading.Lock()
+_WARMUP: Dict[str, Any] = {
+    "status": "pending",    # pending | running | done
+    "version": None,        # dataset version being (or last) warmed
+    "completed": 0,
+    "failed": 0,
+    "total": 0,
+    "seconds": None,
+    "ready": False          # True once the first warm-up has finished
+}
+
+
+def warmup_requests(log_file: Optional[str],
+                    top_state_sets: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Lists the requests to precompute at startup.
+    
+    Includes every load type x resource config at the default size and
+    emissions preference, plus, for each of the top_state_sets most frequent
+    state sets in log_file, that state set's most frequent request.
+    
+    Args:
+        log_file: JSONL request log (slow-query log format), or None
+        top_state_sets: Number of state sets to take from the log
+    
+    Returns:
+        List of ("rank", /api/rank body) or ("submit", frontend payload)
+    """
+    requests_list = [
+        ("rank", {
+            "load_type": load_type,
+            "load_size_mw": WARMUP_LOAD_SIZE_MW,
+            "emissions_preference": WARMUP_EMISSIONS_PREFERENCE,
+            "resource_config": resource_config,
+            "location_filter": None
+        })
+        for load_type in VALID_LOAD_TYPES
+        for resource_config in VALID_RESOURCE_CONFIGS
+    ]
+    if not log_file or not os.path.exists(log_file) or top_state_sets <= 0:
+        return requests_list
+    
+    state_set_counts = Counter()
+    request_counts: Dict[Tuple[str, ...], Counter] = {}
+    payloads = {}
+    with open(log_file) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                payload = record["payload"]
+                if record["endpoint"] == "/api/rank":
+                    kind, params = "rank", parse_rank_params(payload)
+                    params.pop("top_n")
+                elif record["endpoint"] == "/api/submit":
+                    kind, params = "submit", canonical_submit_params(payload)
+                else:
+                    continue
+                states = (params["location_filter"] or {}).get("states")
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+            if not states:
+                continue
+            
+            state_set = tuple(sorted(set(states)))
+            key = canonical_request_key(kind, params)
+            state_set_counts[state_set] += 1
+            request_counts.setdefault(state_set, Counter())[key] += 1
+            payloads[key] = (kind, payload)
+    
+    for state_set, _ in state_set_counts.most_common(top_state_sets):
+        key, _ = request_counts[state_set].most_common(1)[0]
+        requests_list.append(payloads[key])
+    return requests_list
+
+
+def run_warmup(store: NodeStore) -> Dict[str, Any]:
+    """
+    Precomputes the warm-up rankings for a snapshot into the ranking cache.
+    
+    Also exercises the pandas/NumPy code paths before real traffic arrives.
+    Failures are counted, not raised: warm-up is only an optimization.
+    
+    Args:
+        store: Snapshot to warm
+    
+    Returns:
+        Warm-up status (see _WARMUP)
+    """
+    with _WARMUP_RUN_LOCK:
+        start = time.perf_counter()
+        requests_list = warmup_requests(WARMUP_LOG_FILE, WARMUP_TOP_STATE_SETS)
+        with _WARMUP_LOCK:
+            _WARMUP.update(status="running", version=store.version, completed=0, failed=0,
+                           total=len(requests_list), seconds=None)
+        print(f"Warming up {len(requests_list)} rankings for dataset version {store.version}...")
+        
+        for kind, payload in requests_list:
+            try:
+                if kind == "rank":
+                    get_rank_entry(store, parse_rank_params(payload))
+                else:
+                    get_submit_entry(store, payload)
+                outcome = "completed"
+            except Exception as e:
+                print(f"Warm-up request failed ({kind}): {e}")
+                outcome = "failed"
+            with _WARMUP_LOCK:
+                _WARMUP[outcome] += 1
+        
+        with _WARMUP_LOCK:
+            _WARMUP.update(status="done", ready=True, seconds=round(time.perf_counter() - start, 3))
+            summary = dict(_WARMUP)
+        print(f"Warm-up complete in {summary['seconds']}s ({summary['failed']} failed)")
+        return summary
+
+
+def start_warmup(store: NodeStore):
+    """
+    Runs run_warmup() in a background thread, once per dataset version.
+    
+    Does nothing if WARMUP_ENABLED is off or the version is already warmed
+    (e.g. by the parent process before workers were forked, see wsgi.py).
+    """
+    if not WARMUP_ENABLED:
+        return
+    with _WARMUP_LOCK:
+        if _WARMUP["version"] == store.version:
+            return
+        _WARMUP["version"] = store.version
+    
+    def run():
+        try:
+            run_warmup(store)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+    
+    threading.Thread(target=run, name="ranking-warmup", daemon=True).start()
+
+
+def is_ready() -> bool:
+    """True once data is loaded and the first warm-up (if enabled) has finished."""
+    return _STORE is not None and (not WARMUP_ENABLED or _WARMUP["ready"])
+
+
+# ============================================================================
+# REQUEST DEADLINES
+# ============================================================================
+
+@app.before_request
+def start_request_deadline():
+    timeout = REQUEST_TIMEOUT_S if REQUEST_TIMEOUT_S > 0 else None
+    try:
+        requested = float(request.headers.get("X-Request-Timeout", ""))
+        if requested > 0:
+            timeout = requested if timeout is None else min(timeout, requested)
+    except ValueError:
+        pass
+    g.cancel_token = CancelToken(timeout)
+
+
+def request_cancel_token() -> Optional[CancelToken]:
+    """The current request's CancelToken (None outside requests, e.g. warm-up)."""
+    return g.get("cancel_token") if has_request_context() else None
+
+
+def cancelled_response(error: RankingCancelled):
+    """Error response for a ranking stopped by its request's CancelToken."""
+    if isinstance(error, AdmissionRejected):
+        response = jsonify({"success": False, "error": str(error)})
+        response.status_code = error.status
+        response.headers["Retry-After"] = str(error.retry_after)
+        return response
+    if isinstance(error, DeadlineExceeded):
+        print(f"Request timed out: {error}")
+        return jsonify({"success": False, "error": "Request timed out"}), 504
+    return jsonify({"success": False, "error": str(error)}), 503
+
+
+# ============================================================================
+# REQUEST METRICS
+# ============================================================================
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    METRICS.inc("http_requests_started_total")
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    METRICS.inc("http_requests_total", {
+        "endpoint": endpoint, "method": request.method, "status": response.status_code
+    })
+    start = g.get("metrics_start")
+    if start is not None:
+        METRICS.observe("http_request_duration_seconds", time.perf_counter() - start,
+                        {"endpoint": endpoint})
+    if not response.is_streamed and response.content_length is not None:
+        METRICS.observe("http_response_bytes", response.content_length, {"endpoint": endpoint})
+    if g.get("result_rows") is not None:
+        METRICS.observe("result_rows", g.result_rows, {"endpoint": endpoint})
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    METRICS.inc("http_requests_finished_total")
+
+
+def current_gauges() -> Dict[str, Tuple[float, str]]:
+    """Point-in-time server values reported alongside the request metrics."""
+    started = METRICS.total("http_requests_started_total")
+    finished = METRICS.total("http_requests_finished_total")
+    cache_lookups = RANKING_CACHE.stats["hits"] + RANKING_CACHE.stats["misses"]
+    flights = RANKING_FLIGHTS.stats["leaders"] + RANKING_FLIGHTS.stats["coalesced"]
+    store = _STORE
+    memory = memory_usage()
+    
+    gauges = {
+        "requests_in_flight": (started - finished, "Requests currently being handled"),
+        "rankings_in_flight": (RANKING_FLIGHTS.in_flight(), "Distinct rankings currently computing"),
+        "ranking_cache_entries": (len(RANKING_CACHE), "Rankings held in the cache"),
+        "ranking_cache_rows": (RANKING_CACHE.rows, "Result rows held in the cache"),
+        "ranking_cache_hits": (RANKING_CACHE.stats["hits"], "Ranking cache hits"),
+        "ranking_cache_misses": (RANKING_CACHE.stats["misses"], "Ranking cache misses"),
+        "ranking_cache_evictions": (RANKING_CACHE.stats["evictions"], "Ranking cache evictions"),
+        "ranking_cache_hit_ratio": (RANKING_CACHE.stats["hits"] / cache_lookups if cache_lookups else 0.0,
+                                    "Ranking cache hits / lookups"),
+        "component_index_entries": (len(COMPONENT_INDEX_CACHE),
+                                    "Component indexes held for custom-weight rankings"),
+        "coalesced_requests": (RANKING_FLIGHTS.stats["coalesced"], "Requests served by another request's computation"),
+        "coalesced_ratio": (RANKING_FLIGHTS.stats["coalesced"] / flights if flights else 0.0,
+                            "Coalesced requests / cache misses"),
+        "nodes_loaded": (len(store) if store is not None else 0, "Nodes in the current dataset"),
+        "dataset_bytes": (int(store.nodes_df.memory_usage(deep=False).sum()) if store is not None else 0,
+                          "Memory used by the node DataFrame (excluding string contents)"),
+        "uptime_seconds": (time.time() - METRICS.started_at, "Seconds since metrics started"),
+    }
+    for name, queue in ADMISSION_QUEUES.items():
+        gauges[f"admission_{name}_active"] = (queue.active, f"{name.capitalize()} requests running")
+        gauges[f"admission_{name}_queued"] = (queue.queued(), f"{name.capitalize()} requests waiting for a slot")
+    if DISK_CACHE is not None:
+        for name, value in DISK_CACHE.stats.items():
+            gauges["disk_cache_" + name] = (value, f"Disk result cache {name} (this process)")
+    for name, value in memory.items():
+        if value is not None:
+            gauges["process_" + name] = (value, "Process memory usage")
+    return gauges
+
+
+# ============================================================================
+# ADMISSION CONTROL
+# ============================================================================
+
+class AdmissionQueue:
+    """
+    Concurrency limit with a bounded FIFO wait queue for one priority class.
+    
+    Up to max_concurrent requests run at once; up to max_queue more wait for
+    a slot in arrival order. A released slot is handed directly to the
+    longest-waiting request. Requests arriving at a full queue are rejected
+    immediately rather than adding to everyone's latency.
+    """
+    
+    # Weight of the latest request in the average service time
+    EWMA_ALPHA = 0.2
+    
+    def __init__(self, name: str, max_concurrent: int, max_queue: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._waiters: deque = deque()
+        self.active = 0
+        self.service_time_s: Optional[float] = None
+        self.stats = {"admitted": 0, "queue_full": 0, "timeout": 0}
+    
+    def acquire(self, timeout: Optional[float]) -> Optional[str]:
+        """
+        Waits for a slot.
+        
+        Args:
+            timeout: Maximum seconds to wait in the queue (None = forever)
+        
+        Returns:
+            None if admitted (call release() when done), otherwise the
+            rejection reason: "queue_full" or "timeout"
+        """
+        with self._lock:
+            if self.active < self.max_concurrent and not self._waiters:
+                self.active += 1
+                self.stats["admitted"] += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self.stats["queue_full"] += 1
+                return "queue_full"
+            granted = threading.Event()
+            self._waiters.append(granted)
+        
+        if not granted.wait(timeout):
+            with self._lock:
+                # The slot may have been handed over just after the wait timed out
+                if not granted.is_set():
+                    self._waiters.remove(granted)
+                    self.stats["timeout"] += 1
+                    return "timeout"
+        with self._lock:
+            self.stats["admitted"] += 1
+        return None
+    
+    def release(self, service_time_s: float):
+        """Frees a slot, passing it to the next waiter, and records how long it was held."""
+        with self._lock:
+            if self.service_time_s is None:
+                self.service_time_s = service_time_s
+            else:
+                self.service_time_s += self.EWMA_ALPHA * (service_time_s - self.service_time_s)
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self.active -= 1
+    
+    def queued(self) -> int:
+        """Requests currently waiting for a slot."""
+        return len(self._waiters)
+    
+    def retry_after(self) -> int:
+        """Suggested Retry-After seconds: time to drain the current queue, 1-60."""
+        per_request = self.service_time_s or 1.0
+        drain = per_request * (self.queued() + 1) / self.max_concurrent
+        return min(60, max(1, math.ceil(drain)))
+
+
+ADMISSION_QUEUES = {
+    "interactive": AdmissionQueue("interactive", ADMISSION_INTERACTIVE_CONCURRENCY,
+                                  ADMISSION_INTERACTIVE_QUEUE),
+    "batch": AdmissionQueue("batch", ADMISSION_BATCH_CONCURRENCY, ADMISSION_BATCH_QUEUE),
+}
+
+
+class AdmissionRejected(RankingCancelled):
+    """Raised when a request can't get an admission slot for its priority class."""
+    
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def acquire_admission(priority: str) -> AdmissionQueue:
+    """
+    Waits for a slot in a priority class's queue, within the request deadline.
+    
+    Args:
+        priority: "interactive" or "batch"
+    
+    Returns:
+        The AdmissionQueue holding the slot (release() it when done)
+    
+    Raises:
+        AdmissionRejected: 429 if the queue is full, 503 if the wait timed out
+    """
+    queue = ADMISSION_QUEUES[priority]
+    timeout = ADMISSION_QUEUE_TIMEOUT_S
+    remaining = g.cancel_token.remaining()
+    if remaining is not None:
+        timeout = min(timeout, remaining)
+    
+    start = time.perf_counter()
+    rejected = queue.acquire(timeout)
+    METRICS.observe("admission_wait_seconds", time.perf_counter() - start, {"class": priority})
+    if rejected is not None:
+        METRICS.inc("admission_rejections_total", {"class": priority, "reason": rejected})
+        if rejected == "queue_full":
+            raise AdmissionRejected(f"Too many {priority} requests queued, retry later",
+                                    429, queue.retry_after())
+        raise AdmissionRejected(f"Server busy: no {priority} capacity within {timeout:.1f}s, retry later",
+                                503, queue.retry_after())
+    return queue
+
+
+@contextmanager
+def admission_slot():
+    """
+    Holds an admission slot while a ranking computes, for endpoints in
+    COMPUTE_ADMITTED_ENDPOINTS (a no-op elsewhere, e.g. during warm-up).
+    
+    Raises:
+        AdmissionRejected: See acquire_admission
+    """
+    if not ADMISSION_ENABLED or not has_request_context() or request.url_rule is None \
+            or request.url_rule.rule not in COMPUTE_ADMITTED_ENDPOINTS:
+        yield
+        return
+    queue = acquire_admission(ENDPOINT_CLASSES[request.url_rule.rule])
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        queue.release(time.perf_counter() - start)
+
+
+@app.before_request
+def admit_request():
+    if not ADMISSION_ENABLED or request.url_rule is None or request.method != "POST":
+        return None
+    rule = request.url_rule.rule
+    priority = ENDPOINT_CLASSES.get(rule)
+    if priority is None or rule in COMPUTE_ADMITTED_ENDPOINTS:
+        return None
+    
+    try:
+        queue = acquire_admission(priority)
+    except AdmissionRejected as e:
+        return cancelled_response(e)
+    g.admission = (queue, time.perf_counter())
+    return None
+
+
+@app.teardown_request
+def release_admission(error=None):
+    # Runs after streamed bodies finish (stream_with_context), so streamed
+    # batch responses hold their slot while they compute
+    admission = g.pop("admission", None)
+    if admission is not None:
+        queue, start = admission
+        queue.release(time.perf_counter() - start)
+
+
+# ============================================================================
+# REQUEST PROFILING
+# ============================================================================
+
+# Only one request is profiled at a time per process
+_PROFILE_LOCK = threading.Lock()
+# Endpoints that never answer with a single JSON document to attach a profile to
+UNPROFILED_ENDPOINTS = {"/api/rank/batch", "/api/jobs/<job_id>/results"}
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def summarize_profile(profiler: cProfile.Profile, top_n: int = PROFILE_TOP_N) -> Dict[str, Any]:
+    """
+    Summarizes a profile as the functions with the highest cumulative time.
+    
+    Args:
+        profiler: Stopped profiler
+        top_n: Functions to list
+    
+    Returns:
+        {"total_seconds", "top_functions", "project_functions"}, where each
+        function entry has "function", "calls", "tottime" and "cumtime".
+        project_functions only lists functions defined in this repository.
+    """
+    stats = pstats.Stats(profiler)
+    stats.sort_stats("cumulative")
+    
+    def describe(func):
+        filename, line, name = func
+        _, calls, tottime, cumtime, _ = stats.stats[func]
+        if filename.startswith(_PROJECT_DIR):
+            filename = os.path.relpath(filename, _PROJECT_DIR)
+        elif "site-packages" in filename:
+            filename = filename.split("site-packages" + os.sep, 1)[1]
+        return {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "tottime": round(tottime, 6),
+            "cumtime": round(cumtime, 6)
+        }
+    
+    project = [f for f in stats.fcn_list if f[0].startswith(_PROJECT_DIR)]
+    return {
+        "total_seconds": round(stats.total_tt, 6),
+        "top_functions": [describe(f) for f in stats.fcn_list[:top_n]],
+        "project_functions": [describe(f) for f in project[:top_n]]
+    }
+
+
+def profile_attachable() -> bool:
+    """True if the current request is answered with a JSON body (not streamed)."""
+    if request.url_rule is not None and request.url_rule.rule in UNPROFILED_ENDPOINTS:
+        return False
+    if request.args.get("stream") is not None or request.args.get("format") == "prometheus":
+        return False
+    body = request.get_json(silent=True) if request.is_json else None
+    return not (isinstance(body, dict) and body.get("stream") is not None)
+
+
+@app.before_request
+def start_profile():
+    if request.args.get("profile") not in ("1", "true"):
+        return None
+    if not PROFILING_ENABLED:
+        return jsonify({"success": False, "error": "Profiling is disabled (set PROFILING_ENABLED=1)"}), 403
+    if not profile_attachable():
+        return jsonify({"success": False, "error": "Profiling is only supported for non-streamed JSON responses"}), 400
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        return jsonify({"success": False, "error": "Another profiled request is running"}), 429
+    
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+    return None
+
+
+@app.after_request
+def attach_profile(response):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    _PROFILE_LOCK.release()
+    
+    # Streamed requests are rejected in start_profile; other non-JSON
+    # responses (e.g. error pages) are returned without the profile
+    if response.is_streamed or not response.is_json:
+        return response
+    
+    body = response.get_json()
+    if isinstance(body, dict):
+        body["profile"] = summarize_profile(profiler)
+        response.set_data(json.dumps(body))
+    return response
+
+
+@app.teardown_request
+def release_profile(error=None):
+    # after_request is skipped on unhandled errors; stop profiling here instead
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _PROFILE_LOCK.release()
+
+
+# ============================================================================
+# SLOW-QUERY LOG
+# ============================================================================
+
+_SLOW_LOG_LOCK = threading.Lock()
+
+
+def write_slow_query(record: Dict[str, Any]):
+    """Appends one record to SLOW_QUERY_LOG_FILE as a JSON line."""
+    line = json.dumps(record, default=str, separators=(",", ":")) + "\n"
+    with _SLOW_LOG_LOCK:
+        with open(SLOW_QUERY_LOG_FILE, "a") as f:
+            f.write(line)
+
+
+@app.after_request
+def log_slow_query(response):
+    """
+    Logs ranking requests slower than SLOW_QUERY_THRESHOLD_S.
+    
+    Each record holds the original endpoint and payload (replayable with
+    load_test.py), the canonical ranking parameters, dataset version, status,
+    duration, response size, and the ranking's stage timings and row counts.
+    "cached" marks responses served from an earlier computation, whose stage
+    stats are reported. For streamed responses, duration and size are measured
+    once the body has been sent.
+    """
+    ranking = g.get("ranking")
+    start = g.get("metrics_start")
+    if not SLOW_QUERY_LOG_FILE or ranking is None or start is None:
+        return response
+    
+    stats = ranking["entry"].get("stats", {})
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "endpoint": request.path,
+        "payload": request.get_json(silent=True),
+        "query": request.args.to_dict(),
+        "params": ranking["params"],
+        "dataset_version": ranking["entry"]["version"],
+        "status": response.status_code,
+        "cached": not ranking["computed"],
+        "row_counts": stats.get("row_counts", {}),
+        "stage_timings": stats.get("timings", {}),
+        "total_results": len(ranking["entry"]["results"]),
+    }
+    
+    def finish(response_bytes):
+        duration = time.perf_counter() - start
+        if duration < SLOW_QUERY_THRESHOLD_S:
+            return
+        record.update(duration_s=round(duration, 6), response_bytes=response_bytes)
+        try:
+            write_slow_query(record)
+        except OSError as e:
+            print(f"Could not write slow-query log: {e}")
+    
+    if not response.is_streamed:
+        finish(response.content_length)
+        return response
+    
+    body = response.response
+    sent = [0]
+    
+    def counted():
+        for chunk in body:
+            sent[0] += len(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            yield chunk
+    
+    response.response = counted()
+    response.call_on_close(lambda: finish(sent[0]))
+    return response
+
+
+# ============================================================================
+# API ENDPOINTS
+# ============================================================================
+
+@app.route("/", methods=["GET"])
+def index():
+    """Root endpoint - API info."""
+    return jsonify({
+        "service": "Node Ranking Engine API",
+        "version": "1.0",
+        "endpoints": {
+            "/api/rank": "POST - Rank nodes for load siting",
+            "/api/rank/page": "GET - Next page of a cached ranking (cursor)",
+            "/api/rank/batch": "POST - Rank many parameter sets (NDJSON stream)",
+            "/api/rank/compare": "POST - Compare resource configs side by side",
+            "/api/rank/stability": "POST - Rank stability under weight uncertainty (Monte Carlo)",
+            "/api/rank/uncertainty": "POST - Rank stability under input-data uncertainty (Monte Carlo)",
+            "/api/rank/breakpoints": "POST - Emissions preference values where the top N changes",
+            "/api/rank/pareto": "POST - Nodes not dominated on any component score (Pareto frontier)",
+            "/api/weights": "POST - Get weight breakdown for parameters",
+            "/api/health": "GET - Health check",
+            "/api/ready": "GET - Readiness check (503 until warm-up completes)",
+            "/api/metrics": "GET - Request, latency, cache and memory metrics",
+            "/api/admin/reload": "POST - Reload the node dataset without restarting",
+            "/api/admin/patch": "POST - Update data columns for specific nodes",
+            "/api/jobs": "POST - Start a background parameter sweep; GET - List jobs",
+            "/api/jobs/<job_id>": "GET - Sweep job status and progress",
+            "/api/jobs/<job_id>/results": "GET - Download a finished sweep (Parquet or CSV)"
+        }
+    })
+
+
+@app.route("/api/health", methods=["GET"])
+def health():
+    """Health check endpoint."""
+    try:
+        store = get_store()
+        return jsonify({
+            "status": "healthy",
+            "nodes_loaded": len(store),
+            "data_file": DATA_FILE,
+            "dataset_version": store.version,
+            "dataset_loaded_at": store.loaded_at,
+            "dataset_patches_applied": store.patches_applied
+        })
+    except Exception as e:
+        return jsonify({
+            "status": "unhealthy",
+            "error": str(e)
+        }), 500
+
+
+@app.route("/api/ready", methods=["GET"])
+def ready():
+    """
+    Readiness check - 503 until the dataset is loaded and warm-up has finished.
+    
+    Use for load balancer readiness probes; /api/health is the liveness check.
+    """
+    with _WARMUP_LOCK:
+        warmup = {k: v for k, v in _WARMUP.items() if k != "ready"}
+    if not is_ready():
+        return jsonify({"ready": False, "warmup": warmup}), 503
+    return jsonify({"ready": True, "dataset_version": _STORE.version, "warmup": warmup})
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """
+    Server metrics for this worker process.
+    
+    Returns JSON by default, or the Prometheus text format with
+    ?format=prometheus. Latency histograms are per endpoint and per
+    rank_nodes stage; quantiles in the JSON output are bucket estimates.
+    """
+    gauges = current_gauges()
+    if request.args.get("format") == "prometheus":
+        return Response(METRICS.render_prometheus(gauges), mimetype="text/plain; version=0.0.4")
+    
+    snapshot = METRICS.snapshot()
+    return jsonify({
+        "pid": os.getpid(),
+        "gauges": {name: value for name, (value, _) in gauges.items()},
+        "counters": snapshot["counters"],
+        "histograms": snapshot["histograms"]
+    })
+
+
+@app.route("/api/rank", methods=["POST"])
+def rank():
+    """
+    Main ranking endpoint.
+    
+    Request body:
+    {
+        "load_type": "data_center_always_on",
+        "load_size_mw": 250,
+        "location_filter": {"states": ["CA", "NY"]} or {"lat": 37.77, "lon": -122.42, "radius_km": 200} or null,
+        "emissions_preference": 80,
+        "resource_config": "solar_battery",
+        "top_n": 200,  // optional, default 200 (up to 1000, or MAX_STREAM_TOP_N when streaming)
+        "stream": "ndjson",  // optional, "ndjson" or "json" to stream results (also ?stream=...)
+        "include_analytics": true,  // optional, add rank movement analytics
+        "include_explanations": true,  // optional, add per-result contributions and explanation
+        "weights": {"cost": 0.5, "emissions": 0.5}  // optional, custom weights (see below)
+    }
+    
+    Response:
+    {
+        "success": true,
+        "num_results": 200,
+        "weights": {...},
+        "results": [...],
+        "ranking_id": "...",
+        "total_results": 1830,
+        "next_cursor": "...",  // pass to GET /api/rank/page, null on the last page
+        "analytics": {  // only with include_analytics; over all total_results nodes
+            "movers_up": [{"node", "state", "rank_baseline", "rank_scenario", "rank_delta"}, ...],
+            "movers_down": [...],
+            "nodes_moved": 412,
+            "top_n_overlap": {"top_n": 200, "shared": 187, "jaccard": 0.88, "entered": [...], "exited": [...]},
+            "spearman": 0.98,
+            "kendall_tau_b": 0.93
+        }
+    }
+    
+    With include_explanations, each result also has "contributions" (weight
+    x scenario component score per factor, summing to score_scenario),
+    "top_factors" (the significant ones among the top 3, largest first) and
+    a one-sentence "explanation", computed in bulk by explain_rankings().
+    
+    Custom weights: "weights" maps components (cost, land, policy, queue,
+    emissions, variability; missing = 0) to non-negative numbers, normalized
+    to sum to 1, and replaces compute_final_weights(). The top_n is found
+    from a cached per-filter component index (get_component_index) without
+    scoring every node where possible, so rank_baseline is null, there is no
+    ranking_id or next_cursor, and include_analytics isn't supported.
+    """
+    try:
+        # Parse request
+        data = request.get_json()
+        if not data:
+            return jsonify({"success": False, "error": "No JSON data provided"}), 400
+        
+        # Optional streaming mode ("ndjson" or "json"), from body or query string
+        stream = data.get("stream", request.args.get("stream"))
+        if stream is not None and stream not in STREAM_FORMATS:
+            return jsonify({
+                "success": False,
+                "error": f"stream must be one of: {', '.join(STREAM_FORMATS)}"
+            }), 400
+        
+        # Validate request
+        is_valid, error_msg = validate_request(data, max_top_n=MAX_STREAM_TOP_N if stream else 1000)
+        if not is_valid:
+            return jsonify({"success": False, "error": error_msg}), 400
+        
+        # Load data (one snapshot for the whole request)
+        store = get_store()
+        
+        # Extract parameters
+        params = parse_rank_params(data)
+        
+        if data.get("weights") is not None:
+            if data.get("include_analytics"):
+                return jsonify({"success": False,
+                                "error": "include_analytics is not supported with custom weights"}), 400
+            try:
+                weights = validate_custom_weights(data["weights"])
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            return rank_custom_weights(store, params, weights, stream,
+                                       bool(data.get("include_explanations")))
+        
+        # Compute weights for transparency
+        weights = compute_final_weights(
+            params["load_type"], params["load_size_mw"], params["emissions_preference"]
+        )
+        
+        # Run (or reuse) the full ranking; identical concurrent requests share
+        # one computation and later pages are served from the cache
+        entry = get_rank_entry(store, params)
+        top_n = params["top_n"]
+        results = entry["results"].head(top_n)
+        g.result_rows = len(results)
+        
+        if len(results) == 0:
+            return jsonify({
+                "success": False,
+                "error": "No nodes matched the specified criteria"
+            }), 404
+        
+        analytics = get_entry_analytics(entry, top_n) if data.get("include_analytics") else None
+        explain_weights = weights if data.get("include_explanations") else None
+        
+        if stream:
+            return stream_rank_response(params, weights, results, stream, analytics, explain_weights)
+        
+        # Build response
+        response = build_rank_response(params, weights, format_results(results, explain_weights))
+        response["ranking_id"] = entry["ranking_id"]
+        response["dataset_version"] = store.version
+        response["total_results"] = len(entry["results"])
+        response["next_cursor"] = next_cursor(entry, 0, top_n)
+        if analytics is not None:
+            response["analytics"] = analytics
+        
+        return jsonify(response)
+    
+    except RankingCancelled as e:
+        return cancelled_response(e)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
+def rank_custom_weights(store: NodeStore, params: Dict[str, Any], weights: Dict[str, float],
+                        stream: Optional[str], include_explanations: bool = False) -> Response:
+    """
+    Builds the /api/rank response for a custom weight vector.
+    """
+    index = get_component_index(store, params)
+    stats = {}
+    results = CompactResults.from_frame(
+        index.top_n(weights, params["top_n"], stats=stats, columns=ranked_columns(store)), store)
+    for stage, seconds in stats.get("timings", {}).items():
+        METRICS.observe("rank_stage_duration_seconds", seconds, {"stage": stage})
+    g.result_rows = len(results)
+    
+    if len(results) == 0:
+        return jsonify({
+            "success": False,
+            "error": "No nodes matched the specified criteria"
+        }), 404
+    
+    params = dict(params, weights=weights)
+    explain_weights = weights if include_explanations else None
+    if stream:
+        return stream_rank_response(params, weights, results, stream, explain_weights=explain_weights)
+    
+    response = build_rank_response(params, weights, format_results(results, explain_weights))
+    response["ranking_id"] = None
+    response["dataset_version"] = store.version
+    response["total_results"] = len(index)
+    response["next_cursor"] = None
+    response["nodes_scored"] = stats["row_counts"]["threshold_algorithm"]
+    return jsonify(response)
+
+
+def stream_rank_response(params: Dict[str, Any], weights: Dict[str, float],
+                         results: CompactResults, stream: str,
+                         analytics: Optional[Dict[str, Any]] = None,
+                         explain_weights: Optional[Dict[str, float]] = None) -> Response:
+    """
+    Streams ranking results instead of building the whole response in memory.
+    
+    Records are generated as the client reads them, gathering each chunk of
+    rows from the snapshot by position, so neither a DataFrame of all
+    results, the full list of result dicts nor the full JSON string is ever
+    held at once.
+    
+    Formats:
+        "ndjson": a header line with parameters and weights, one line per
+                  result, then a trailer line with num_results
+        "json":   the same document as the non-streamed response, sent as a
+                  chunked JSON array
+    Analytics, if requested, are part of the header (before the results).
+    Explanations, if requested (explain_weights), are added per chunk.
+    """
+    header = {
+        "success": True,
+        "parameters": dict(params),
+        "weights": {k: round(v, 4) for k, v in weights.items()}
+    }
+    if analytics is not None:
+        header["analytics"] = analytics
+    
+    def chunks(records, separator):
+        buffer = []
+        for record in records:
+            buffer.append(json.dumps(record))
+            if len(buffer) >= STREAM_CHUNK_ROWS:
+                yield separator.join(buffer)
+                buffer = []
+        if buffer:
+            yield separator.join(buffer)
+    
+    def generate_ndjson():
+        yield json.dumps(header) + "\n"
+        for chunk in chunks(iter_formatted_results(results, explain_weights=explain_weights), "\n"):
+            yield chunk + "\n"
+        yield json.dumps({"num_results": len(results)}) + "\n"
+    
+    def generate_json():
+        yield json.dumps(header)[:-1] + ', "results": ['
+        for i, chunk in enumerate(chunks(iter_formatted_results(results, explain_weights=explain_weights), ", ")):
+            yield (", " if i else "") + chunk
+        yield f'], "num_results": {len(results)}}}'
+    
+    if stream == "ndjson":
+        return Response(generate_ndjson(), mimetype="application/x-ndjson")
+    return Response(generate_json(), mimetype="application/json")
+
+
+@app.route("/api/rank/page", methods=["GET"])
+def rank_page():
+    """
+    Returns a further page of a cached ranking.
+    
+    Query parameters:
+        cursor: next_cursor from /api/rank (or nextCursor from /api/submit)
+        limit: optional page size override (1-1000)
+    
+    Response matches the originating endpoint's result format, plus the
+    cursor for the following page (null on the last page). Returns 410 if the
+    ranking has been evicted from the cache; re-run the original request.
+    """
+    try:
+        ranking_id, offset, limit = parse_cursor(request.args.get("cursor", ""))
+        limit = int(request.args.get("limit", limit))
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid or missing cursor"}), 400
+    
+    if offset < 0 or not (1 <= limit <= 1000):
+        return jsonify({"success": False, "error": "limit must be between 1 and 1000"}), 400
+    
+    entry = RANKING_CACHE.get(ranking_id)
+    if entry is None:
+        return jsonify({
+            "success": False,
+            "error": "Ranking expired from cache; re-run the original request"
+        }), 410
+    
+    page = entry["results"].rows(offset, offset + limit)
+    cursor = next_cursor(entry, offset, limit)
+    g.result_rows = len(page)
+    
+    if entry["kind"] == "submit":
+        response = format_response_for_frontend(page)
+        response.update(rankingId=ranking_id, offset=offset, datasetVersion=entry["version"],
+                        totalAvailable=len(entry["results"]), nextCursor=cursor)
+    else:
+        results_list = format_results(page)
+        response = {
+            "success": True,
+            "ranking_id": ranking_id,
+            "dataset_version": entry["version"],
+            "offset": offset,
+            "num_results": len(results_list),
+            "total_results": len(entry["results"]),
+            "next_cursor": cursor,
+            "results": results_list
+        }
+    return jsonify(response)
+
+
+@app.route("/api/rank/batch", methods=["POST"])
+def rank_batch():
+    """
+    Batch ranking endpoint.
+    
+    Accepts many /api/rank requests at once. Requests sharing a location
+    filter share data cleaning and component scores, and their weight vectors
+    are scored together. Results are streamed back as newline-delimited JSON,
+    one line per request in request order. Invalid or failing requests are
+    reported inline without failing the batch.
+    
+    Request body:
+    {
+        "requests": [
+            {"load_type": "...", "load_size_mw": 250, ...},  // same as /api/rank
+            ...
+        ]
+    }
+    
+    Response (application/x-ndjson), one line per request:
+    {"index": 0, "success": true, "num_results": 200, "parameters": {...}, "weights": {...}, "results": [...]}
+    {"index": 1, "success": false, "error": "Invalid load_type. ..."}
+    
+    If the request's deadline passes mid-batch, the stream stops after the
+    requests already ranked with a final line without "index":
+    {"success": false, "error": "Request timed out", "num_completed": 1}
+    """
+    data = request.get_json(silent=True)
+    items = data.get("requests") if isinstance(data, dict) else data
+    if not isinstance(items, list) or len(items) == 0:
+        return jsonify({"success": False, "error": "Body must contain a non-empty 'requests' list"}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({"success": False, "error": f"Batch size must be at most {MAX_BATCH_SIZE}"}), 400
+    
+    # Validate every item; invalid ones are reported inline
+    errors = {}
+    batch_params = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[i] = "Request must be a JSON object"
+            continue
+        is_valid, error_msg = validate_request(item)
+        if not is_valid:
+            errors[i] = error_msg
+            continue
+        batch_params.append(parse_rank_params(item))
+    
+    # One snapshot for the whole batch; unfiltered requests reuse its bounds
+    store = get_store()
+    column_bounds = None
+    if any(params["location_filter"] is None for params in batch_params):
+        column_bounds = store.column_bounds()
+    
+    cancel = request_cancel_token()
+    
+    def generate():
+        ranked = rank_nodes_batch(store.nodes_df, batch_params, column_bounds=column_bounds,
+                                  cancel=cancel)
+        valid_params = iter(batch_params)
+        failure = None
+        
+        for i in range(len(items)):
+            line = {"index": i}
+            if i in errors:
+                line.update(success=False, error=errors[i])
+            elif failure is not None:
+                line.update(success=False, error=failure)
+            else:
+                params = next(valid_params)
+                try:
+                    _, result = next(ranked)
+                except RankingCancelled as e:
+                    if isinstance(e, DeadlineExceeded):
+                        print(f"Batch timed out: {e}")
+                        error = "Request timed out"
+                    else:
+                        error = str(e)
+                    yield json.dumps({"success": False, "error": error, "num_completed": i}) + "\n"
+                    return
+                except Exception as e:
+                    import traceback
+                    traceback.print_exc()
+                    failure = f"Internal server error: {str(e)}"
+                    result = None
+                
+                if result is None:
+                    line.update(success=False, error=failure)
+                elif isinstance(result, Exception):
+                    line.update(success=False, error=str(result))
+                elif len(result) == 0:
+                    line.update(success=False, error="No nodes matched the specified criteria")
+                else:
+                    weights = compute_final_weights(
+                        params["load_type"], params["load_size_mw"], params["emissions_preference"]
+                    )
+                    line.update(build_rank_response(params, weights, format_results(result)))
+            
+            yield json.dumps(line) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@app.route("/api/rank/compare", methods=["POST"])
+def rank_compare():
+    """
+    Resource configuration comparison endpoint.
+    
+    Ranks the same load under several on-site resource configs in one pass
+    (rank_nodes_scenarios) and returns each config's top results plus a
+    side-by-side table of how every listed node's rank changes.
+    
+    Request body: same as /api/rank, with "resource_configs" instead of
+    "resource_config":
+    {
+        "load_type": "data_center_flexible",
+        "load_size_mw": 150,
+        "emissions_preference": 40,
+        "location_filter": {"states": ["TX"]},
+        "resource_configs": ["none", "solar", "solar_battery"],  // default: all
+        "top_n": 10
+    }
+    
+    Response:
+    {
+        "success": true,
+        "parameters": {...},
+        "weights": {...},
+        "scenarios": {
+            "solar": {"num_results": 10, "results": [...]},  // results as in /api/rank, plus rank_delta
+            ...
+        },
+        "comparison": [
+            {"node": "N123", "state": "TX", "rank_baseline": 3,
+             "rank_none": 3, "rank_delta_none": 0, "rank_solar": 1, "rank_delta_solar": 2,
+             ..., "best_config": "solar"},
+            ...
+        ]
+    }
+    rank_delta is rank_baseline - rank_scenario (positive = moves up with the resources).
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({"success": False, "error": "No JSON data provided"}), 400
+        
+        configs = data.get("resource_configs", VALID_RESOURCE_CONFIGS)
+        if not isinstance(configs, list) or not configs:
+            return jsonify({"success": False, "error": "resource_configs must be a non-empty list"}), 400
+        for config in configs:
+            is_valid, error_msg = validate_request(dict(data, resource_config=config))
+            if not is_valid:
+                return jsonify({"success": False, "error": error_msg}), 400
+        
+        params = parse_rank_params(dict(data, resource_config=None))
+        del params["resource_config"]
+        store = get_store()
+        column_bounds = store.column_bounds() if params["location_filter"] is None else None
+        results, comparison = rank_nodes_scenarios(
+            nodes_df=store.nodes_df, resource_configs=configs, column_bounds=column_bounds,
+            cancel=request_cancel_token(), **params
+        )
+        g.result_rows = sum(len(df) for df in results.values())
+        
+        if len(comparison) == 0:
+            return jsonify({
+                "success": False,
+                "error": "No nodes matched the specified criteria"
+            }), 404
+        
+        scenarios = {}
+        for config, df in results.items():
+            formatted = format_results(df)
+            for row, delta in zip(formatted, df['rank_delta'].tolist()):
+                row["rank_delta"] = delta
+            scenarios[config] = {"num_results": len(formatted), "results": formatted}
+        
+        weights = compute_final_weights(
+            params["load_type"], params["load_size_mw"], params["emissions_preference"]
+        )
+        return jsonify({
+            "success": True,
+            "parameters": dict(params, resource_configs=list(results)),
+            "weights": {k: round(v, 4) for k, v in weights.items()},
+            "dataset_version": store.version,
+            "scenarios": scenarios,
+            "comparison": comparison.to_dict(orient="records")
+        })
+    
+    except RankingCancelled as e:
+        return cancelled_response(e)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
+@app.route("/api/rank/stability", methods=["POST"])
+def rank_stability_endpoint():
+    """
+    Weight-uncertainty rank stability endpoint.
+    
+    Samples perturbed weight vectors (Dirichlet around the computed weights)
+    and reports, for the best nodes at the computed weights, how often each
+    stays in the top_n and the spread of its rank.
+    
+    Request body: same as /api/rank, plus optional:
+    {
+        "top_n": 20,            // top set for top_n_probability (default 20)
+        "track_n": 40,          // nodes reported (default 2 * top_n)
+        "num_samples": 2000,    // weight vectors sampled (up to MAX_STABILITY_SAMPLES)
+        "concentration": 100,   // Dirichlet concentration; higher = smaller perturbations
+        "seed": 0
+    }
+    
+    Response:
+    {
+        "success": true,
+        "parameters": {...},
+        "weights": {...},
+        "results": [
+            {"node": "N123", "state": "TX", "iso": "ERCOT", "score_scenario": 0.91,
+             "rank_scenario": 1, "top_n_probability": 0.97, "rank_mean": 1.8, "rank_std": 0.9,
+             "rank_p5": 1, "rank_p50": 1, "rank_p95": 4, "rank_best": 1, "rank_worst": 9},
+            ...
+        ]
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({"success": False, "error": "No JSON data provided"}), 400
+        
+        is_valid, error_msg = validate_request(data)
+        if not is_valid:
+            return jsonify({"success": False, "error": error_msg}), 400
         try:
-            top_n = int(data["top_n"])
-            if top_n < 1 or top_n > 1000:
-                return False, "top_n must be between 1 and 1000"
+            top_n = int(data.get("top_n", 20))
+            track_n = int(data.get("track_n", 2 * top_n))
+            num_samples = int(data.get("num_samples", 2000))
+            concentration = float(data.get("concentration", 100))
+            seed = int(data.get("seed", 0))
         except (ValueError, TypeError):
-            return False, "top_n must be an integer"
+            return jsonify({"success": False, "error": "top_n, track_n, num_samples, concentration "
+                                                       "and seed must be numbers"}), 400
+        if not 1 <= track_n <= 1000:
+            return jsonify({"success": False, "error": "track_n must be between 1 and 1000"}), 400
+        if not 1 <= num_samples <= MAX_STABILITY_SAMPLES:
+            return jsonify({"success": False,
+                            "error": f"num_samples must be between 1 and {MAX_STABILITY_SAMPLES}"}), 400
+        if not 0 < concentration < float("inf"):
+            return jsonify({"success": False, "error": "concentration must be positive"}), 400
+        
+        params = parse_rank_params(dict(data, top_n=top_n))
+        store = get_store()
+        column_bounds = store.column_bounds() if params["location_filter"] is None else None
+        results = rank_stability(
+            nodes_df=store.nodes_df, track_n=track_n, num_samples=num_samples,
+            concentration=concentration, seed=seed, column_bounds=column_bounds,
+            cancel=request_cancel_token(), **params
+        )
+        g.result_rows = len(results)
+        
+        if len(results) == 0:
+            return jsonify({
+                "success": False,
+                "error": "No nodes matched the specified criteria"
+            }), 404
+        
+        weights = compute_final_weights(
+            params["load_type"], params["load_size_mw"], params["emissions_preference"]
+        )
+        rows = format_stability_rows(results)
+        return jsonify({
+            "success": True,
+            "parameters": dict(params, track_n=track_n, num_samples=num_samples,
+                               concentration=concentration, seed=seed),
+            "weights": {k: round(v, 4) for k, v in weights.items()},
+            "dataset_version": store.version,
+            "num_results": len(rows),
+            "results": rows
+        })
     
-    return True, ""
+    except RankingCancelled as e:
+        return cancelled_response(e)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
 
 
-def format_results(df: pd.DataFrame) -> list:
+@app.route("/api/rank/uncertainty", methods=["POST"])
+def rank_uncertainty_endpoint():
     """
-    Formats ranking results for JSON response.
+    Input-data uncertainty rank stability endpoint.
     
-    Converts DataFrame to list of dicts with clean formatting.
-    """
-    # Replace NaN with None for JSON serialization
-    df = df.replace({np.nan: None})
-    
-    # Convert to list of dicts
-    results = []
-    for _, row in df.iterrows():
-        results.append({
-            # Node identification
-            "node": row["node"],
-            "state": row["state"],
-            "iso": row.get("iso"),
-            "county_state_pairs": row.get("county_state_pairs"),
-            "latitude": round(row["latitude"], 6) if row["latitude"] is not None else None,
-            "longitude": round(row["longitude"], 6) if row["longitude"] is not None else None,
-            
-            # Scores and ranks
-            "score_baseline": round(row["score_baseline"], 4),
-            "score_scenario": round(row["score_scenario"], 4),
-            "rank_baseline": int(row["rank_baseline"]),
-            "rank_scenario": int(row["rank_scenario"]),
-            
-            # Component scores
-            "component_scores": {
-                "cost": round(row["cost_score"], 3),
-                "land": round(row["land_score"], 3),
-                "emissions": round(row["emissions_score"], 3),
-                "policy": round(row["policy_score"], 3),
-                "queue": round(row["queue_score"], 3),
-                "variability_baseline": round(row["price_variability_penalty_score"], 3),
-                "variability_scenario": round(row["effective_price_variability_penalty_score"], 3),
-            },
-            
-            # Raw metrics (for display/explanation)
-            "raw_metrics": {
-                "avg_lmp": round(row["avg_lmp"], 2) if row["avg_lmp"] is not None else None,
-                "avg_price_per_acre": round(row["avg_price_per_acre"], 0) if row["avg_price_per_acre"] is not None else None,
-                "emissions_intensity": round(row["county_emissions_intensity_kg_per_mwh"], 1) if row["county_emissions_intensity_kg_per_mwh"] is not None else None,
-                "queue_pending_mw": round(row["queue_pending_mw"], 1) if row["queue_pending_mw"] is not None else None,
-            }
+    Perturbs avg_lmp, avg_price_per_acre and/or queue_pending_mw with the
+    given noise models, re-normalizes and re-scores each perturbed dataset,
+    and reports, for the best nodes on the unperturbed data, how often each
+    stays in the top_n and the spread of its rank.
+    
+    Request body: same as /api/rank, plus optional:
+    {
+        "noise": {              // default: DEFAULT_NOISE_MODELS
+            "avg_lmp": {"type": "normal", "sd": 3.0},               // $/MWh
+            "avg_price_per_acre": {"type": "relative", "sd": 0.2},  // +/-20%
+            "queue_pending_mw": {"type": "uniform", "width": 500}   // MW
+        },
+        "top_n": 20,            // top set for top_n_probability (default 20)
+        "track_n": 40,          // nodes reported (default 2 * top_n)
+        "num_samples": 500,     // perturbed datasets (up to MAX_UNCERTAINTY_SAMPLES)
+        "seed": 0
+    }
+    
+    Response: as /api/rank/stability.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({"success": False, "error": "No JSON data provided"}), 400
+        
+        is_valid, error_msg = validate_request(data)
+        if not is_valid:
+            return jsonify({"success": False, "error": error_msg}), 400
+        try:
+            top_n = int(data.get("top_n", 20))
+            track_n = int(data.get("track_n", 2 * top_n))
+            num_samples = int(data.get("num_samples", 500))
+            seed = int(data.get("seed", 0))
+        except (ValueError, TypeError):
+            return jsonify({"success": False, "error": "top_n, track_n, num_samples and seed "
+                                                       "must be numbers"}), 400
+        if not 1 <= track_n <= 1000:
+            return jsonify({"success": False, "error": "track_n must be between 1 and 1000"}), 400
+        if not 1 <= num_samples <= MAX_UNCERTAINTY_SAMPLES:
+            return jsonify({"success": False,
+                            "error": f"num_samples must be between 1 and {MAX_UNCERTAINTY_SAMPLES}"}), 400
+        noise = data.get("noise")
+        
+        params = parse_rank_params(dict(data, top_n=top_n))
+        store = get_store()
+        column_bounds = store.column_bounds() if params["location_filter"] is None else None
+        results = rank_data_uncertainty(
+            nodes_df=store.nodes_df, noise=noise, track_n=track_n, num_samples=num_samples,
+            seed=seed, column_bounds=column_bounds, cancel=request_cancel_token(), **params
+        )
+        g.result_rows = len(results)
+        
+        if len(results) == 0:
+            return jsonify({
+                "success": False,
+                "error": "No nodes matched the specified criteria"
+            }), 404
+        
+        weights = compute_final_weights(
+            params["load_type"], params["load_size_mw"], params["emissions_preference"]
+        )
+        rows = format_stability_rows(results)
+        return jsonify({
+            "success": True,
+            "parameters": dict(params, noise=noise or DEFAULT_NOISE_MODELS, track_n=track_n,
+                               num_samples=num_samples, seed=seed),
+            "weights": {k: round(v, 4) for k, v in weights.items()},
+            "dataset_version": store.version,
+            "num_results": len(rows),
+            "results": rows
         })
     
-    return results
-
-
-# ============================================================================
-# API ENDPOINTS
-# ============================================================================
-
-@app.route("/", methods=["GET"])
-def index():
-    """Root endpoint - API info."""
-    return jsonify({
-        "service": "Node Ranking Engine API",
-        "version": "1.0",
-        "endpoints": {
-            "/api/rank": "POST - Rank nodes for load siting",
-            "/api/weights": "POST - Get weight breakdown for parameters",
-            "/api/health": "GET - Health check"
-        }
-    })
+    except RankingCancelled as e:
+        return cancelled_response(e)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
 
 
-@app.route("/api/health", methods=["GET"])
-def health():
-    """Health check endpoint."""
+@app.route("/api/rank/breakpoints", methods=["POST"])
+def rank_breakpoints():
+    """
+    Emissions slider breakpoint endpoint.
+    
+    Returns the emissions_preference values where the top_n order or
+    membership changes, and the top_n nodes between consecutive breakpoints,
+    so a client can show the ranking for any slider position without
+    another request.
+    
+    Request body: same as /api/rank without "emissions_preference"
+    (top_n defaults to 20).
+    
+    Response:
+    {
+        "success": true,
+        "parameters": {...},
+        "num_breakpoints": 41,
+        "breakpoints": [3.17, 8.02, ...],
+        "segments": [
+            {"start": 0.0, "end": 3.17, "nodes": ["N123", "N456", ...]},  // best first
+            ...
+        ],
+        "nodes": {"N123": {"state": "TX", "iso": "ERCOT"}, ...}
+    }
+    A segment covers start < emissions_preference <= end (the first also covers 0).
+    """
     try:
-        nodes_df = load_data()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({"success": False, "error": "No JSON data provided"}), 400
+        
+        data = dict(data, emissions_preference=0, top_n=data.get("top_n", 20))
+        is_valid, error_msg = validate_request(data)
+        if not is_valid:
+            return jsonify({"success": False, "error": error_msg}), 400
+        
+        params = parse_rank_params(data)
+        del params["emissions_preference"]
+        store = get_store()
+        column_bounds = store.column_bounds() if params["location_filter"] is None else None
+        index = emissions_breakpoints(
+            nodes_df=store.nodes_df, column_bounds=column_bounds,
+            cancel=request_cancel_token(), **params
+        )
+        segments = index["segments"]
+        g.result_rows = len(segments)
+        
+        if not segments:
+            return jsonify({
+                "success": False,
+                "error": "No nodes matched the specified criteria"
+            }), 404
+        
+        listed = {node for segment in segments for node in segment["nodes"]}
+        nodes_df = store.nodes_df
+        details = nodes_df[nodes_df["node"].isin(listed)].drop_duplicates("node")
         return jsonify({
-            "status": "healthy",
-            "nodes_loaded": len(nodes_df),
-            "data_file": DATA_FILE
+            "success": True,
+            "parameters": params,
+            "dataset_version": store.version,
+            "num_breakpoints": len(segments) - 1,
+            "breakpoints": [round(segment["end"], 6) for segment in segments[:-1]],
+            "segments": [dict(segment, start=round(segment["start"], 6), end=round(segment["end"], 6))
+                         for segment in segments],
+            "nodes": {
+                row["node"]: {"state": row["state"], "iso": row.get("iso")}
+                for row in details.to_dict(orient="records")
+            }
         })
+    
+    except RankingCancelled as e:
+        return cancelled_response(e)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
+        import traceback
+        traceback.print_exc()
         return jsonify({
-            "status": "unhealthy",
-            "error": str(e)
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
         }), 500
 
 
-@app.route("/api/rank", methods=["POST"])
-def rank():
+@app.route("/api/rank/pareto", methods=["POST"])
+def rank_pareto():
     """
-    Main ranking endpoint.
+    Pareto frontier endpoint.
+    
+    Returns the nodes that no other node beats on every component score
+    (cost, land, emissions, policy, queue and scenario variability), with no
+    weighting. With "k", a node is also excluded when another node is at
+    least as good on any k components and better on one.
     
     Request body:
     {
         "load_type": "data_center_always_on",
-        "load_size_mw": 250,
-        "location_filter": {"states": ["CA", "NY"]} or {"lat": 37.77, "lon": -122.42, "radius_km": 200} or null,
-        "emissions_preference": 80,
         "resource_config": "solar_battery",
-        "top_n": 200  // optional, default 200
+        "location_filter": {"states": ["TX"]},  // optional
+        "k": 5,                                  // optional k-dominance, 1-6
+        "max_results": 1000                      // optional, default 1000 (up to MAX_PARETO_RESULTS)
     }
     
     Response:
     {
         "success": true,
-        "num_results": 200,
-        "weights": {...},
-        "results": [...]
+        "parameters": {...},
+        "frontier_size": 575,   // may exceed num_results; can be 0 with k
+        "num_results": 575,
+        "results": [
+            {"node": "N123", "state": "TX", "iso": "ERCOT", "latitude": ..., "longitude": ...,
+             "component_scores": {"cost": 1.0, "land": 0.42, ...}},
+            ...
+        ]
     }
+    Results are ordered by the sum of their component scores, best first.
     """
     try:
-        # Parse request
-        data = request.get_json()
-        if not data:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
             return jsonify({"success": False, "error": "No JSON data provided"}), 400
         
-        # Validate request
-        is_valid, error_msg = validate_request(data)
+        # Load size and emissions preference only affect weights, which aren't used
+        is_valid, error_msg = validate_request(dict({"load_size_mw": 1, "emissions_preference": 0}, **data))
         if not is_valid:
             return jsonify({"success": False, "error": error_msg}), 400
+        try:
+            k = int(data["k"]) if data.get("k") is not None else None
+            max_results = int(data.get("max_results", 1000))
+        except (ValueError, TypeError):
+            return jsonify({"success": False, "error": "k and max_results must be integers"}), 400
+        if not 1 <= max_results <= MAX_PARETO_RESULTS:
+            return jsonify({"success": False,
+                            "error": f"max_results must be between 1 and {MAX_PARETO_RESULTS}"}), 400
         
-        # Load data
-        nodes_df = load_data()
-        
-        # Extract parameters
-        load_type = data["load_type"]
-        load_size_mw = float(data["load_size_mw"])
-        emissions_preference = float(data["emissions_preference"])
-        resource_config = data["resource_config"]
-        location_filter = data.get("location_filter")
-        top_n = int(data.get("top_n", 200))
-        
-        # Compute weights for transparency
-        weights = compute_final_weights(load_type, load_size_mw, emissions_preference)
-        
-        # Run ranking
-        results_df = rank_nodes(
-            nodes_df=nodes_df,
-            load_type=load_type,
-            load_size_mw=load_size_mw,
-            location_filter=location_filter,
-            emissions_preference=emissions_preference,
-            resource_config=resource_config,
-            top_n=top_n
-        )
+        params = {"load_type": data["load_type"], "resource_config": data["resource_config"],
+                  "location_filter": data.get("location_filter"), "k": k}
+        validate_dominance_k(k)
+        store = get_store()
+        # Component scores (and the skyline) are shared with custom-weight
+        # rankings of the same node set, see get_component_index
+        index = get_component_index(store, params)
+        frontier = index.frontier(k, cancel=request_cancel_token())
+        rows = format_frontier_rows(frontier.iloc[:max_results])
+        g.result_rows = len(rows)
         
-        # Format results
-        if len(results_df) == 0:
+        # An empty k-dominant frontier is a valid answer; no matching nodes isn't
+        if len(index) == 0:
             return jsonify({
                 "success": False,
                 "error": "No nodes matched the specified criteria"
             }), 404
         
-        results_list = format_results(results_df)
-        
-        # Build response
-        response = {
+        return jsonify({
             "success": True,
-            "num_results": len(results_list),
-            "parameters": {
-                "load_type": load_type,
-                "load_size_mw": load_size_mw,
-                "emissions_preference": emissions_preference,
-                "resource_config": resource_config,
-                "location_filter": location_filter,
-                "top_n": top_n
-            },
-            "weights": {k: round(v, 4) for k, v in weights.items()},
-            "results": results_list
-        }
-        
-        return jsonify(response)
+            "parameters": dict(params, max_results=max_results),
+            "dataset_version": store.version,
+            "frontier_size": len(frontier),
+            "num_results": len(rows),
+            "results": rows
+        })
     
+    except RankingCancelled as e:
+        return cancelled_response(e)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -382,8 +2591,11 @@ def submit_ranking():
     Response:
     {
         "success": true,
-        "totalResults": 10,
-        "results": [...]
+        "totalResults": 200,
+        "results": [...],
+        "rankingId": "...",
+        "totalAvailable": 1830,
+        "nextCursor": "..."  // pass to GET /api/rank/page, null on the last page
     }
     """
     try:
@@ -398,27 +2610,31 @@ def submit_ranking():
         print("\n" + "="*80)
         print("Received frontend submission:")
         print("="*80)
-        import json
         print(json.dumps(frontend_json, indent=2))
         print("="*80 + "\n")
         
-        # Load data
-        nodes_df = load_data()
+        # Load data (one snapshot for the whole request)
+        store = get_store()
         
-        # Use api_wrapper to handle frontend format and run ranking
-        results = rank_nodes_from_frontend_json(
-            frontend_json,
-            nodes_df=nodes_df,
-            top_n=200  # Return top 200 results
-        )
+        # Use api_wrapper to handle frontend format and run the full ranking.
+        # Identical concurrent submissions (e.g. many dashboard tabs) share
+        # one computation, and later pages are served from the cache.
+        entry = get_submit_entry(store, frontend_json)
         
-        # Format response for frontend
-        response = format_response_for_frontend(results)
+        # Format the first page (top 200 results) for frontend
+        g.result_rows = min(len(entry["results"]), SUBMIT_PAGE_SIZE)
+        response = format_response_for_frontend(entry["results"].rows(0, SUBMIT_PAGE_SIZE))
+        response["rankingId"] = entry["ranking_id"]
+        response["datasetVersion"] = store.version
+        response["totalAvailable"] = len(entry["results"])
+        response["nextCursor"] = next_cursor(entry, 0, SUBMIT_PAGE_SIZE)
         
         print(f"\n✅ Ranking complete: {response.get('totalResults', 0)} results\n")
         
         return jsonify(response)
     
+    except RankingCancelled as e:
+        return cancelled_response(e)
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -428,6 +2644,223 @@ def submit_ranking():
         }), 500
 
 
+def admin_denied() -> Optional[Tuple[Response, int]]:
+    """
+    Error response for an admin request without the right X-Admin-Token.
+    
+    Admin endpoints are disabled (404) unless ADMIN_TOKEN is configured, and
+    otherwise return 403 for a missing or wrong token.
+    
+    Returns:
+        None if the request may proceed
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({"success": False, "error": "Admin endpoints are disabled (ADMIN_TOKEN is not set)"}), 404
+    token = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        return jsonify({"success": False, "error": "Forbidden"}), 403
+    return None
+
+
+@app.route("/api/admin/reload", methods=["POST"])
+def admin_reload():
+    """
+    Reloads DATA_FILE in the background and swaps it in atomically.
+    
+    Requires the X-Admin-Token header (see admin_denied). Pass
+    {"wait": true} to block until the new snapshot is live. With multiple
+    worker processes, each worker must reload separately; prefer the file
+    watcher (DATA_FILE_WATCH_INTERVAL_S) there.
+    
+    Response:
+    {
+        "success": true,
+        "status": "started" | "in_progress" | "completed",
+        "dataset_version": "..."   // version currently being served
+    }
+    """
+    denied = admin_denied()
+    if denied is not None:
+        return denied
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        if data.get("wait"):
+            store = reload_data()
+            status = "completed"
+        else:
+            status = "started" if reload_data_async() else "in_progress"
+            store = get_store()
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Reload failed: {str(e)}"}), 500
+    
+    return jsonify({"success": True, "status": status, "dataset_version": store.version})
+
+
+@app.route("/api/admin/patch", methods=["POST"])
+def admin_patch():
+    """
+    Updates data columns for specific nodes without a full reload.
+    
+    Requires the X-Admin-Token header (see admin_denied). Normalization
+    bounds are refreshed incrementally and the dataset version changes, so
+    cached rankings for the previous data are not reused. Like reloads, a
+    patch applies only to the worker process that receives it.
+    
+    Request body:
+    {
+        "updates": [
+            {"node": "N123", "avg_lmp": 41.2, "avg_congestion": 3.1, "queue_pending_mw": 850},
+            ...
+        ]
+    }
+    
+    Response:
+    {
+        "success": true,
+        "nodes_patched": 1,
+        "dataset_version": "..."
+    }
+    """
+    denied = admin_denied()
+    if denied is not None:
+        return denied
+    
+    data = request.get_json(silent=True)
+    updates = data.get("updates") if isinstance(data, dict) else None
+    if not isinstance(updates, list) or not updates or not all(isinstance(u, dict) for u in updates):
+        return jsonify({"success": False, "error": "updates must be a non-empty list of objects"}), 400
+    
+    try:
+        store = patch_data(updates)
+    except KeyError as e:
+        return jsonify({"success": False, "error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Patch failed: {str(e)}"}), 500
+    
+    return jsonify({
+        "success": True,
+        "nodes_patched": len({u.get("node") for u in updates}),
+        "dataset_version": store.version
+    })
+
+
+@app.route("/api/jobs", methods=["POST"])
+def create_job():
+    """
+    Starts a background sweep over many parameter combinations.
+    
+    Every combination of the listed values is ranked on a process pool
+    against the dataset snapshot current at submission. Partial results are
+    written to JOB_DIR as tasks finish; poll the status URL for progress and
+    download the merged file from the results URL when done. Jobs run one at
+    a time in submission order. Status and results can be fetched from any
+    worker process on the host.
+    
+    Request body (all fields optional):
+    {
+        "load_types": ["data_center_always_on", ...],      // default: all
+        "resource_configs": ["none", "solar", ...],         // default: all
+        "load_sizes_mw": [50, 100, 500],                    // default: [100]
+        "emissions_preferences": [0, 25, 50, 75, 100],      // default: [50]
+        "states": "all",                 // or ["TX", "CA"]; each state ranked separately
+        "location_filters": [null, {"lat": 31, "lon": -97, "radius_km": 200}],
+        "top_n": 200
+    }
+    
+    Response (202):
+    {
+        "success": true,
+        "job": {"job_id": "...", "status": "queued", "total_rankings": 4500,
+                "progress": 0.0, "status_url": "/api/jobs/...", ...}
+    }
+    """
+    spec = request.get_json(silent=True)
+    if spec is None:
+        spec = {}
+    if not isinstance(spec, dict):
+        return jsonify({"success": False, "error": "Body must be a JSON object"}), 400
+    
+    store = get_store()
+    all_states = sorted(store.nodes_df['state'].dropna().astype(str).unique()) \
+        if 'state' in store.nodes_df.columns else []
+    try:
+        items = expand_sweep(spec, all_states)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if len(items) > MAX_JOB_RANKINGS:
+        return jsonify({
+            "success": False,
+            "error": f"Sweep has {len(items)} rankings; at most {MAX_JOB_RANKINGS} are allowed"
+        }), 400
+    
+    # Reject the whole sweep on the first invalid combination
+    sweep = []
+    for item in items:
+        is_valid, error_msg = validate_request(item, max_top_n=MAX_STREAM_TOP_N)
+        if not is_valid:
+            return jsonify({"success": False, "error": error_msg}), 400
+        sweep.append(parse_rank_params(item))
+    
+    try:
+        job = get_job_manager().submit(sweep, store)
+    except OSError as e:
+        return jsonify({"success": False, "error": f"Could not create job: {str(e)}"}), 500
+    
+    return jsonify({"success": True, "job": job_response(job)}), 202
+
+
+@app.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    """Lists sweep jobs, newest first."""
+    return jsonify({"success": True, "jobs": [job_response(j) for j in get_job_manager().list_jobs()]})
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """
+    Sweep job status.
+    
+    Response:
+    {
+        "success": true,
+        "job": {"job_id": "...", "status": "running",   // queued|running|done|failed
+                "total_rankings": 4500, "completed_rankings": 1200,
+                "failed_rankings": 0, "progress": 0.2667, "rows": 0, ...}
+    }
+    """
+    job = get_job_manager().status(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    return jsonify({"success": True, "job": job_response(job)})
+
+
+@app.route("/api/jobs/<job_id>/results", methods=["GET"])
+def job_results(job_id):
+    """
+    Downloads a finished sweep as one file.
+    
+    One row per ranked node per ranking, with the ranking's parameters
+    (ranking, location, load_type, resource_config, load_size_mw,
+    emissions_preference) followed by node, scores, ranks and component
+    scores. Parquet if pyarrow is installed on the server, otherwise CSV.
+    """
+    manager = get_job_manager()
+    job = manager.status(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    if job["status"] != "done":
+        return jsonify({"success": False, "error": f"Job is {job['status']}", "job": job_response(job)}), 409
+    
+    path = manager.result_path(job_id)
+    fmt = job["result_format"]
+    mimetype = "application/vnd.apache.parquet" if fmt == "parquet" else "text/csv"
+    return send_file(os.path.abspath(path), mimetype=mimetype, as_attachment=True,
+                     download_name=f"sweep-{job_id}.{fmt}")
+
+
 # ============================================================================
 # MAIN
 # ============================================================================
@@ -444,6 +2877,7 @@ if __name__ == "__main__":
     print("NODE RANKING ENGINE - API SERVER")
     print("=" * 80)
     load_data()
+    start_warmup(get_store())
     
     print("\nStarting Flask server...")
     print("API endpoints available at:")
@@ -455,6 +2889,8 @@ if __name__ == "__main__":
     # Note: Install Flask and flask-cors first:
     # pip install flask flask-cors
     
-    # Run server
+    # Run development server (single process). For production use the
+    # multi-worker entry point instead:
+    #   gunicorn -c gunicorn.conf.py wsgi:app
     app.run(host="0.0.0.0", port=5001, debug=True)
 
@@ -10,9 +10,9 @@ Usage:
     results = rank_nodes_from_frontend_json(frontend_json)
 """
 
-from node_ranking_engine import rank_nodes, load_nodes_from_csv
+from node_ranking_engine import rank_nodes, load_nodes_from_csv, CancelToken
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 
 # State name to code mapping
@@ -201,7 +201,10 @@ def parse_frontend_json(frontend_json: Dict[str, Any]) -> Dict[str, Any]:
 def rank_nodes_from_frontend_json(
     frontend_json: Dict[str, Any],
     nodes_df: pd.DataFrame = None,
-    top_n: int = 200
+    top_n: Optional[int] = 200,
+    stats: Optional[Dict] = None,
+    cancel: Optional[CancelToken] = None,
+    columns: Optional[List[str]] = None
 ) -> pd.DataFrame:
     """
     Ranks nodes using frontend JSON format.
@@ -212,10 +215,19 @@ def rank_nodes_from_frontend_json(
     Args:
         frontend_json: JSON from frontend with loadConfig and location
         nodes_df: Pre-loaded node DataFrame (will load if None)
-        top_n: Number of top results per point (default 200)
+        top_n: Number of top results per point (default 200, None for all)
+        stats: Optional dict receiving rank_nodes stage timings and row counts
+               (summed over points)
+        cancel: Optional CancelToken, checked between rank_nodes stages and
+                before each point
+        columns: Optional original node columns to include (default all,
+                 see rank_nodes)
     
     Returns:
         DataFrame with ranked results
+    
+    Raises:
+        RankingCancelled: If cancel is cancelled or its deadline passes
     """
     # Load data if not provided
     if nodes_df is None:
@@ -236,7 +248,10 @@ def rank_nodes_from_frontend_json(
             location_filter=params["location_filter"],
             emissions_preference=params["emissions_preference"],
             resource_config=params["resource_config"],
-            top_n=top_n
+            top_n=top_n,
+            stats=stats,
+            cancel=cancel,
+            columns=columns
         )
     
     # Handle points mode (multiple rankings, one per point)
@@ -250,6 +265,8 @@ def rank_nodes_from_frontend_json(
         all_results = []
         
         for i, point in enumerate(selected_points):
+            if cancel is not None:
+                cancel.check(f"point {i+1}/{len(selected_points)}")
             print(f"\nRanking for point {i+1}/{len(selected_points)}: {point.get('id', 'unknown')}")
             print(f"  Location: ({point['lat']:.4f}, {point['lng']:.4f})")
             
@@ -268,7 +285,10 @@ def rank_nodes_from_frontend_json(
                 location_filter=point_location_filter,
                 emissions_preference=params["emissions_preference"],
                 resource_config=params["resource_config"],
-                top_n=top_n
+                top_n=top_n,
+                stats=stats,
+                cancel=cancel,
+                columns=columns
             )
             
             # Add point ID to results for tracking
@@ -294,7 +314,8 @@ def rank_nodes_from_frontend_json(
             combined = combined.sort_values('rank_scenario')
             
             # Limit to top_n overall
-            combined = combined.head(top_n)
+            if top_n is not None:
+                combined = combined.head(top_n)
             
             return combined
         else:
@@ -0,0 +1,304 @@
+"""
+Asyncio (ASGI) Server for Node Ranking Engine
+
+Serves the same /api/rank, /api/weights, /api/health and /api/submit routes as
+api_server.py, but on an asyncio event loop. CPU-bound rankings are dispatched
+to a bounded process pool, so cheap endpoints (health checks, weight previews)
+are answered directly on the event loop and never queue behind heavy rankings.
+
+Usage:
+    uvicorn asgi_server:app --host 0.0.0.0 --port 5001
+    python asgi_server.py
+
+Requires starlette and uvicorn:
+    pip install starlette uvicorn
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from node_ranking_engine import rank_nodes, load_nodes_from_csv, compute_final_weights
+from api_wrapper import rank_nodes_from_frontend_json, format_response_for_frontend
+from api_server import (
+    DATA_FILE,
+    SINGLE_FLIGHT_TIMEOUT_S,
+    validate_request,
+    parse_rank_params,
+    build_rank_response,
+    format_results,
+    canonical_request_key,
+    canonical_submit_params,
+)
+
+# Number of ranking worker processes (default: one per core)
+RANK_POOL_WORKERS = int(os.environ.get("RANK_POOL_WORKERS", multiprocessing.cpu_count()))
+
+# Maximum rankings queued or running at once; beyond this, requests get 503
+RANK_QUEUE_LIMIT = int(os.environ.get("RANK_QUEUE_LIMIT", str(4 * RANK_POOL_WORKERS)))
+
+
+# ============================================================================
+# WORKER PROCESS FUNCTIONS
+# ============================================================================
+
+# Node data inside each worker process. When the pool is forked, workers
+# inherit the parent's copy (shared copy-on-write); otherwise the initializer
+# loads it.
+_WORKER_NODES_DF = None
+
+
+def _init_worker(data_file: str):
+    """Process pool initializer - ensures the worker has node data loaded."""
+    global _WORKER_NODES_DF
+    if _WORKER_NODES_DF is None:
+        _WORKER_NODES_DF = load_nodes_from_csv(data_file)
+
+
+def _worker_dataset_info() -> Dict[str, Any]:
+    """Reports the dataset loaded in a worker (used for health checks)."""
+    return {"nodes_loaded": len(_WORKER_NODES_DF)}
+
+
+def _worker_rank(params: Dict[str, Any]) -> Optional[list]:
+    """Runs rank_nodes in a worker and returns formatted results (None if empty)."""
+    results_df = rank_nodes(nodes_df=_WORKER_NODES_DF, **params)
+    return format_results(results_df) if len(results_df) > 0 else None
+
+
+def _worker_submit(frontend_json: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs a frontend submission in a worker and returns the formatted response."""
+    results = rank_nodes_from_frontend_json(frontend_json, nodes_df=_WORKER_NODES_DF, top_n=200)
+    return format_response_for_frontend(results)
+
+
+# ============================================================================
+# POOL DISPATCH
+# ============================================================================
+
+class PoolOverloaded(Exception):
+    """Raised when the ranking queue is full."""
+
+
+class RankingDispatcher:
+    """
+    Dispatches rankings to a bounded process pool.
+
+    Identical concurrent requests are coalesced onto one pool task (see
+    api_server.SingleFlight), and at most queue_limit tasks may be queued or
+    running at once.
+    """
+
+    def __init__(self, pool: ProcessPoolExecutor, queue_limit: int):
+        self.pool = pool
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def run(self, key: str, fn: Callable, arg: Any) -> Any:
+        fut = self._inflight.get(key)
+        if fut is not None:
+            try:
+                return await asyncio.wait_for(asyncio.shield(fut), SINGLE_FLIGHT_TIMEOUT_S)
+            except asyncio.TimeoutError:
+                pass  # Fall back to an independent computation
+
+        if self.pending >= self.queue_limit:
+            raise PoolOverloaded()
+
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(self.pool, fn, arg)
+        self._inflight.setdefault(key, fut)
+        self.pending += 1
+        try:
+            return await fut
+        finally:
+            self.pending -= 1
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+
+def _error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"success": False, "error": message}, status_code=status_code)
+
+
+async def _read_json(request: Request) -> Optional[Dict[str, Any]]:
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+# ============================================================================
+# API ENDPOINTS
+# ============================================================================
+
+async def index(request: Request) -> JSONResponse:
+    """Root endpoint - API info."""
+    return JSONResponse({
+        "service": "Node Ranking Engine API (asyncio)",
+        "version": "1.0",
+        "endpoints": {
+            "/api/rank": "POST - Rank nodes for load siting",
+            "/api/weights": "POST - Get weight breakdown for parameters",
+            "/api/submit": "POST - Rank nodes from frontend JSON format",
+            "/api/health": "GET - Health check"
+        }
+    })
+
+
+async def health(request: Request) -> JSONResponse:
+    """Health check endpoint - answered on the event loop, never queued."""
+    dispatcher = request.app.state.dispatcher
+    return JSONResponse({
+        "status": "healthy",
+        "nodes_loaded": request.app.state.nodes_loaded,
+        "data_file": DATA_FILE,
+        "pool_workers": RANK_POOL_WORKERS,
+        "rankings_pending": dispatcher.pending
+    })
+
+
+async def get_weights(request: Request) -> JSONResponse:
+    """Returns weight breakdown for given parameters (computed inline)."""
+    data = await _read_json(request)
+    if not data:
+        return _error("No JSON data provided", 400)
+
+    try:
+        load_type = data.get("load_type", "data_center_always_on")
+        load_size_mw = float(data.get("load_size_mw", 100))
+        emissions_preference = float(data.get("emissions_preference", 50))
+        weights = compute_final_weights(load_type, load_size_mw, emissions_preference)
+    except Exception as e:
+        return _error(str(e), 500)
+
+    return JSONResponse({
+        "success": True,
+        "parameters": {
+            "load_type": load_type,
+            "load_size_mw": load_size_mw,
+            "emissions_preference": emissions_preference
+        },
+        "weights": {k: round(v, 4) for k, v in weights.items()}
+    })
+
+
+async def rank(request: Request) -> JSONResponse:
+    """Main ranking endpoint (same request/response format as api_server.py)."""
+    data = await _read_json(request)
+    if not data:
+        return _error("No JSON data provided", 400)
+
+    is_valid, error_msg = validate_request(data)
+    if not is_valid:
+        return _error(error_msg, 400)
+
+    params = parse_rank_params(data)
+    weights = compute_final_weights(
+        params["load_type"], params["load_size_mw"], params["emissions_preference"]
+    )
+
+    try:
+        results_list = await request.app.state.dispatcher.run(
+            canonical_request_key("rank", params), _worker_rank, params
+        )
+    except PoolOverloaded:
+        return _error("Server busy, try again later", 503)
+    except Exception as e:
+        return _error(f"Internal server error: {str(e)}", 500)
+
+    if results_list is None:
+        return _error("No nodes matched the specified criteria", 404)
+
+    return JSONResponse(build_rank_response(params, weights, results_list))
+
+
+async def submit_ranking(request: Request) -> JSONResponse:
+    """Frontend submission endpoint (same format as api_server.py /api/submit)."""
+    frontend_json = await _read_json(request)
+    if not frontend_json:
+        return _error("No JSON data provided", 400)
+
+    try:
+        key = canonical_request_key("submit", canonical_submit_params(frontend_json))
+    except (ValueError, TypeError) as e:
+        return _error(f"Invalid submission: {e}", 400)
+
+    try:
+        response = await request.app.state.dispatcher.run(key, _worker_submit, frontend_json)
+    except PoolOverloaded:
+        return _error("Server busy, try again later", 503)
+    except Exception as e:
+        return _error(f"Internal server error: {str(e)}", 500)
+
+    return JSONResponse(response)
+
+
+# ============================================================================
+# APPLICATION
+# ============================================================================
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """Starts the ranking process pool and loads data into every worker."""
+    global _WORKER_NODES_DF
+
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods:
+        # Load once in the parent; forked workers share it copy-on-write
+        _WORKER_NODES_DF = load_nodes_from_csv(DATA_FILE)
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = multiprocessing.get_context()
+
+    pool = ProcessPoolExecutor(
+        max_workers=RANK_POOL_WORKERS,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(DATA_FILE,)
+    )
+    loop = asyncio.get_running_loop()
+    info = await loop.run_in_executor(pool, _worker_dataset_info)
+
+    app.state.nodes_loaded = info["nodes_loaded"]
+    app.state.dispatcher = RankingDispatcher(pool, RANK_QUEUE_LIMIT)
+    print(f"Ranking pool ready: {RANK_POOL_WORKERS} workers, {info['nodes_loaded']} nodes")
+    try:
+        yield
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route("/", index, methods=["GET"]),
+        Route("/api/health", health, methods=["GET"]),
+        Route("/api/weights", get_weights, methods=["POST"]),
+        Route("/api/rank", rank, methods=["POST"]),
+        Route("/api/submit", submit_ranking, methods=["POST"]),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    if not os.path.exists(DATA_FILE):
+        print(f"ERROR: Data file '{DATA_FILE}' not found!")
+        print("Please ensure the CSV file is in the current directory.")
+        exit(1)
+
+    uvicorn.run(app, host="0.0.0.0", port=5001)
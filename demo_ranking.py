@@ -8,6 +8,7 @@ the ranking engine can be integrated into a web API or UI.
 import pandas as pd
 from node_ranking_engine import (
     rank_nodes,
+    rank_nodes_scenarios,
     load_nodes_from_csv,
     get_ranking_explanation,
     compute_final_weights
@@ -186,15 +187,11 @@ def demo_4_scenario_comparison():
         "top_n": 10
     }
     
-    # Run ranking with different resource configs
+    # Rank all resource configs in one pass (shared cleaning, filtering and scoring)
     configs = ["none", "solar", "battery", "solar_battery", "firm_gen"]
-    all_results = {}
     
     print("Running rankings for different resource configurations...\n")
-    for config in configs:
-        print(f"  - {config}")
-        results = rank_nodes(**common_params, resource_config=config)
-        all_results[config] = results
+    all_results, comparison = rank_nodes_scenarios(**common_params, resource_configs=configs)
     
     # Compare top node across scenarios
     print("\n\nTop Node Across Different Resource Configurations:")
@@ -223,6 +220,12 @@ def demo_4_scenario_comparison():
     print(results_solar_battery.head(5)[['node', 'score_scenario', 'cost_score',
                                           'effective_price_variability_penalty_score']].to_string(index=False))
     
+    # Side-by-side rank changes for every node in any config's top 10
+    print("\n\nRank Changes vs. No Resources (positive = moves up):")
+    print("-" * 100)
+    print(comparison[['node', 'rank_baseline'] + [f'rank_delta_{c}' for c in configs] + ['best_config']]
+          .to_string(index=False))
+    
     return all_results
 
 
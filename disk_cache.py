@@ -0,0 +1,298 @@
+"""
+Persistent Ranking Result Cache
+
+Stores full ranking results in a local SQLite file so they survive restarts
+and deploys, and are shared by all worker processes on a host.
+
+Results are stored compactly (see CompactResults): the row positions of the
+ranked nodes in the dataset snapshot, plus only the columns the ranking added
+(component scores, composite scores, ranks). Original node columns are
+restored from the snapshot itself, so an entry is a few bytes per ranked row
+and decoding is a single positional take. The in-memory ranking cache holds
+results in the same form.
+
+Usage:
+    from disk_cache import CompactResults, DiskResultCache
+
+    cache = DiskResultCache("rankings.sqlite3")
+    cache.put(key, CompactResults.from_frame(results_df, store), stats)
+    hit = cache.get(key, store)     # (CompactResults, stats) or None
+"""
+
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from node_store import NodeStore
+
+
+class CompactResults:
+    """
+    Ranked results stored relative to the snapshot they were computed from.
+
+    Holds the positions of the ranked rows in store.nodes_df, in rank order,
+    and a DataFrame of only the columns the ranking added. Rows are gathered
+    from the snapshot on demand, so a full ranking costs the added columns
+    plus one integer per row instead of a copy of every node column.
+
+    If the snapshot's node IDs aren't unique, rows can't be located and
+    positions is None; added then holds the complete results.
+
+    Attributes:
+        store: Snapshot the results were computed on
+        positions: Row positions in store.nodes_df (None, see above)
+        added: Columns added by the ranking, one row per result, indexed like
+               the original results
+    """
+
+    def __init__(self, store: NodeStore, positions: Optional[np.ndarray], added: pd.DataFrame):
+        self.store = store
+        self.positions = positions
+        self.added = added
+
+    @classmethod
+    def from_frame(cls, results: pd.DataFrame, store: NodeStore) -> "CompactResults":
+        """
+        Compacts ranked results.
+
+        Args:
+            results: Ranked results whose rows are (copies of) rows of
+                     store.nodes_df, with all or only some original columns
+                     (at least 'node', see rank_nodes(columns=...))
+            store: Dataset snapshot the results were computed on
+
+        Raises:
+            KeyError: If a node ID is not in the snapshot
+        """
+        if len(results) == 0:
+            return cls(store, np.array([], dtype=np.int64), pd.DataFrame(index=results.index))
+        positions = store.node_positions(results['node'])
+        if positions is None:
+            return cls(store, None, results)
+        added = results[[c for c in results.columns if c not in store.nodes_df.columns]]
+        return cls(store, positions, added)
+
+    def __len__(self) -> int:
+        return len(self.added)
+
+    @property
+    def columns(self) -> list:
+        """Columns of the full results: the snapshot's, then the added ones."""
+        if self.positions is None:
+            return list(self.added.columns)
+        return list(self.store.nodes_df.columns) + list(self.added.columns)
+
+    def head(self, n: int) -> "CompactResults":
+        """Returns the first n results, sharing this object's arrays."""
+        positions = self.positions[:n] if self.positions is not None else None
+        return CompactResults(self.store, positions, self.added.iloc[:n])
+
+    def rows(self, start: int = 0, stop: Optional[int] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Returns results [start, stop) as a DataFrame.
+
+        Only the requested rows (and columns, default all; missing ones are
+        skipped) are gathered from the snapshot.
+        """
+        added = self.added.iloc[start:stop]
+        if columns is not None:
+            added = added[[c for c in added.columns if c in columns]]
+        if self.positions is None:
+            return added
+        nodes_df = self.store.nodes_df
+        positions = self.positions[start:stop]
+        if columns is None:
+            rows = nodes_df.iloc[positions]
+        else:
+            keep = [c for c in nodes_df.columns if c in columns and c not in added.columns]
+            rows = nodes_df.iloc[positions, nodes_df.columns.get_indexer(keep)]
+        rows.index = added.index
+        return pd.concat([rows, added], axis=1)
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns one column for all results, in rank order."""
+        if name in self.added.columns:
+            return self.added[name].to_numpy()
+        return self.store.nodes_df[name].to_numpy()[self.positions]
+
+    def nbytes(self) -> int:
+        """Approximate memory held (the snapshot itself is shared)."""
+        size = int(self.added.memory_usage(deep=False).sum())
+        return size + (self.positions.nbytes if self.positions is not None else 0)
+
+
+def encode_results(results: CompactResults) -> Optional[bytes]:
+    """
+    Encodes compact results for storage.
+
+    Args:
+        results: Results to encode
+
+    Object columns (e.g. search point IDs, which may be strings, numbers or
+    null) are stored as JSON so every value round-trips with its type.
+
+    Returns:
+        Encoded bytes, or None if the results can't be expressed relative to
+        the snapshot (node IDs aren't unique) or an object column holds
+        values JSON can't represent exactly
+    """
+    if results.positions is None:
+        return None
+
+    added = list(results.added.columns)
+    json_columns = []
+    arrays = {"positions": results.positions.astype(np.int32)}
+    if pd.api.types.is_integer_dtype(results.added.index):
+        arrays["index"] = results.added.index.to_numpy()
+    for i, column in enumerate(added):
+        values = results.added[column].to_numpy()
+        if values.dtype == object:
+            try:
+                values = np.array(json.dumps(values.tolist()))
+            except (TypeError, ValueError):
+                return None
+            json_columns.append(column)
+        arrays[f"c{i}"] = values
+
+    buffer = io.BytesIO()
+    np.savez(buffer, added=np.array(json.dumps(added)),
+             json_columns=np.array(json.dumps(json_columns)), **arrays)
+    return buffer.getvalue()
+
+
+def decode_results(blob: bytes, store: NodeStore) -> CompactResults:
+    """Rebuilds compact results from encode_results() output."""
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        added = json.loads(str(data["added"]))
+        json_columns = set(json.loads(str(data["json_columns"])))
+        positions = data["positions"].astype(np.int64)
+        index = data["index"] if "index" in data else store.nodes_df.index[positions]
+        columns = {}
+        for i, column in enumerate(added):
+            if column in json_columns:
+                values = json.loads(str(data[f"c{i}"]))
+                columns[column] = np.empty(len(values), dtype=object)
+                columns[column][:] = values
+            else:
+                columns[column] = data[f"c{i}"]
+        extra = pd.DataFrame(columns, index=index)
+    return CompactResults(store, positions, extra)
+
+
+class DiskResultCache:
+    """
+    SQLite-backed cache of ranking results, keyed by canonical request key.
+
+    Keys must include the dataset version (see api_server.get_full_ranking),
+    and entries are only decoded against the snapshot with that version. The
+    file is bounded by max_bytes; least recently used entries are evicted.
+    Each thread and process opens its own connection.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                data BLOB NOT NULL,
+                stats TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._connect().execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections can't be shared across fork, so they are per pid and thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str, store: NodeStore) -> Optional[Tuple[CompactResults, Dict[str, Any]]]:
+        """
+        Looks up a ranking.
+
+        Returns:
+            (results, stage stats) or None on a miss
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT data, stats FROM results WHERE key = ? AND version = ?", (key, store.version)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            results = decode_results(row[0], store)
+        except (sqlite3.Error, ValueError, KeyError, IndexError) as e:
+            print(f"Disk cache read failed: {e}")
+            self.stats["errors"] += 1
+            return None
+        self.stats["hits"] += 1
+        return results, json.loads(row[1])
+
+    def put(self, key: str, results: CompactResults, stats: Dict[str, Any]) -> bool:
+        """
+        Stores a ranking, evicting least recently used entries beyond max_bytes.
+
+        Returns:
+            True if stored
+        """
+        blob = encode_results(results)
+        if blob is None or len(blob) > self.max_bytes:
+            return False
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, version, data, stats, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, results.store.version, blob, json.dumps(stats), len(blob), time.time())
+            )
+            self.stats["writes"] += 1
+            self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Disk cache write failed: {e}")
+            self.stats["errors"] += 1
+            return False
+        return True
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        evict = []
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY accessed_at"):
+            evict.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM results WHERE key = ?", evict)
+        self.stats["evictions"] += len(evict)
+
+    def size_bytes(self) -> int:
+        """Total size of stored results."""
+        return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def clear(self):
+        """Removes all entries."""
+        self._connect().execute("DELETE FROM results")
@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for the Node Ranking Engine API.
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Settings can be overridden with environment variables:
+    API_BIND       - Address to bind (default 0.0.0.0:5001)
+    API_WORKERS    - Worker processes (default: number of CPU cores)
+    API_THREADS    - Threads per worker (default 10)
+    API_TIMEOUT    - Worker timeout in seconds (default 120)
+    API_MAX_REQUESTS - Requests before a worker is recycled (default 5000, 0 = never)
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("API_BIND", "0.0.0.0:5001")
+
+# One worker per core: rank_nodes is CPU-bound, so throughput scales with processes
+workers = int(os.environ.get("API_WORKERS", multiprocessing.cpu_count()))
+
+# A few threads per worker keep cheap endpoints (health, weights) responsive
+# while a ranking is running in the same worker. Requests queued by admission
+# control hold a thread, so threads should exceed the batch plus interactive
+# concurrency and queue limits in api_server.py (3 + 6 by default), or batch
+# traffic can occupy every thread and starve the UI.
+worker_class = "gthread"
+threads = int(os.environ.get("API_THREADS", "10"))
+
+timeout = int(os.environ.get("API_TIMEOUT", "120"))
+
+# Import wsgi.py (and load the dataset) once in the parent, then fork workers
+# that share the node arrays copy-on-write
+preload_app = True
+
+# Restart workers periodically to bound any per-worker memory growth. A
+# recycled worker also stops the sweep jobs (/api/jobs) it is running, which
+# then report "Interrupted"; set API_MAX_REQUESTS=0 on hosts that run long
+# sweeps.
+max_requests = int(os.environ.get("API_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.environ.get("API_MAX_REQUESTS_JITTER", "500"))
@@ -0,0 +1,326 @@
+"""
+Traffic Replay Load Test for the Node Ranking API
+
+Replays a JSONL file of /api/rank and /api/submit payloads, either in-process
+(Flask test client, no server needed) or against a running server, and reports
+throughput and latency percentiles.
+
+Each line of the input file may be:
+    - {"endpoint": "/api/rank", "payload": {...}, "query": {...}}
+      (the format written by the slow-query log, SLOW_QUERY_LOG_FILE)
+    - a bare /api/submit payload (has "loadConfig")
+    - a bare /api/rank payload (has "load_type")
+Any other line is skipped.
+
+Usage:
+    python load_test.py slow_queries.jsonl                          # in-process
+    python load_test.py cases.jsonl --url http://localhost:5000 -c 8
+    python load_test.py cases.jsonl --rate 20 -n 500                # open loop
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Endpoints that can be replayed
+REPLAY_ENDPOINTS = ["/api/rank", "/api/submit"]
+
+
+# ============================================================================
+# LOADING CASES
+# ============================================================================
+
+def parse_case(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Parses one JSONL line into a replay case.
+
+    Args:
+        line: Line from the input file
+
+    Returns:
+        {"endpoint", "payload", "query"}, or None if the line isn't a case
+    """
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+
+    if isinstance(record.get("payload"), dict) and record.get("endpoint") in REPLAY_ENDPOINTS:
+        return {
+            "endpoint": record["endpoint"],
+            "payload": record["payload"],
+            "query": record.get("query") or {}
+        }
+    if "loadConfig" in record:
+        return {"endpoint": "/api/submit", "payload": record, "query": {}}
+    if "load_type" in record:
+        return {"endpoint": "/api/rank", "payload": record, "query": {}}
+    return None
+
+
+def load_cases(path: str) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Loads replay cases from a JSONL file.
+
+    Returns:
+        (cases, number of skipped non-empty lines)
+    """
+    cases = []
+    skipped = 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            case = parse_case(line)
+            if case is None:
+                skipped += 1
+            else:
+                cases.append(case)
+    return cases, skipped
+
+
+# ============================================================================
+# TARGETS
+# ============================================================================
+
+class InProcessTarget:
+    """Sends requests to api_server.app through the Flask test client."""
+
+    def __init__(self, data_file: Optional[str] = None):
+        import api_server
+        if data_file:
+            api_server.DATA_FILE = data_file
+        api_server.load_data()
+        self.app = api_server.app
+
+    def send(self, case: Dict[str, Any]) -> Tuple[int, int]:
+        """Returns (status code, response bytes)."""
+        client = self.app.test_client()
+        response = client.post(case["endpoint"], json=case["payload"], query_string=case["query"])
+        size = len(response.get_data())  # Consumes streamed bodies
+        response.close()
+        return response.status_code, size
+
+
+class HttpTarget:
+    """Sends requests to a running server over HTTP."""
+
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def send(self, case: Dict[str, Any]) -> Tuple[int, int]:
+        """Returns (status code, response bytes); status 0 on connection errors."""
+        url = self.base_url + case["endpoint"]
+        if case["query"]:
+            url += "?" + urllib.parse.urlencode(case["query"])
+        req = urllib.request.Request(
+            url, data=json.dumps(case["payload"]).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read())
+        except (urllib.error.URLError, OSError):
+            return 0, 0
+
+
+# ============================================================================
+# RUNNING
+# ============================================================================
+
+def run_load_test(target, cases: List[Dict[str, Any]], num_requests: int,
+                  concurrency: int = 1, rate: Optional[float] = None,
+                  seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Replays cases against a target.
+
+    Without a rate, runs closed-loop: `concurrency` workers each send their
+    next request as soon as the previous one completes. With a rate, runs
+    open-loop: requests arrive as a Poisson process at `rate` per second and
+    are served by up to `concurrency` workers. Open-loop latency is measured
+    from the scheduled arrival time, so queueing delay is included even when
+    the server falls behind.
+
+    Args:
+        target: InProcessTarget or HttpTarget
+        cases: Replay cases, sent in order and repeated as needed
+        num_requests: Total requests to send
+        concurrency: Number of concurrent workers
+        rate: Arrival rate in requests/second (None for closed-loop)
+        seed: Random seed for arrival times
+
+    Returns:
+        One dict per request: endpoint, status (0 if the request failed),
+        bytes, latency_s, start_s, end_s
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * num_requests
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+
+    def send(i: int, scheduled: float):
+        case = cases[i % len(cases)]
+        start = t0 + scheduled if rate else time.perf_counter()
+        try:
+            status, size = target.send(case)
+        except Exception as e:
+            print(f"Request {i} failed: {e}", file=sys.stderr)
+            status, size = 0, 0
+        end = time.perf_counter()
+        results[i] = {
+            "endpoint": case["endpoint"], "status": status, "bytes": size,
+            "latency_s": end - start, "start_s": start - t0, "end_s": end - t0
+        }
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if rate:
+            scheduled = 0.0
+            for i in range(num_requests):
+                delay = t0 + scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(send, i, scheduled)
+                scheduled += rng.expovariate(rate)
+        else:
+            counter = iter(range(num_requests))
+            lock = threading.Lock()
+
+            def worker():
+                while True:
+                    with lock:
+                        i = next(counter, None)
+                    if i is None:
+                        return
+                    send(i, 0.0)
+
+            for _ in range(concurrency):
+                pool.submit(worker)
+
+    return results
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Computes throughput and latency percentiles, overall and per endpoint.
+
+    Returns:
+        {"requests", "errors", "status_counts", "duration_s",
+         "throughput_rps", "latency_ms": {...}, "endpoints": {...}}
+    """
+    def latency_stats(rows):
+        latencies = np.array([r["latency_s"] for r in rows]) * 1000.0
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "count": len(rows),
+            "mean": round(float(latencies.mean()), 2),
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2),
+            "max": round(float(latencies.max()), 2)
+        }
+
+    duration = max(r["end_s"] for r in results) - min(r["start_s"] for r in results)
+    status_counts: Dict[str, int] = {}
+    for r in results:
+        status_counts[str(r["status"])] = status_counts.get(str(r["status"]), 0) + 1
+
+    by_endpoint: Dict[str, list] = {}
+    for r in results:
+        by_endpoint.setdefault(r["endpoint"], []).append(r)
+
+    return {
+        "requests": len(results),
+        "errors": sum(1 for r in results if not 200 <= r["status"] < 400),
+        "status_counts": status_counts,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(results) / duration, 2) if duration > 0 else None,
+        "mean_response_bytes": int(np.mean([r["bytes"] for r in results])),
+        "latency_ms": latency_stats(results),
+        "endpoints": {endpoint: latency_stats(rows) for endpoint, rows in sorted(by_endpoint.items())}
+    }
+
+
+def print_summary(summary: Dict[str, Any]):
+    """Prints a load test summary."""
+    print("\n" + "=" * 80)
+    print("LOAD TEST RESULTS")
+    print("=" * 80)
+    print(f"Requests:    {summary['requests']} ({summary['errors']} errors)")
+    print(f"Status:      {summary['status_counts']}")
+    print(f"Duration:    {summary['duration_s']:.2f} s")
+    print(f"Throughput:  {summary['throughput_rps']} req/s")
+    print(f"Avg size:    {summary['mean_response_bytes']} bytes")
+    print(f"\n{'Endpoint':<16} {'Count':>7} {'Mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'Max':>9}   (ms)")
+    rows = [("(all)", summary["latency_ms"])] + list(summary["endpoints"].items())
+    for name, s in rows:
+        print(f"{name:<16} {s['count']:>7} {s['mean']:>9.1f} {s['p50']:>9.1f} "
+              f"{s['p95']:>9.1f} {s['p99']:>9.1f} {s['max']:>9.1f}")
+    print("=" * 80)
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay ranking requests and measure latency.")
+    parser.add_argument("cases", help="JSONL file of payloads or slow-query log records")
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process)")
+    parser.add_argument("--data-file", help="Node CSV for in-process runs (default: api_server.DATA_FILE)")
+    parser.add_argument("-n", "--num-requests", type=int, help="Total requests (default: one per case)")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="Concurrent workers (default 1)")
+    parser.add_argument("--rate", type=float, help="Open-loop arrival rate in requests/second")
+    parser.add_argument("--shuffle", action="store_true", help="Shuffle cases before replaying")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (shuffle, arrivals)")
+    parser.add_argument("--no-warmup", action="store_true", help="Don't send one untimed request first")
+    parser.add_argument("--output", help="Write the summary as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show in-process server output")
+    args = parser.parse_args()
+
+    cases, skipped = load_cases(args.cases)
+    print(f"Loaded {len(cases)} cases from {args.cases} ({skipped} other lines skipped)")
+    if not cases:
+        print("ERROR: No replayable cases found.")
+        exit(1)
+    if args.shuffle:
+        random.Random(args.seed).shuffle(cases)
+
+    num_requests = args.num_requests or len(cases)
+    quiet = args.url is None and not args.verbose
+
+    # Server output goes to /dev/null in quiet mode; failures still reach stderr
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext():
+            target = HttpTarget(args.url) if args.url else InProcessTarget(args.data_file)
+            if not args.no_warmup:
+                target.send(cases[0])
+            results = run_load_test(target, cases, num_requests, args.concurrency, args.rate, args.seed)
+
+    summary = summarize(results)
+    summary.update(target=args.url or "in-process", concurrency=args.concurrency, rate=args.rate)
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
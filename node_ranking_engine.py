@@ -9,7 +9,11 @@ All operations are fully vectorized using pandas/numpy for maximum performance.
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+import bisect
+import heapq
+import json
+import time
 import warnings
 
 warnings.filterwarnings('ignore', category=RuntimeWarning)
@@ -19,7 +23,8 @@ warnings.filterwarnings('ignore', category=RuntimeWarning)
 # NORMALIZATION HELPERS
 # ============================================================================
 
-def robust_min_max(series: pd.Series, clip_low: float = 0.05, clip_high: float = 0.95) -> pd.Series:
+def robust_min_max(series: pd.Series, clip_low: float = 0.05, clip_high: float = 0.95,
+                   bounds: Optional[Tuple[float, float]] = None) -> pd.Series:
     """
     Robust min-max normalization with quantile clipping.
     
@@ -30,6 +35,8 @@ def robust_min_max(series: pd.Series, clip_low: float = 0.05, clip_high: float =
         series: Input series to normalize
         clip_low: Lower quantile for clipping (default 5%)
         clip_high: Upper quantile for clipping (default 95%)
+        bounds: Precomputed (q_low, q_high) quantiles of series, e.g. from
+                NodeStore.quantile_bounds(); skips the quantile computation
     
     Returns:
         Normalized series in [0, 1] range
@@ -38,8 +45,11 @@ def robust_min_max(series: pd.Series, clip_low: float = 0.05, clip_high: float =
         return pd.Series(0.5, index=series.index)
     
     # Compute quantile bounds
-    q_low = series.quantile(clip_low)
-    q_high = series.quantile(clip_high)
+    if bounds is not None:
+        q_low, q_high = bounds
+    else:
+        q_low = series.quantile(clip_low)
+        q_high = series.quantile(clip_high)
     
     # Handle constant series
     if q_high - q_low < 1e-9:
@@ -52,6 +62,49 @@ def robust_min_max(series: pd.Series, clip_low: float = 0.05, clip_high: float =
     return normalized.fillna(0.5)
 
 
+def robust_min_max_matrix(values: np.ndarray, clip_low: float = 0.05, clip_high: float = 0.95,
+                          bounds: Optional[List[Optional[Tuple[float, float]]]] = None) -> np.ndarray:
+    """
+    Column-wise robust_min_max() for a 2-D array, in one vectorized pass.
+    
+    Each column gives exactly the values robust_min_max() gives for that
+    column as a Series (same quantile interpolation, clipping, constant and
+    all-NaN handling).
+    
+    Args:
+        values: (rows x columns) array
+        clip_low: Lower quantile for clipping (default 5%)
+        clip_high: Upper quantile for clipping (default 95%)
+        bounds: Optional precomputed (q_low, q_high) per column; None entries
+                are computed
+    
+    Returns:
+        Normalized array in [0, 1] range, same shape as values
+    """
+    values = np.asarray(values, dtype=float)
+    n_cols = values.shape[1]
+    all_nan = np.isnan(values).all(axis=0)
+    
+    # Quantiles the way pandas computes them (percentiles of the non-NaN values)
+    q_low = np.full(n_cols, np.nan)
+    q_high = np.full(n_cols, np.nan)
+    if (~all_nan).any():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            q_low[~all_nan], q_high[~all_nan] = np.nanpercentile(
+                values[:, ~all_nan], np.array([clip_low, clip_high]) * 100, axis=0)
+    for j, column_bounds in enumerate(bounds or []):
+        if column_bounds is not None:
+            q_low[j], q_high[j] = column_bounds
+    
+    span = q_high - q_low
+    constant = all_nan | (span < 1e-9)
+    span = np.where(constant, 1.0, span)
+    normalized = (np.clip(values, q_low, q_high) - q_low) / span
+    normalized[:, constant] = 0.5
+    return np.where(np.isnan(normalized), 0.5, normalized)
+
+
 def invert_score(z: pd.Series) -> pd.Series:
     """
     Inverts a [0,1] score where lower raw values are better.
@@ -68,6 +121,13 @@ def invert_score(z: pd.Series) -> pd.Series:
     return 1.0 - z
 
 
+def _bounds(column_bounds: Optional[Dict], column: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Looks up precomputed quantile bounds for a raw column, if available."""
+    if column_bounds is None or column is None:
+        return None
+    return column_bounds.get(column)
+
+
 # ============================================================================
 # SPATIAL FILTERING
 # ============================================================================
@@ -140,6 +200,34 @@ def apply_spatial_filter(df: pd.DataFrame, location_filter: Optional[Dict]) -> p
 # DATA VALIDATION AND PREPROCESSING
 # ============================================================================
 
+# Numeric columns coerced (and median-imputed) during cleaning
+NUMERIC_COLUMNS = [
+    'avg_lmp', 'avg_energy', 'avg_congestion', 'avg_loses',
+    'avg_price_per_acre', 'county_emissions_intensity_kg_per_mwh',
+    'latitude', 'longitude',
+    'is_h2_hub_state', 'state_dc_incentive_level', 'state_clean_energy_friendly',
+    'has_hosting_capacity_map', 'policy_fit_electrolyzer', 'policy_fit_datacenter',
+    'queue_pending_mw', 'queue_advanced_share', 'queue_renewable_storage_share',
+    'queue_pressure_index', 'price_variance_score'
+]
+
+# Policy and queue columns clipped to [0, 1] during cleaning
+BOUNDED_COLUMNS = [
+    'is_h2_hub_state', 'state_dc_incentive_level', 'state_clean_energy_friendly',
+    'has_hosting_capacity_map', 'policy_fit_electrolyzer', 'policy_fit_datacenter',
+    'queue_advanced_share', 'queue_renewable_storage_share'
+]
+
+# Raw columns normalized directly with robust_min_max over the full dataset;
+# their quantile bounds can be precomputed (see NodeStore.quantile_bounds)
+ORDER_STAT_COLUMNS = [
+    'avg_lmp', 'avg_price_per_acre', 'county_emissions_intensity_kg_per_mwh',
+    'policy_fit_electrolyzer', 'policy_fit_datacenter',
+    'queue_pending_mw', 'queue_advanced_share', 'queue_renewable_storage_share',
+    'queue_pressure_index', 'price_variance_score'
+]
+
+
 def validate_and_clean_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     Validates critical fields and handles missing/bad values.
@@ -170,19 +258,8 @@ def validate_and_clean_data(df: pd.DataFrame) -> pd.DataFrame:
     if dropped_rows > 0:
         print(f"Dropped {dropped_rows} rows with missing critical fields")
     
-    # Numeric columns to coerce and validate
-    numeric_cols = [
-        'avg_lmp', 'avg_energy', 'avg_congestion', 'avg_loses',
-        'avg_price_per_acre', 'county_emissions_intensity_kg_per_mwh',
-        'latitude', 'longitude',
-        'is_h2_hub_state', 'state_dc_incentive_level', 'state_clean_energy_friendly',
-        'has_hosting_capacity_map', 'policy_fit_electrolyzer', 'policy_fit_datacenter',
-        'queue_pending_mw', 'queue_advanced_share', 'queue_renewable_storage_share',
-        'queue_pressure_index', 'price_variance_score'
-    ]
-    
     # Coerce to numeric and handle bad values with median imputation
-    for col in numeric_cols:
+    for col in NUMERIC_COLUMNS:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='coerce')
             if df[col].isna().any():
@@ -190,13 +267,7 @@ def validate_and_clean_data(df: pd.DataFrame) -> pd.DataFrame:
                 df[col] = df[col].fillna(median_val)
     
     # Ensure policy and queue scores are bounded [0, 1] approximately
-    bounded_cols = [
-        'is_h2_hub_state', 'state_dc_incentive_level', 'state_clean_energy_friendly',
-        'has_hosting_capacity_map', 'policy_fit_electrolyzer', 'policy_fit_datacenter',
-        'queue_advanced_share', 'queue_renewable_storage_share'
-    ]
-    
-    for col in bounded_cols:
+    for col in BOUNDED_COLUMNS:
         if col in df.columns:
             df[col] = df[col].clip(lower=0.0, upper=1.0)
     
@@ -207,7 +278,7 @@ def validate_and_clean_data(df: pd.DataFrame) -> pd.DataFrame:
 # COMPONENT SCORE CALCULATION
 # ============================================================================
 
-def compute_cost_score(df: pd.DataFrame) -> pd.Series:
+def compute_cost_score(df: pd.DataFrame, column_bounds: Optional[Dict] = None) -> pd.Series:
     """
     Computes cost score (higher is better).
     
@@ -216,6 +287,7 @@ def compute_cost_score(df: pd.DataFrame) -> pd.Series:
     
     Args:
         df: DataFrame with avg_lmp column
+        column_bounds: Optional precomputed quantile bounds per raw column
     
     Returns:
         Cost score series [0, 1] where higher is better
@@ -224,7 +296,7 @@ def compute_cost_score(df: pd.DataFrame) -> pd.Series:
     total_cost_proxy = df['avg_lmp'].copy()
     
     # Normalize using robust method
-    cost_norm_raw = robust_min_max(total_cost_proxy)
+    cost_norm_raw = robust_min_max(total_cost_proxy, bounds=_bounds(column_bounds, 'avg_lmp'))
     
     # Invert: lower cost is better
     cost_score = invert_score(cost_norm_raw)
@@ -232,7 +304,7 @@ def compute_cost_score(df: pd.DataFrame) -> pd.Series:
     return cost_score
 
 
-def compute_land_score(df: pd.DataFrame) -> pd.Series:
+def compute_land_score(df: pd.DataFrame, column_bounds: Optional[Dict] = None) -> pd.Series:
     """
     Computes land cost score (higher is better).
     
@@ -240,17 +312,19 @@ def compute_land_score(df: pd.DataFrame) -> pd.Series:
     
     Args:
         df: DataFrame with avg_price_per_acre column
+        column_bounds: Optional precomputed quantile bounds per raw column
     
     Returns:
         Land score series [0, 1] where higher is better
     """
-    land_cost_norm_raw = robust_min_max(df['avg_price_per_acre'])
+    land_cost_norm_raw = robust_min_max(df['avg_price_per_acre'],
+                                        bounds=_bounds(column_bounds, 'avg_price_per_acre'))
     land_score = invert_score(land_cost_norm_raw)
     
     return land_score
 
 
-def compute_emissions_score(df: pd.DataFrame) -> pd.Series:
+def compute_emissions_score(df: pd.DataFrame, column_bounds: Optional[Dict] = None) -> pd.Series:
     """
     Computes emissions score (higher is better).
     
@@ -258,17 +332,22 @@ def compute_emissions_score(df: pd.DataFrame) -> pd.Series:
     
     Args:
         df: DataFrame with county_emissions_intensity_kg_per_mwh column
+        column_bounds: Optional precomputed quantile bounds per raw column
     
     Returns:
         Emissions score series [0, 1] where higher is better
     """
-    emissions_intensity_norm_raw = robust_min_max(df['county_emissions_intensity_kg_per_mwh'])
+    emissions_intensity_norm_raw = robust_min_max(
+        df['county_emissions_intensity_kg_per_mwh'],
+        bounds=_bounds(column_bounds, 'county_emissions_intensity_kg_per_mwh')
+    )
     emissions_score = invert_score(emissions_intensity_norm_raw)
     
     return emissions_score
 
 
-def compute_policy_score(df: pd.DataFrame, load_type: str) -> pd.Series:
+def compute_policy_score(df: pd.DataFrame, load_type: str,
+                         column_bounds: Optional[Dict] = None) -> pd.Series:
     """
     Computes policy alignment score (higher is better).
     
@@ -278,14 +357,18 @@ def compute_policy_score(df: pd.DataFrame, load_type: str) -> pd.Series:
     Args:
         df: DataFrame with policy-related columns
         load_type: Type of load being sited
+        column_bounds: Optional precomputed quantile bounds per raw column
     
     Returns:
         Policy score series [0, 1] where higher is better
     """
+    policy_column = None
     if load_type in ["h2_electrolyzer_firm"]:
-        policy_base = df['policy_fit_electrolyzer'].copy()
+        policy_column = 'policy_fit_electrolyzer'
+        policy_base = df[policy_column].copy()
     elif load_type in ["data_center_always_on", "data_center_flexible"]:
-        policy_base = df['policy_fit_datacenter'].copy()
+        policy_column = 'policy_fit_datacenter'
+        policy_base = df[policy_column].copy()
     else:
         # For other load types, combine underlying policy primitives
         policy_base = (
@@ -296,12 +379,12 @@ def compute_policy_score(df: pd.DataFrame, load_type: str) -> pd.Series:
         )
     
     # Normalize to [0, 1]
-    policy_score = robust_min_max(policy_base)
+    policy_score = robust_min_max(policy_base, bounds=_bounds(column_bounds, policy_column))
     
     return policy_score
 
 
-def compute_queue_score(df: pd.DataFrame) -> pd.Series:
+def compute_queue_score(df: pd.DataFrame, column_bounds: Optional[Dict] = None) -> pd.Series:
     """
     Computes interconnection queue score (higher is better).
     
@@ -313,22 +396,27 @@ def compute_queue_score(df: pd.DataFrame) -> pd.Series:
     
     Args:
         df: DataFrame with queue-related columns
+        column_bounds: Optional precomputed quantile bounds per raw column
     
     Returns:
         Queue score series [0, 1] where higher is better
     """
     # Pending MW: less is better
-    queue_pending_norm_raw = robust_min_max(df['queue_pending_mw'])
+    queue_pending_norm_raw = robust_min_max(df['queue_pending_mw'],
+                                            bounds=_bounds(column_bounds, 'queue_pending_mw'))
     queue_pending_score = invert_score(queue_pending_norm_raw)
     
     # Advanced share: more is better
-    queue_advanced_score = robust_min_max(df['queue_advanced_share'])
+    queue_advanced_score = robust_min_max(df['queue_advanced_share'],
+                                          bounds=_bounds(column_bounds, 'queue_advanced_share'))
     
     # Green share: more is better
-    queue_green_share_score = robust_min_max(df['queue_renewable_storage_share'])
+    queue_green_share_score = robust_min_max(df['queue_renewable_storage_share'],
+                                             bounds=_bounds(column_bounds, 'queue_renewable_storage_share'))
     
     # Pressure index: less is better
-    queue_pressure_norm_raw = robust_min_max(df['queue_pressure_index'])
+    queue_pressure_norm_raw = robust_min_max(df['queue_pressure_index'],
+                                             bounds=_bounds(column_bounds, 'queue_pressure_index'))
     queue_pressure_score = invert_score(queue_pressure_norm_raw)
     
     # Combine into composite score
@@ -345,7 +433,19 @@ def compute_queue_score(df: pd.DataFrame) -> pd.Series:
     return queue_score
 
 
-def compute_variability_scores(df: pd.DataFrame, resource_config: str) -> Tuple[pd.Series, pd.Series]:
+# Variability Adjustment Factors: share of price variability exposure that
+# remains with each on-site resource configuration
+VARIABILITY_ADJUSTMENT_FACTORS = {
+    "none": 1.0,
+    "solar": 0.7,
+    "battery": 0.6,
+    "solar_battery": 0.4,
+    "firm_gen": 0.25,
+}
+
+
+def compute_variability_scores(df: pd.DataFrame, resource_config: str,
+                               column_bounds: Optional[Dict] = None) -> Tuple[pd.Series, pd.Series]:
     """
     Computes baseline and effective price variability penalty scores.
     
@@ -355,24 +455,16 @@ def compute_variability_scores(df: pd.DataFrame, resource_config: str) -> Tuple[
     Args:
         df: DataFrame with price_variance_score column
         resource_config: One of "none", "solar", "battery", "solar_battery", "firm_gen"
+        column_bounds: Optional precomputed quantile bounds per raw column
     
     Returns:
         Tuple of (baseline_penalty_score, effective_penalty_score), both [0, 1] higher is better
     """
-    # Variability Adjustment Factors
-    VAF = {
-        "none": 1.0,
-        "solar": 0.7,
-        "battery": 0.6,
-        "solar_battery": 0.4,
-        "firm_gen": 0.25,
-    }
-    
     # Baseline (no on-site resources)
     baseline_price_variance_score = df['price_variance_score'].copy()
     
     # Compute effective variance with VAF
-    vaf = VAF.get(resource_config, 1.0)
+    vaf = VARIABILITY_ADJUSTMENT_FACTORS.get(resource_config, 1.0)
     is_non_rto = (df['price_variance_score'] == 1.0)
     
     if resource_config == "none":
@@ -383,15 +475,50 @@ def compute_variability_scores(df: pd.DataFrame, resource_config: str) -> Tuple[
         effective_price_variance_score[is_non_rto] = 1.0
     
     # Normalize and invert to penalty scores (higher is better)
-    baseline_price_variance_norm = robust_min_max(baseline_price_variance_score)
+    baseline_bounds = _bounds(column_bounds, 'price_variance_score')
+    baseline_price_variance_norm = robust_min_max(baseline_price_variance_score, bounds=baseline_bounds)
     price_variability_penalty_score = invert_score(baseline_price_variance_norm)
     
-    effective_price_variance_norm = robust_min_max(effective_price_variance_score)
+    effective_price_variance_norm = robust_min_max(
+        effective_price_variance_score,
+        bounds=baseline_bounds if resource_config == "none" else None
+    )
     effective_price_variability_penalty_score = invert_score(effective_price_variance_norm)
     
     return price_variability_penalty_score, effective_price_variability_penalty_score
 
 
+def compute_variability_matrix(df: pd.DataFrame, resource_configs: List[str],
+                               column_bounds: Optional[Dict] = None) -> np.ndarray:
+    """
+    Computes effective price variability penalty scores for several resource
+    configs at once.
+    
+    Scales price_variance_score by every config's VAF as one (nodes x configs)
+    matrix (non-RTO nodes pinned to 1.0) and normalizes all columns together.
+    Column j equals the effective score compute_variability_scores() returns
+    for resource_configs[j].
+    
+    Args:
+        df: DataFrame with price_variance_score column
+        resource_configs: Resource configs, one output column each
+        column_bounds: Optional precomputed quantile bounds per raw column
+                       (used for "none", whose effective score is the baseline)
+    
+    Returns:
+        (nodes x len(resource_configs)) array, [0, 1] higher is better
+    """
+    price_variance = df['price_variance_score'].to_numpy(dtype=float)
+    vafs = np.array([VARIABILITY_ADJUSTMENT_FACTORS.get(c, 1.0) for c in resource_configs])
+    
+    effective = price_variance[:, None] * vafs
+    effective[price_variance == 1.0, :] = 1.0
+    
+    baseline_bounds = _bounds(column_bounds, 'price_variance_score')
+    bounds = [baseline_bounds if c == "none" else None for c in resource_configs]
+    return 1.0 - robust_min_max_matrix(effective, bounds=bounds)
+
+
 # ============================================================================
 # WEIGHT ADJUSTMENT LOGIC
 # ============================================================================
@@ -496,6 +623,10 @@ def get_size_multipliers(load_size_mw: float) -> Dict[str, float]:
         return {"queue": 1.4, "variability": 1.3, "cost": 0.9}
 
 
+# Emissions preference above which cost and queue weights are reduced
+HIGH_EMISSIONS_PREFERENCE = 80
+
+
 def compute_final_weights(load_type: str, load_size_mw: float, 
                           emissions_preference: float) -> Dict[str, float]:
     """
@@ -530,7 +661,7 @@ def compute_final_weights(load_type: str, load_size_mw: float,
     emissions_factor = 0.5 + 1.5 * (emissions_preference / 100.0)
     
     # If emissions preference is very high, modestly reduce cost and queue
-    if emissions_preference > 80:
+    if emissions_preference > HIGH_EMISSIONS_PREFERENCE:
         cost_emissions_adjust = 0.85
         queue_emissions_adjust = 0.9
     else:
@@ -561,207 +692,2089 @@ def compute_final_weights(load_type: str, load_size_mw: float,
 
 
 # ============================================================================
-# MAIN RANKING FUNCTION
+# RANKING PIPELINE STAGES
 # ============================================================================
 
-def rank_nodes(
-    nodes_df: pd.DataFrame,
-    load_type: str,
-    load_size_mw: float,
-    location_filter: Optional[Dict],
-    emissions_preference: float,
-    resource_config: str,
-    top_n: int = 200
-) -> pd.DataFrame:
+VALID_LOAD_TYPES = [
+    "data_center_always_on", "data_center_flexible",
+    "h2_electrolyzer_firm", "industrial_continuous",
+    "industrial_flexible", "commercial_campus"
+]
+
+VALID_RESOURCE_CONFIGS = ["none", "solar", "battery", "solar_battery", "firm_gen"]
+
+# Weight components in the order used for weight vectors and component matrices
+WEIGHT_COMPONENTS = ["cost", "land", "policy", "queue", "emissions", "variability"]
+
+# Component score columns matching WEIGHT_COMPONENTS, for baseline and scenario scoring
+BASELINE_SCORE_COLUMNS = [
+    "cost_score", "land_score", "policy_score", "queue_score",
+    "emissions_score", "price_variability_penalty_score"
+]
+SCENARIO_SCORE_COLUMNS = BASELINE_SCORE_COLUMNS[:-1] + ["effective_price_variability_penalty_score"]
+
+# Every component score column added by compute_component_scores()
+COMPONENT_SCORE_COLUMNS = BASELINE_SCORE_COLUMNS + SCENARIO_SCORE_COLUMNS[-1:]
+
+
+def validate_ranking_params(load_type: str, resource_config: str, emissions_preference: float):
     """
-    Ranks power system nodes for siting a large electric load.
-    
-    This is the main entry point for the ranking engine. It performs:
-    1. Data validation and cleaning
-    2. Spatial filtering
-    3. Component score calculation
-    4. Weight adjustment based on load characteristics
-    5. Composite scoring with baseline and scenario comparisons
-    6. Final ranking and top-N selection
+    Validates ranking parameters, raising ValueError on invalid input.
     
     Args:
-        nodes_df: DataFrame with node data (see module docstring for required columns)
-        load_type: One of "data_center_always_on", "data_center_flexible", 
-                   "h2_electrolyzer_firm", "industrial_continuous", 
-                   "industrial_flexible", "commercial_campus"
-        load_size_mw: Load size in MW
-        location_filter: Spatial filter dict or None:
-                        - {"states": ["CA", "NY", ...]} for state filter
-                        - {"lat": x, "lon": y, "radius_km": r} for radial filter
-                        - None for no filter
-        emissions_preference: User slider 0-100 (0=don't care, 100=very sensitive)
-        resource_config: One of "none", "solar", "battery", "solar_battery", "firm_gen"
-        top_n: Number of top-ranked nodes to return (default 200)
-    
-    Returns:
-        DataFrame with top_n ranked nodes, including:
-        - All original columns
-        - Component scores (cost_score, land_score, etc.)
-        - Composite scores (score_baseline, score_scenario)
-        - Rankings (rank_baseline, rank_scenario)
+        load_type: Type of load
+        resource_config: On-site resource configuration
+        emissions_preference: User slider 0-100
     """
-    # Validate inputs
-    valid_load_types = [
-        "data_center_always_on", "data_center_flexible", 
-        "h2_electrolyzer_firm", "industrial_continuous",
-        "industrial_flexible", "commercial_campus"
-    ]
-    if load_type not in valid_load_types:
-        raise ValueError(f"Invalid load_type. Must be one of {valid_load_types}")
+    if load_type not in VALID_LOAD_TYPES:
+        raise ValueError(f"Invalid load_type. Must be one of {VALID_LOAD_TYPES}")
     
-    valid_resource_configs = ["none", "solar", "battery", "solar_battery", "firm_gen"]
-    if resource_config not in valid_resource_configs:
-        raise ValueError(f"Invalid resource_config. Must be one of {valid_resource_configs}")
+    if resource_config not in VALID_RESOURCE_CONFIGS:
+        raise ValueError(f"Invalid resource_config. Must be one of {VALID_RESOURCE_CONFIGS}")
     
     if not (0 <= emissions_preference <= 100):
         raise ValueError("emissions_preference must be between 0 and 100")
+
+
+def compute_component_scores(df: pd.DataFrame, load_type: str, resource_config: str,
+                             column_bounds: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Computes all component scores and applies the quality pre-filter.
     
-    # Step 1: Validate and clean data
-    print(f"Starting node ranking for {load_type} ({load_size_mw} MW)")
-    df = validate_and_clean_data(nodes_df)
-    print(f"Validated data: {len(df)} nodes")
-    
-    # Step 2: Apply spatial filtering
-    df = apply_spatial_filter(df, location_filter)
-    print(f"After spatial filter: {len(df)} nodes")
-    
-    if len(df) == 0:
-        print("Warning: No nodes remain after filtering")
-        return pd.DataFrame()
-    
-    # Step 3: Compute component scores
-    print("Computing component scores...")
-    df['cost_score'] = compute_cost_score(df)
-    df['land_score'] = compute_land_score(df)
-    df['emissions_score'] = compute_emissions_score(df)
-    df['policy_score'] = compute_policy_score(df, load_type)
-    df['queue_score'] = compute_queue_score(df)
+    Component scores depend only on the filtered node set, the load type
+    (policy) and the resource config (variability), so the result can be
+    shared by any number of weight vectors. The input is not modified.
     
-    # Step 4: Compute variability scores (baseline and effective)
-    df['price_variability_penalty_score'], df['effective_price_variability_penalty_score'] = \
-        compute_variability_scores(df, resource_config)
+    Args:
+        df: Cleaned, spatially filtered DataFrame
+        load_type: Type of load
+        resource_config: On-site resource configuration
+        column_bounds: Optional precomputed (q_low, q_high) bounds per raw
+                       column, valid only for exactly the rows in df
     
-    # Step 5: Optional fast pre-filter to remove obviously poor candidates
+    Returns:
+        Copy of the nodes passing the pre-filter, with component score columns added
+    """
+    scores, pre_filter_mask = _score_components(df, load_type, resource_config, column_bounds)
+    return pd.concat([df, scores], axis=1)[pre_filter_mask]
+
+
+def _score_components(df: pd.DataFrame, load_type: str, resource_config: str,
+                      column_bounds: Optional[Dict]) -> Tuple[pd.DataFrame, pd.Series]:
+    """Component scores for every row of df, and the quality pre-filter mask."""
+    scores = pd.DataFrame({
+        'cost_score': compute_cost_score(df, column_bounds),
+        'land_score': compute_land_score(df, column_bounds),
+        'emissions_score': compute_emissions_score(df, column_bounds),
+        'policy_score': compute_policy_score(df, load_type, column_bounds),
+        'queue_score': compute_queue_score(df, column_bounds),
+    }, index=df.index)
+    
+    scores['price_variability_penalty_score'], scores['effective_price_variability_penalty_score'] = \
+        compute_variability_scores(df, resource_config, column_bounds)
+    
+    # Optional fast pre-filter to remove obviously poor candidates
     # Keep nodes that have at least one strong component or aren't terrible on all
     pre_filter_mask = (
-        (df['cost_score'] >= 0.3) |
-        (df['queue_score'] >= 0.3) |
-        (df['emissions_score'] >= 0.3) |
-        (df['policy_score'] >= 0.3)
+        (scores['cost_score'] >= 0.3) |
+        (scores['queue_score'] >= 0.3) |
+        (scores['emissions_score'] >= 0.3) |
+        (scores['policy_score'] >= 0.3)
     )
-    df = df[pre_filter_mask].copy()
-    print(f"After quality pre-filter: {len(df)} nodes")
     
-    if len(df) == 0:
-        print("Warning: No nodes passed quality threshold")
-        return pd.DataFrame()
+    return scores, pre_filter_mask
+
+
+def weights_to_matrix(weights_list) -> np.ndarray:
+    """
+    Stacks weight dictionaries into a (6 x k) matrix ordered by WEIGHT_COMPONENTS.
     
-    # Step 6: Compute final weights
-    weights = compute_final_weights(load_type, load_size_mw, emissions_preference)
-    print(f"Final weights: {weights}")
+    Args:
+        weights_list: List of weight dictionaries
     
-    # Step 7: Compute composite scores
-    # Baseline score (no on-site resources)
-    df['score_baseline'] = (
-        weights['cost'] * df['cost_score'] +
-        weights['land'] * df['land_score'] +
-        weights['policy'] * df['policy_score'] +
-        weights['queue'] * df['queue_score'] +
-        weights['emissions'] * df['emissions_score'] +
-        weights['variability'] * df['price_variability_penalty_score']
-    )
+    Returns:
+        Weight matrix with one column per weight dictionary
+    """
+    return np.array([[w[key] for w in weights_list] for key in WEIGHT_COMPONENTS], dtype=float)
+
+
+def weighted_sum(components: np.ndarray, weight_matrix: np.ndarray) -> np.ndarray:
+    """
+    Computes composite scores for several weight vectors at once.
     
-    # Scenario score (with selected resource_config)
-    df['score_scenario'] = (
-        weights['cost'] * df['cost_score'] +
-        weights['land'] * df['land_score'] +
-        weights['policy'] * df['policy_score'] +
-        weights['queue'] * df['queue_score'] +
-        weights['emissions'] * df['emissions_score'] +
-        weights['variability'] * df['effective_price_variability_penalty_score']
-    )
+    Accumulates components in WEIGHT_COMPONENTS order with elementwise
+    operations (not BLAS), so each column is bit-identical to scoring that
+    weight vector alone.
     
-    # Step 8: Compute ranks (1 = best)
-    df['rank_baseline'] = df['score_baseline'].rank(method='min', ascending=False).astype(int)
-    df['rank_scenario'] = df['score_scenario'].rank(method='min', ascending=False).astype(int)
+    Args:
+        components: (nodes x 6) component score matrix
+        weight_matrix: (6 x k) weight matrix
+    
+    Returns:
+        (nodes x k) composite score matrix
+    """
+    scores = components[:, 0:1] * weight_matrix[0]
+    for j in range(1, components.shape[1]):
+        scores = scores + components[:, j:j + 1] * weight_matrix[j]
+    return scores
+
+
+def score_ranks(scores: np.ndarray) -> np.ndarray:
+    """Ranks scores descending (1 = best, ties share the minimum rank)."""
+    return pd.Series(scores).rank(method='min', ascending=False).to_numpy(dtype=int)
+
+
+def take_scored_rows(components_df: pd.DataFrame, positions: np.ndarray,
+                     columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Copies rows of compute_component_scores() output.
     
-    # Step 9: Sort by scenario score and return top N
-    df_sorted = df.sort_values('score_scenario', ascending=False)
-    result = df_sorted.head(top_n).copy()
+    Args:
+        components_df: Scored nodes
+        positions: Row positions to copy, in output order
+        columns: Optional original columns to copy (default all); component
+                 score columns are always included
     
-    print(f"Ranking complete. Returning top {len(result)} nodes.")
-    print(f"Top node: {result.iloc[0]['node']} in {result.iloc[0]['state']} "
-          f"(score: {result.iloc[0]['score_scenario']:.3f})")
+    Returns:
+        New DataFrame of the selected rows
+    """
+    if columns is None:
+        return components_df.iloc[positions].copy()
+    keep = list(columns) + [c for c in COMPONENT_SCORE_COLUMNS if c not in columns]
+    return components_df.iloc[positions, components_df.columns.get_indexer(keep)]
+
+
+def rank_scored_nodes(components_df: pd.DataFrame, score_baseline: np.ndarray,
+                      score_scenario: np.ndarray, top_n: Optional[int] = None,
+                      replace_columns: Optional[Dict[str, np.ndarray]] = None,
+                      ranks: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                      columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Ranks nodes by composite score and returns the top rows.
+    
+    Ranks (1 = best, ties share the minimum rank) are computed over all
+    nodes; rows are ordered by scenario score, ties keeping input order.
+    
+    Args:
+        components_df: Output of compute_component_scores()
+        score_baseline: Baseline composite score per row
+        score_scenario: Scenario composite score per row
+        top_n: Number of rows to return (None for all)
+        replace_columns: Optional per-row values replacing columns of
+                         components_df in the output (only the returned rows
+                         are copied)
+        ranks: Optional precomputed (rank_baseline, rank_scenario) arrays
+               (see score_ranks)
+        columns: Optional original columns to copy (default all); component
+                 score columns are always included
+    
+    Returns:
+        DataFrame of the top_n rows with composite scores and ranks added
+    """
+    if ranks is not None:
+        rank_baseline, rank_scenario = ranks
+    else:
+        rank_baseline = score_ranks(score_baseline)
+        rank_scenario = score_ranks(score_scenario)
+    
+    order = np.argsort(-score_scenario, kind='stable')
+    if top_n is not None:
+        order = order[:top_n]
+    
+    result = take_scored_rows(components_df, order, columns)
+    for column, values in (replace_columns or {}).items():
+        result[column] = values[order]
+    result['score_baseline'] = score_baseline[order]
+    result['score_scenario'] = score_scenario[order]
+    result['rank_baseline'] = rank_baseline[order]
+    result['rank_scenario'] = rank_scenario[order]
     
     return result
 
 
+class RankingCancelled(Exception):
+    """Raised inside rank_nodes() when its CancelToken has been cancelled."""
+
+
+class DeadlineExceeded(RankingCancelled):
+    """Raised inside rank_nodes() when its CancelToken's deadline has passed."""
+
+
+class CancelToken:
+    """
+    Deadline and cancellation flag for a ranking.
+    
+    Ranking functions call check() between pipeline stages (and between
+    points in points mode), so a cancelled or expired ranking stops at the
+    next stage boundary instead of running to completion. A stage that has
+    already started is not interrupted.
+    """
+    
+    def __init__(self, timeout_s: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout_s if timeout_s is not None else None
+        self.reason: Optional[str] = None
+    
+    def cancel(self, reason: str = "cancelled"):
+        """Cancels the ranking; safe to call from any thread."""
+        if self.reason is None:
+            self.reason = reason
+    
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None if there is none)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+    
+    def check(self, stage: str = ""):
+        """
+        Raises if the ranking should stop.
+        
+        Raises:
+            RankingCancelled: If cancel() was called
+            DeadlineExceeded: If the deadline has passed
+        """
+        where = f" before {stage}" if stage else ""
+        if self.reason is not None:
+            raise RankingCancelled(f"Ranking {self.reason}{where}")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceeded(f"Ranking deadline exceeded{where}")
+
+
+class StageTimer:
+    """
+    Records wall time and surviving row counts per pipeline stage.
+    
+    Values are added to stats["timings"] (seconds) and stats["row_counts"],
+    so passing the same dict to several calls accumulates their totals.
+    Does nothing when stats is None.
+    """
+    
+    def __init__(self, stats: Optional[Dict]):
+        self.stats = stats
+        self.last = time.perf_counter()
+    
+    def mark(self, stage: str, rows: Optional[int] = None):
+        """Ends the current stage, optionally recording its output row count."""
+        if self.stats is None:
+            return
+        now = time.perf_counter()
+        timings = self.stats.setdefault("timings", {})
+        timings[stage] = timings.get(stage, 0.0) + (now - self.last)
+        if rows is not None:
+            row_counts = self.stats.setdefault("row_counts", {})
+            row_counts[stage] = row_counts.get(stage, 0) + rows
+        self.last = now
+
+
 # ============================================================================
-# CONVENIENCE FUNCTIONS
+# RANK MOVEMENT ANALYTICS
 # ============================================================================
 
-def load_nodes_from_csv(filepath: str) -> pd.DataFrame:
+def _count_inversions(values: np.ndarray) -> int:
     """
-    Loads node data from CSV file.
+    Counts pairs i < j with values[i] > values[j] in O(n log^2 n).
+    
+    Bottom-up merge sort, vectorized across all blocks of a level: every
+    element of a right block is located in its (sorted) left block with one
+    searchsorted over the whole level.
+    """
+    n = len(values)
+    if n < 2:
+        return 0
+    # Dense integer codes, so block offsets can be added without collisions
+    codes = np.unique(values, return_inverse=True)[1].astype(np.int64).ravel()
+    positions = np.arange(n)
+    inversions = 0
+    width = 1
+    while width < n:
+        pair = positions // (2 * width)
+        is_right = (positions // width) % 2 == 1
+        keys = pair * n + codes
+        left_keys = keys[~is_right]
+        right_keys = keys[is_right]
+        # Left elements of the same pair that are <= each right element
+        not_greater = np.searchsorted(left_keys, right_keys, side='right') - \
+            np.searchsorted(left_keys, pair[is_right] * n, side='left')
+        left_sizes = np.minimum(width, n - pair[is_right] * 2 * width)
+        inversions += int((left_sizes - not_greater).sum())
+        # Merge: each pair's block becomes sorted
+        codes = np.sort(keys) - pair * n
+        width *= 2
+    return inversions
+
+
+def _tied_pairs(*arrays: np.ndarray) -> int:
+    """Number of pairs tied in all given arrays."""
+    _, counts = np.unique(np.column_stack(arrays), axis=0, return_counts=True)
+    return int((counts * (counts - 1) // 2).sum())
+
+
+def kendall_tau_b(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    """
+    Kendall rank correlation (tau-b, tie-corrected) in O(n log^2 n).
+    
+    Discordant pairs are the inversions of y once rows are sorted by (x, y)
+    (Knight's algorithm).
+    
+    Returns:
+        tau-b in [-1, 1], or None if either input is constant
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(x)
+    order = np.lexsort((y, x))
+    discordant = _count_inversions(y[order])
+    
+    total = n * (n - 1) // 2
+    ties_x = _tied_pairs(x)
+    ties_y = _tied_pairs(y)
+    ties_xy = _tied_pairs(x, y)
+    denominator = np.sqrt(float(total - ties_x) * float(total - ties_y))
+    if denominator == 0:
+        return None
+    return float((total - ties_x - ties_y + ties_xy - 2 * discordant) / denominator)
+
+
+def spearman_rho(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    """
+    Spearman rank correlation (Pearson correlation of average ranks).
+    
+    Returns:
+        rho in [-1, 1], or None if either input is constant
+    """
+    rx = pd.Series(x).rank(method='average').to_numpy() - (len(x) + 1) / 2
+    ry = pd.Series(y).rank(method='average').to_numpy() - (len(y) + 1) / 2
+    denominator = np.sqrt((rx * rx).sum() * (ry * ry).sum())
+    if denominator == 0:
+        return None
+    return float((rx * ry).sum() / denominator)
+
+
+def rank_movement_analytics(components_df: pd.DataFrame, rank_baseline: np.ndarray,
+                            rank_scenario: np.ndarray, top_n: Optional[int] = 200,
+                            num_movers: int = 10) -> Dict:
+    """
+    Summarizes how ranks change from the baseline to the scenario.
+    
+    Works on the rank arrays of the full filtered node set (not just the
+    top-N slice), without merging DataFrames.
     
     Args:
-        filepath: Path to CSV file
+        components_df: Scored nodes, rows aligned with the rank arrays
+        rank_baseline: Baseline rank per row (1 = best)
+        rank_scenario: Scenario rank per row
+        top_n: Size of the top sets compared for overlap (None = all nodes)
+        num_movers: Number of nodes listed in each movers list
     
     Returns:
-        DataFrame with node data
+        {
+            "num_nodes": ...,
+            "movers_up": [{"node", "state", "rank_baseline", "rank_scenario", "rank_delta"}, ...],
+            "movers_down": [...],      // rank_delta = rank_baseline - rank_scenario
+            "nodes_moved": ...,        // nodes whose rank changed
+            "top_n_overlap": {"top_n", "shared", "jaccard", "entered", "exited"},
+            "spearman": ...,
+            "kendall_tau_b": ...       // None if a ranking is constant
+        }
     """
-    return pd.read_csv(filepath)
+    n = len(rank_baseline)
+    delta = rank_baseline - rank_scenario
+    nodes = components_df['node'].to_numpy()
+    states = components_df['state'].to_numpy()
+    
+    def movers(rows):
+        return [
+            {"node": nodes[i], "state": states[i], "rank_baseline": int(rank_baseline[i]),
+             "rank_scenario": int(rank_scenario[i]), "rank_delta": int(delta[i])}
+            for i in rows
+        ]
+    
+    up = np.lexsort((rank_scenario, -delta))[:num_movers]
+    down = np.lexsort((rank_scenario, delta))[:num_movers]
+    
+    # Top sets by rank position (ties broken by row order, as in rank_scored_nodes)
+    k = n if top_n is None else min(top_n, n)
+    top_baseline = np.lexsort((np.arange(n), rank_baseline))[:k]
+    top_scenario = np.lexsort((np.arange(n), rank_scenario))[:k]
+    in_baseline = np.zeros(n, dtype=bool)
+    in_baseline[top_baseline] = True
+    in_scenario = np.zeros(n, dtype=bool)
+    in_scenario[top_scenario] = True
+    shared = int((in_baseline & in_scenario).sum())
+    
+    return {
+        "num_nodes": n,
+        "movers_up": movers(up[delta[up] > 0]),
+        "movers_down": movers(down[delta[down] < 0]),
+        "nodes_moved": int((delta != 0).sum()),
+        "top_n_overlap": {
+            "top_n": k,
+            "shared": shared,
+            "jaccard": shared / (2 * k - shared) if k else None,
+            "entered": nodes[top_scenario[~in_baseline[top_scenario]]].tolist(),
+            "exited": nodes[top_baseline[~in_scenario[top_baseline]]].tolist(),
+        },
+        "spearman": spearman_rho(rank_baseline, rank_scenario) if n > 1 else None,
+        "kendall_tau_b": kendall_tau_b(rank_baseline, rank_scenario) if n > 1 else None,
+    }
 
 
-def get_ranking_explanation(node_row: pd.Series, weights: Dict[str, float]) -> str:
+# ============================================================================
+# WEIGHT UNCERTAINTY
+# ============================================================================
+
+# Largest (samples x nodes) score block held in memory at once
+STABILITY_CHUNK_CELLS = 4_000_000
+
+# Ranks counted in each tracked node's histogram; larger ranks are kept
+# individually (see RankAccumulator)
+RANK_HISTOGRAM_WIDTH = 2048
+
+
+def tracked_ranks(scores: np.ndarray, tracked: np.ndarray) -> np.ndarray:
     """
-    Generates human-readable explanation for why a node ranks well.
+    Ranks selected nodes within each row of a (samples x nodes) score block.
+    
+    Sorts the block in place, then binary-searches each tracked node's
+    score: rank = 1 + number of strictly higher scores, so ties share the
+    minimum rank as in score_ranks().
     
     Args:
-        node_row: Series representing a single node's data
-        weights: Weight dictionary used in scoring
+        scores: (samples x nodes) scores; overwritten (sorted)
+        tracked: Node (column) positions to rank
     
     Returns:
-        Explanation string
+        (len(tracked) x samples) rank array
+    """
+    tracked_scores = scores[:, tracked]
+    scores.sort(axis=1)
+    ranks = np.empty((len(tracked), scores.shape[0]), dtype=np.int64)
+    for j in range(scores.shape[0]):
+        ranks[:, j] = scores.shape[1] + 1 - np.searchsorted(scores[j], tracked_scores[j], side='right')
+    return ranks
+
+
+class RankAccumulator:
+    """
+    Streaming per-node rank distribution for Monte Carlo samples.
+    
+    Keeps an int32 histogram of ranks 1..width per tracked node, plus running
+    rank sums, extremes and top_n counts. Ranks beyond the histogram (rare
+    for tracked nodes, which are the best ones at the computed weights) are
+    kept individually. Memory is bounded by tracked x width rather than
+    tracked x max_rank and does not grow with the number of samples beyond
+    those outliers. All statistics are exact; percentiles use linear
+    interpolation, as np.percentile.
     """
-    explanations = []
     
-    # Identify top contributing factors
-    contributions = {
-        'cost': weights['cost'] * node_row.get('cost_score', 0),
-        'land': weights['land'] * node_row.get('land_score', 0),
-        'policy': weights['policy'] * node_row.get('policy_score', 0),
-        'queue': weights['queue'] * node_row.get('queue_score', 0),
-        'emissions': weights['emissions'] * node_row.get('emissions_score', 0),
-        'variability': weights['variability'] * node_row.get('effective_price_variability_penalty_score', 0),
-    }
+    def __init__(self, num_tracked: int, max_rank: int, top_n: int, width: Optional[int] = None):
+        self.max_rank = max_rank
+        self.top_n = top_n
+        self.width = min(max_rank, RANK_HISTOGRAM_WIDTH if width is None else width)
+        self.samples = 0
+        self.counts = np.zeros((num_tracked, self.width), dtype=np.int32)
+        self.top_counts = np.zeros(num_tracked, dtype=np.int64)
+        self.rank_sum = np.zeros(num_tracked, dtype=np.int64)
+        self.rank_sq_sum = np.zeros(num_tracked, dtype=np.int64)
+        self.best = np.full(num_tracked, max_rank + 1, dtype=np.int64)
+        self.worst = np.zeros(num_tracked, dtype=np.int64)
+        self._overflow: List[Tuple[np.ndarray, np.ndarray]] = []
+    
+    def add(self, ranks: np.ndarray):
+        """Adds a (tracked x samples) block of ranks (1..max_rank)."""
+        num_tracked, num_samples = ranks.shape
+        rows = np.broadcast_to(np.arange(num_tracked)[:, None], ranks.shape)
+        counted = ranks <= self.width
+        np.add.at(self.counts.reshape(-1), rows[counted] * self.width + (ranks[counted] - 1), 1)
+        if not counted.all():
+            self._overflow.append((rows[~counted], ranks[~counted]))
+        self.top_counts += (ranks <= self.top_n).sum(axis=1)
+        self.rank_sum += ranks.sum(axis=1)
+        self.rank_sq_sum += (ranks * ranks).sum(axis=1)
+        np.minimum(self.best, ranks.min(axis=1), out=self.best)
+        np.maximum(self.worst, ranks.max(axis=1), out=self.worst)
+        self.samples += num_samples
+    
+    def _kth_smallest(self, k: int, cumulative: np.ndarray,
+                      overflow: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+        """k-th smallest rank (0-based k) per tracked node."""
+        # First rank whose cumulative count exceeds k, if it is in the histogram
+        ranks = np.array([np.searchsorted(row, k, side='right') + 1 for row in cumulative])
+        beyond = np.flatnonzero(cumulative[:, -1] <= k)
+        if len(beyond):
+            starts, overflow_ranks = overflow
+            ranks[beyond] = overflow_ranks[starts[beyond] + (k - cumulative[beyond, -1])]
+        return ranks
+    
+    def _sorted_overflow(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Each node's start offset into the overflow ranks, sorted by (node, rank)."""
+        if not self._overflow:
+            return np.zeros(len(self.counts), dtype=np.int64), np.zeros(0, dtype=np.int64)
+        rows = np.concatenate([r for r, _ in self._overflow])
+        ranks = np.concatenate([v for _, v in self._overflow])
+        order = np.lexsort((ranks, rows))
+        rows, ranks = rows[order], ranks[order]
+        return np.searchsorted(rows, np.arange(len(self.counts))), ranks
+    
+    def percentile(self, q: float) -> np.ndarray:
+        """Rank percentile (0-100) per tracked node."""
+        cumulative = np.cumsum(self.counts, axis=1, dtype=np.int64)
+        overflow = self._sorted_overflow()
+        position = q / 100.0 * (self.samples - 1)
+        lower = np.floor(position)
+        rank_lower = self._kth_smallest(int(lower), cumulative, overflow)
+        rank_upper = self._kth_smallest(int(np.ceil(position)), cumulative, overflow)
+        return rank_lower + (rank_upper - rank_lower) * (position - lower)
+    
+    def summary(self) -> Dict[str, np.ndarray]:
+        """Columns top_n_probability, rank_mean, rank_std, rank_p5/p50/p95, rank_best, rank_worst."""
+        mean = self.rank_sum / self.samples
+        variance = self.rank_sq_sum / self.samples - mean ** 2
+        return {
+            "top_n_probability": self.top_counts / self.samples,
+            "rank_mean": mean,
+            "rank_std": np.sqrt(np.maximum(variance, 0.0)),
+            "rank_p5": self.percentile(5),
+            "rank_p50": self.percentile(50),
+            "rank_p95": self.percentile(95),
+            "rank_best": self.best,
+            "rank_worst": self.worst,
+        }
+
+
+def sample_weights(weights: Dict[str, float], num_samples: int, concentration: float,
+                   rng: np.random.Generator) -> np.ndarray:
+    """
+    Draws weight vectors from a Dirichlet distribution centred on weights.
     
-    # Sort by contribution
-    sorted_contrib = sorted(contributions.items(), key=lambda x: x[1], reverse=True)
-    
-    # Generate explanation for top 3 factors
-    factor_names = {
-        'cost': 'low energy costs',
-        'land': 'affordable land',
-        'policy': 'strong policy support',
-        'queue': 'low interconnection queue pressure',
-        'emissions': 'low emissions intensity',
-        'variability': 'low price variability exposure',
-    }
+    Each sample is positive and sums to 1, and its expected value is the
+    given weight vector. Higher concentration gives samples closer to it
+    (per-component variance w(1-w)/(concentration+1)). Components with zero
+    weight stay zero.
+    
+    Args:
+        weights: Weight dictionary (see compute_final_weights)
+        num_samples: Number of weight vectors
+        concentration: Dirichlet concentration (> 0)
+        rng: Random generator
+    
+    Returns:
+        (6 x num_samples) weight matrix ordered by WEIGHT_COMPONENTS
+    """
+    base = weights_to_matrix([weights])[:, 0]
+    positive = base > 0
+    samples = np.zeros((len(base), num_samples))
+    samples[positive] = rng.dirichlet(concentration * base[positive], size=num_samples).T
+    return samples
+
+
+def rank_stability(
+    nodes_df: pd.DataFrame,
+    load_type: str,
+    load_size_mw: float,
+    location_filter: Optional[Dict],
+    emissions_preference: float,
+    resource_config: str,
+    top_n: int = 20,
+    track_n: Optional[int] = None,
+    num_samples: int = 2000,
+    concentration: float = 100.0,
+    seed: int = 0,
+    column_bounds: Optional[Dict] = None,
+    stats: Optional[Dict] = None,
+    cancel: Optional[CancelToken] = None
+) -> pd.DataFrame:
+    """
+    Estimates how robust the top nodes' ranks are to the weights.
+    
+    Component scores are computed once. Perturbed weight vectors
+    (sample_weights) are then scored together as a (samples x 6) @ (6 x nodes)
+    matrix product, in chunks of at most STABILITY_CHUNK_CELLS scores. Each
+    chunk's scores are sorted per sample to find the ranks of the tracked
+    nodes.
+    
+    Args:
+        nodes_df, load_type, load_size_mw, location_filter,
+        emissions_preference, resource_config, column_bounds, stats, cancel:
+            As for rank_nodes()
+        top_n: Size of the top set whose membership probability is reported
+        track_n: Number of nodes reported, best first at the computed weights
+                 (default 2 * top_n, so near misses are included)
+        num_samples: Number of weight vectors sampled
+        concentration: Dirichlet concentration; higher = less perturbation
+        seed: Random seed (results are reproducible for a given seed)
+    
+    Returns:
+        DataFrame with one row per tracked node: node, state, iso,
+        score_scenario and rank_scenario at the computed weights,
+        top_n_probability (share of samples ranking it in the top top_n),
+        rank_mean, rank_std, rank_p5, rank_p50, rank_p95, rank_best,
+        rank_worst. Scenario scoring (the selected resource_config) is used
+        throughout. Empty if no nodes matched.
+    
+    Raises:
+        ValueError: For invalid parameters
+        RankingCancelled: If cancel is cancelled or its deadline passes
+    """
+    validate_ranking_params(load_type, resource_config, emissions_preference)
+    if top_n < 1 or num_samples < 1 or concentration <= 0:
+        raise ValueError("top_n and num_samples must be positive and concentration > 0")
+    track_n = 2 * top_n if track_n is None else track_n
     
-    for factor, contrib in sorted_contrib[:3]:
-        if contrib > 0.1:  # Only mention significant contributions
-            explanations.append(factor_names[factor])
+    timer = StageTimer(stats)
+    check = cancel.check if cancel is not None else lambda stage: None
     
-    node_name = node_row.get('node', 'This node')
-    location = f"{node_row.get('county_state_pairs', node_row.get('state', 'Unknown'))}"
+    check("clean")
+    df = apply_spatial_filter(validate_and_clean_data(nodes_df), location_filter)
+    timer.mark("spatial_filter", len(df))
+    if len(df) == 0:
+        return pd.DataFrame()
+    
+    check("component_scores")
+    if location_filter is not None:
+        column_bounds = None
+    df = compute_component_scores(df, load_type, resource_config, column_bounds)
+    timer.mark("component_scores", len(df))
+    if len(df) == 0:
+        return pd.DataFrame()
     
-    return f"{node_name} in {location} ranks highly due to {', '.join(explanations)}."
+    # Nodes to track: the best track_n at the computed weights
+    weights = compute_final_weights(load_type, load_size_mw, emissions_preference)
+    components = df[SCENARIO_SCORE_COLUMNS].to_numpy(dtype=float)
+    score_scenario = weighted_sum(components, weights_to_matrix([weights]))[:, 0]
+    rank_scenario = score_ranks(score_scenario)
+    tracked = np.argsort(-score_scenario, kind='stable')[:track_n]
+    
+    # Ranks of the tracked nodes under every sampled weight vector
+    samples = sample_weights(weights, num_samples, concentration, np.random.default_rng(seed))
+    accumulator = RankAccumulator(len(tracked), len(df), top_n)
+    components_t = np.ascontiguousarray(components.T)
+    chunk = max(1, STABILITY_CHUNK_CELLS // len(df))
+    for start in range(0, num_samples, chunk):
+        check(f"samples {start}-{min(start + chunk, num_samples)}")
+        accumulator.add(tracked_ranks(samples[:, start:start + chunk].T @ components_t, tracked))
+    timer.mark("samples")
+    
+    result = _stability_frame(df, tracked, score_scenario, rank_scenario, accumulator)
+    print(f"Rank stability: {num_samples} weight samples over {len(df)} nodes, "
+          f"{len(tracked)} nodes tracked")
+    return result
+
+
+def _stability_frame(df: pd.DataFrame, tracked: np.ndarray, score_scenario: np.ndarray,
+                     rank_scenario: np.ndarray, accumulator: RankAccumulator) -> pd.DataFrame:
+    """Result rows of rank_stability() / rank_data_uncertainty()."""
+    result = pd.DataFrame({
+        "node": df['node'].to_numpy()[tracked],
+        "state": df['state'].to_numpy()[tracked],
+        "iso": df['iso'].to_numpy()[tracked] if 'iso' in df.columns else None,
+        "score_scenario": score_scenario[tracked],
+        "rank_scenario": rank_scenario[tracked],
+    })
+    for column, values in accumulator.summary().items():
+        result[column] = values
+    return result
+
+
+# ============================================================================
+# INPUT-DATA UNCERTAINTY
+# ============================================================================
+
+# Raw columns that can be perturbed, and those that can't go below zero
+NOISE_COLUMNS = ["avg_lmp", "avg_price_per_acre", "queue_pending_mw"]
+NONNEGATIVE_NOISE_COLUMNS = ["avg_price_per_acre", "queue_pending_mw"]
+
+# Noise model types and their scale parameter
+NOISE_TYPES = {
+    "normal": "sd",        # value + N(0, sd), in the column's units
+    "relative": "sd",      # value * (1 + N(0, sd)), sd as a fraction
+    "uniform": "width",    # value + U(-width, width), in the column's units
+}
+
+# Noise models used when none are given
+DEFAULT_NOISE_MODELS = {
+    "avg_lmp": {"type": "relative", "sd": 0.10},
+    "avg_price_per_acre": {"type": "relative", "sd": 0.20},
+    "queue_pending_mw": {"type": "relative", "sd": 0.20},
+}
+
+
+def validate_noise_models(noise: Dict[str, Dict]):
+    """
+    Validates per-column noise models, raising ValueError on invalid input.
+    
+    Args:
+        noise: {column: {"type": "normal" | "relative" | "uniform",
+                         "sd" | "width": scale}}
+    """
+    if not isinstance(noise, dict) or not noise:
+        raise ValueError(f"noise must map one or more of {NOISE_COLUMNS} to a noise model")
+    for column, model in noise.items():
+        if column not in NOISE_COLUMNS:
+            raise ValueError(f"Unsupported noise column '{column}'. Must be one of {NOISE_COLUMNS}")
+        if not isinstance(model, dict) or model.get("type") not in NOISE_TYPES:
+            raise ValueError(f"Noise model for {column} must have type one of {list(NOISE_TYPES)}")
+        scale = model.get(NOISE_TYPES[model["type"]])
+        if not isinstance(scale, (int, float)) or isinstance(scale, bool) or not 0 <= scale < np.inf:
+            raise ValueError(f"Noise model for {column} needs a non-negative "
+                             f"'{NOISE_TYPES[model['type']]}'")
+
+
+def perturb_column(values: np.ndarray, model: Dict, num_samples: int,
+                   rng: np.random.Generator, nonnegative: bool = False) -> np.ndarray:
+    """
+    Draws perturbed copies of a column.
+    
+    Args:
+        values: Column values (nodes,)
+        model: Noise model (see validate_noise_models)
+        num_samples: Number of copies
+        rng: Random generator
+        nonnegative: Clip perturbed values at zero
+    
+    Returns:
+        (nodes x num_samples) perturbed values
+    """
+    shape = (len(values), num_samples)
+    if model["type"] == "normal":
+        perturbed = values[:, None] + rng.normal(0.0, model["sd"], shape)
+    elif model["type"] == "relative":
+        perturbed = values[:, None] * (1.0 + rng.normal(0.0, model["sd"], shape))
+    else:
+        perturbed = values[:, None] + rng.uniform(-model["width"], model["width"], shape)
+    if nonnegative:
+        np.maximum(perturbed, 0.0, out=perturbed)
+    return perturbed
+
+
+def rank_data_uncertainty(
+    nodes_df: pd.DataFrame,
+    load_type: str,
+    load_size_mw: float,
+    location_filter: Optional[Dict],
+    emissions_preference: float,
+    resource_config: str,
+    noise: Optional[Dict[str, Dict]] = None,
+    top_n: int = 20,
+    track_n: Optional[int] = None,
+    num_samples: int = 500,
+    seed: int = 0,
+    column_bounds: Optional[Dict] = None,
+    stats: Optional[Dict] = None,
+    cancel: Optional[CancelToken] = None
+) -> pd.DataFrame:
+    """
+    Estimates how robust the top nodes' ranks are to errors in the inputs.
+    
+    Samples are processed in batches of at most STABILITY_CHUNK_CELLS
+    scores. For each batch, the noisy columns (NOISE_COLUMNS) are perturbed
+    per sample and re-normalized with robust_min_max_matrix (quantiles are
+    recomputed per sample). The affected component scores (cost, land,
+    queue) and composite scores are then formed for all samples at once.
+    Tracked nodes' ranks are added to a RankAccumulator, whose histogram is
+    capped at RANK_HISTOGRAM_WIDTH ranks, so its memory grows with neither
+    num_samples nor the number of nodes.
+    
+    The quality pre-filter is applied once, to the unperturbed data, so every
+    sample ranks the same node set.
+    
+    Args:
+        nodes_df, load_type, load_size_mw, location_filter,
+        emissions_preference, resource_config, column_bounds, stats, cancel:
+            As for rank_nodes()
+        noise: Per-column noise models (default DEFAULT_NOISE_MODELS), e.g.
+               {"avg_lmp": {"type": "normal", "sd": 3.0},
+                "avg_price_per_acre": {"type": "relative", "sd": 0.2}}
+        top_n: Size of the top set whose membership probability is reported
+        track_n: Number of nodes reported, best first on the unperturbed data
+                 (default 2 * top_n)
+        num_samples: Number of perturbed datasets
+        seed: Random seed (results are reproducible for a given seed)
+    
+    Returns:
+        DataFrame with the same columns as rank_stability(). Empty if no
+        nodes matched.
+    
+    Raises:
+        ValueError: For invalid parameters or noise models
+        RankingCancelled: If cancel is cancelled or its deadline passes
+    """
+    validate_ranking_params(load_type, resource_config, emissions_preference)
+    noise = DEFAULT_NOISE_MODELS if noise is None else noise
+    validate_noise_models(noise)
+    if top_n < 1 or num_samples < 1:
+        raise ValueError("top_n and num_samples must be positive")
+    track_n = 2 * top_n if track_n is None else track_n
+    
+    timer = StageTimer(stats)
+    check = cancel.check if cancel is not None else lambda stage: None
+    
+    check("clean")
+    df = apply_spatial_filter(validate_and_clean_data(nodes_df), location_filter)
+    timer.mark("spatial_filter", len(df))
+    if len(df) == 0:
+        return pd.DataFrame()
+    
+    # Unperturbed component scores over the normalization population
+    check("component_scores")
+    if location_filter is not None:
+        column_bounds = None
+    scores, pre_filter_mask = _score_components(df, load_type, resource_config, column_bounds)
+    keep = pre_filter_mask.to_numpy()
+    n = int(keep.sum())
+    timer.mark("component_scores", n)
+    if n == 0:
+        return pd.DataFrame()
+    
+    weights = compute_final_weights(load_type, load_size_mw, emissions_preference)
+    weight_vector = weights_to_matrix([weights])[:, 0]
+    fixed = scores[SCENARIO_SCORE_COLUMNS].to_numpy(dtype=float)[keep]
+    score_scenario = weighted_sum(fixed, weight_vector[:, None])[:, 0]
+    rank_scenario = score_ranks(score_scenario)
+    tracked = np.argsort(-score_scenario, kind='stable')[:track_n]
+    
+    # Queue sub-scores that don't depend on queue_pending_mw
+    if "queue_pending_mw" in noise:
+        queue_advanced = robust_min_max(df['queue_advanced_share'],
+                                        bounds=_bounds(column_bounds, 'queue_advanced_share')).to_numpy()
+        queue_pressure = invert_score(robust_min_max(
+            df['queue_pressure_index'], bounds=_bounds(column_bounds, 'queue_pressure_index'))).to_numpy()
+        queue_green = robust_min_max(df['queue_renewable_storage_share'],
+                                     bounds=_bounds(column_bounds, 'queue_renewable_storage_share')).to_numpy()
+    
+    rng = np.random.default_rng(seed)
+    raw = {column: df[column].to_numpy(dtype=float) for column in noise}
+    accumulator = RankAccumulator(len(tracked), n, top_n)
+    batch = max(1, STABILITY_CHUNK_CELLS // len(df))
+    for start in range(0, num_samples, batch):
+        size = min(batch, num_samples - start)
+        check(f"samples {start}-{start + size}")
+        
+        # Component matrices (nodes x samples); unperturbed components broadcast
+        components = [fixed[:, j:j + 1] for j in range(fixed.shape[1])]
+        for column in NOISE_COLUMNS:
+            if column not in noise:
+                continue
+            perturbed = perturb_column(raw[column], noise[column], size, rng,
+                                       nonnegative=column in NONNEGATIVE_NOISE_COLUMNS)
+            score = 1.0 - robust_min_max_matrix(perturbed)
+            if column == "avg_lmp":
+                components[WEIGHT_COMPONENTS.index("cost")] = score[keep]
+            elif column == "avg_price_per_acre":
+                components[WEIGHT_COMPONENTS.index("land")] = score[keep]
+            else:
+                # Same combination as compute_queue_score
+                queue = (0.4 * score + 0.2 * queue_advanced[:, None] +
+                         0.2 * queue_pressure[:, None] + 0.2 * queue_green[:, None])
+                components[WEIGHT_COMPONENTS.index("queue")] = robust_min_max_matrix(queue)[keep]
+        
+        # Composite scores, accumulated in WEIGHT_COMPONENTS order as in weighted_sum
+        composite = components[0] * weight_vector[0]
+        for j in range(1, len(components)):
+            composite = composite + components[j] * weight_vector[j]
+        composite = np.broadcast_to(composite, (n, size))
+        accumulator.add(tracked_ranks(np.ascontiguousarray(composite.T), tracked))
+    timer.mark("samples")
+    
+    result = _stability_frame(df[keep], tracked, score_scenario, rank_scenario, accumulator)
+    print(f"Data uncertainty: {num_samples} perturbed datasets over {n} nodes "
+          f"({', '.join(noise)}), {len(tracked)} nodes tracked")
+    return result
+
+
+# ============================================================================
+# EMISSIONS PREFERENCE BREAKPOINTS
+# ============================================================================
+
+# Relative tolerance for merging swaps at (numerically) the same slider value
+BREAKPOINT_MERGE_TOLERANCE = 1e-9
+
+# Each regime is swept in this many pieces; shorter pieces prune more nodes
+BREAKPOINT_PIECES = 16
+
+
+def emissions_regimes() -> List[Tuple[float, float]]:
+    """
+    Slider ranges over which compute_final_weights() is continuous.
+    
+    Within a range only the emissions weight depends on the preference, and
+    linearly, so each node's score is proportional to a line in the
+    preference. The first range includes its upper end; the second excludes
+    its lower end.
+    """
+    return [(0.0, float(HIGH_EMISSIONS_PREFERENCE)), (float(HIGH_EMISSIONS_PREFERENCE), 100.0)]
+
+
+def _score_lines(components: np.ndarray, load_type: str, load_size_mw: float,
+                 low: float, high: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Line coefficients (intercept, slope) of each node's score over a regime.
+    
+    Scores are scaled by 1 / cost weight, which is constant within a regime
+    and doesn't change the order. Coefficients are taken from
+    compute_final_weights() at two points inside (low, high].
+    """
+    def scaled(preference):
+        weights = weights_to_matrix([compute_final_weights(load_type, load_size_mw, preference)])[:, 0]
+        return components @ (weights / weights[WEIGHT_COMPONENTS.index("cost")])
+    
+    p1, p2 = low + (high - low) / 2, high
+    f1, f2 = scaled(p1), scaled(p2)
+    slope = (f2 - f1) / (p2 - p1)
+    return f1 - p1 * slope, slope
+
+
+def _sweep_top_n(intercept: np.ndarray, slope: np.ndarray, top_n: int,
+                 low: float, high: float) -> List[Tuple[float, np.ndarray]]:
+    """
+    Kinetic sweep of the top_n order of lines over (low, high].
+    
+    Keeps the nodes sorted by score and a heap of crossing times of adjacent
+    pairs. Each crossing swaps one adjacent pair; swaps among the first
+    top_n + 1 positions change the top_n order or membership.
+    
+    Returns:
+        [(start, positions)]: the top_n node positions (best first) from each
+        start (the first start is low) until the next one
+    """
+    order = np.lexsort((np.arange(len(intercept)), -slope, -(intercept + low * slope))).tolist()
+    depth = min(top_n, len(order))
+    
+    def crossing(k):
+        upper, lower = order[k], order[k + 1]
+        if slope[lower] <= slope[upper]:
+            return None
+        at = (intercept[upper] - intercept[lower]) / (slope[lower] - slope[upper])
+        return at if at <= high else None
+    
+    events = []
+    for k in range(len(order) - 1):
+        at = crossing(k)
+        if at is not None:
+            heapq.heappush(events, (at, k, order[k], order[k + 1]))
+    
+    segments = [(low, np.array(order[:depth]))]
+    changed_at = None
+    while events:
+        at, k, upper, lower = heapq.heappop(events)
+        if order[k] != upper or order[k + 1] != lower:
+            continue  # Stale: the pair is no longer adjacent
+        at = max(at, low)
+        if changed_at is not None and at > changed_at + BREAKPOINT_MERGE_TOLERANCE * max(1.0, abs(changed_at)):
+            segments.append((changed_at, np.array(order[:depth])))
+            changed_at = None
+        order[k], order[k + 1] = lower, upper
+        if k < depth:
+            changed_at = at if changed_at is None else changed_at
+        for j in (k - 1, k + 1):
+            if 0 <= j < len(order) - 1:
+                next_at = crossing(j)
+                if next_at is not None:
+                    heapq.heappush(events, (max(next_at, at), j, order[j], order[j + 1]))
+    if changed_at is not None:
+        segments.append((changed_at, np.array(order[:depth])))
+    return [(start, top) for i, (start, top) in enumerate(segments)
+            if i == 0 or not np.array_equal(top, segments[i - 1][1])]
+
+
+def emissions_breakpoints(
+    nodes_df: pd.DataFrame,
+    load_type: str,
+    load_size_mw: float,
+    location_filter: Optional[Dict],
+    resource_config: str,
+    top_n: int = 20,
+    column_bounds: Optional[Dict] = None,
+    stats: Optional[Dict] = None,
+    cancel: Optional[CancelToken] = None
+) -> Dict:
+    """
+    Computes the emissions_preference values where the top_n ranking changes.
+    
+    Component scores don't depend on the preference, and within each of
+    emissions_regimes() every node's scenario score is proportional to a
+    line in the preference. Each regime is split into BREAKPOINT_PIECES
+    pieces. Nodes that can't reach the top_n anywhere in a piece are pruned:
+    at least top_n nodes score above the lower of their two endpoint scores
+    throughout. The remaining lines are swept in order (_sweep_top_n), so
+    breakpoints are exact up to floating point.
+    
+    Args:
+        nodes_df, load_type, load_size_mw, location_filter, resource_config,
+        column_bounds, stats, cancel: As for rank_nodes()
+        top_n: Number of top nodes tracked
+    
+    Returns:
+        {"top_n": int, "candidates": nodes swept (summed over pieces),
+         "segments": [{"start", "end", "nodes": [node IDs, best first]}]}.
+        A segment covers start < emissions_preference <= end (the first
+        also covers 0); consecutive segments have different "nodes". Use
+        top_nodes_at() to look up a preference. No segments if no nodes
+        matched.
+    
+    Raises:
+        ValueError: For invalid parameters
+        RankingCancelled: If cancel is cancelled or its deadline passes
+    """
+    validate_ranking_params(load_type, resource_config, 0.0)
+    if top_n < 1:
+        raise ValueError("top_n must be positive")
+    
+    timer = StageTimer(stats)
+    check = cancel.check if cancel is not None else lambda stage: None
+    
+    check("clean")
+    df = apply_spatial_filter(validate_and_clean_data(nodes_df), location_filter)
+    timer.mark("spatial_filter", len(df))
+    
+    check("component_scores")
+    if location_filter is not None:
+        column_bounds = None
+    if len(df) > 0:
+        scores, pre_filter_mask = _score_components(df, load_type, resource_config, column_bounds)
+        keep = pre_filter_mask.to_numpy()
+        df = df[keep]
+        components = scores[SCENARIO_SCORE_COLUMNS].to_numpy(dtype=float)[keep]
+    timer.mark("component_scores", len(df))
+    if len(df) == 0:
+        return {"top_n": top_n, "candidates": 0, "segments": []}
+    
+    nodes = df['node'].to_numpy()
+    segments = []
+    candidates = 0
+    for regime_low, regime_high in emissions_regimes():
+        check(f"regime {regime_low:g}-{regime_high:g}")
+        intercept, slope = _score_lines(components, load_type, load_size_mw, regime_low, regime_high)
+        edges = np.linspace(regime_low, regime_high, BREAKPOINT_PIECES + 1)
+        
+        for low, high in zip(edges[:-1], edges[1:]):
+            # Prune nodes that stay below at least top_n others over the whole piece
+            at_low, at_high = intercept + low * slope, intercept + high * slope
+            floor = np.minimum(at_low, at_high)
+            if len(floor) > top_n:
+                threshold = np.partition(floor, len(floor) - top_n)[len(floor) - top_n]
+                candidate = np.flatnonzero(np.maximum(at_low, at_high) >= threshold)
+            else:
+                candidate = np.arange(len(floor))
+            candidates += len(candidate)
+            
+            for start, top in _sweep_top_n(intercept[candidate], slope[candidate], top_n, low, high):
+                top_nodes = nodes[candidate[top]].tolist()
+                if segments and segments[-1]["nodes"] == top_nodes:
+                    continue
+                if segments:
+                    segments[-1]["end"] = float(start)
+                segments.append({"start": float(start), "end": float(high), "nodes": top_nodes})
+            segments[-1]["end"] = float(high)
+    timer.mark("sweep")
+    
+    print(f"Emissions breakpoints: {len(segments) - 1} breakpoints for the top {top_n} "
+          f"({candidates} candidate nodes of {len(df)})")
+    return {"top_n": top_n, "candidates": candidates, "segments": segments}
+
+
+def top_nodes_at(breakpoints: Dict, emissions_preference: float) -> List:
+    """
+    Looks up the top_n node IDs at an emissions_preference.
+    
+    Args:
+        breakpoints: emissions_breakpoints() output
+        emissions_preference: Slider value 0-100
+    
+    Returns:
+        Node IDs, best first
+    """
+    ends = [segment["end"] for segment in breakpoints["segments"]]
+    if not ends:
+        return []
+    return breakpoints["segments"][min(bisect.bisect_left(ends, emissions_preference), len(ends) - 1)]["nodes"]
+
+
+# ============================================================================
+# CUSTOM WEIGHTS (THRESHOLD ALGORITHM)
+# ============================================================================
+
+# Initial depth scanned in each sorted list below its tied head (doubled
+# until the top N is certain), and the most sorted entries read over all
+# lists, tied heads included, as a fraction of the nodes, before falling
+# back to scoring every node
+THRESHOLD_MIN_DEPTH = 64
+THRESHOLD_MAX_READ_FRACTION = 1 / 4
+
+
+def validate_custom_weights(weights: Dict) -> Dict[str, float]:
+    """
+    Validates user-supplied weights and normalizes them to sum to 1.
+    
+    Args:
+        weights: {component: weight} for components in WEIGHT_COMPONENTS;
+                 missing components get weight 0
+    
+    Returns:
+        Normalized weight dictionary with every component
+    
+    Raises:
+        ValueError: For unknown components, negative or non-numeric weights,
+                    or all-zero weights
+    """
+    if not isinstance(weights, dict) or not weights:
+        raise ValueError(f"weights must map components in {WEIGHT_COMPONENTS} to numbers")
+    unknown = [key for key in weights if key not in WEIGHT_COMPONENTS]
+    if unknown:
+        raise ValueError(f"Unknown weight components {unknown}. Must be in {WEIGHT_COMPONENTS}")
+    for key, value in weights.items():
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or not 0 <= value < np.inf:
+            raise ValueError(f"Weight for {key} must be a non-negative number")
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("At least one weight must be positive")
+    return {key: weights.get(key, 0) / total for key in WEIGHT_COMPONENTS}
+
+
+class ComponentIndex:
+    """
+    Component scores of one filtered node set, presorted per component.
+    
+    Built once per (dataset, filter, load_type, resource_config) by
+    build_component_index(). top_n() then answers any non-negative weight
+    vector with the Threshold Algorithm, scoring only nodes near the head of
+    the sorted lists instead of every node.
+    """
+    
+    def __init__(self, components_df: pd.DataFrame):
+        self.components_df = components_df
+        self.scores = components_df[SCENARIO_SCORE_COLUMNS].to_numpy(dtype=float)
+        # Per-component positions, best first (ties by position)
+        self.order = np.argsort(-self.scores, axis=0, kind='stable')
+        self.sorted_scores = np.take_along_axis(self.scores, self.order, axis=0)
+        # Length of each list's head tied at its best score (robust_min_max
+        # clips about the top 5% of every component to exactly 1.0)
+        self.tied_head = (self.sorted_scores == self.sorted_scores[:1]).sum(axis=0)
+        # skyline_mask(scores), computed by the first frontier() call
+        self._skyline = None
+    
+    def __len__(self) -> int:
+        return len(self.scores)
+    
+    def top_positions(self, weights: Dict[str, float], top_n: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Finds the top_n nodes by scenario score with the Threshold Algorithm.
+        
+        Reads each positive-weight list down to `depth` entries below its
+        tied head and scores every node seen (random access), each only once.
+        No unseen node can score above the threshold, the weighted sum of the
+        last score read from each list, so once the top_n-th best seen score
+        is above it the top_n is final. Starting below the tied heads scores
+        the clipped block of 1.0 scores as one batch instead of holding the
+        threshold at its maximum. Otherwise the depth doubles while at most
+        THRESHOLD_MAX_READ_FRACTION of the nodes' worth of entries are read;
+        past that (uncorrelated components, many active weights) every node
+        is scored in one vectorized pass, which is then cheaper. Scores are
+        accumulated as in weighted_sum(), and float rounding is monotone, so
+        the result is exactly that of a full ranking.
+        
+        Args:
+            weights: Normalized weights (see validate_custom_weights)
+            top_n: Number of nodes to return
+        
+        Returns:
+            (positions, scenario scores, nodes scored): positions into
+            components_df, best first, ties by position
+        """
+        weight_vector = weights_to_matrix([weights])
+        active = np.flatnonzero(weight_vector[:, 0] > 0)
+        n = len(self)
+        top_n = min(top_n, n)
+        depth = max(top_n, THRESHOLD_MIN_DEPTH)
+        max_read = n * THRESHOLD_MAX_READ_FRACTION
+        
+        is_seen = np.zeros(n, dtype=bool)
+        seen_parts, score_parts = [], []
+        read = np.zeros(len(active), dtype=np.int64)
+        last = np.zeros((1, weight_vector.shape[0]))
+        while True:
+            target = self.tied_head[active] + depth
+            if target.sum() > max_read or (target >= n).any():
+                break
+            # Score the nodes first seen at this depth
+            before = is_seen.copy()
+            for start, stop, j in zip(read, target, active):
+                is_seen[self.order[start:stop, j]] = True
+            fresh = np.flatnonzero(is_seen & ~before)
+            seen_parts.append(fresh)
+            score_parts.append(weighted_sum(self.scores[fresh], weight_vector)[:, 0])
+            read = target
+            
+            seen = np.concatenate(seen_parts)
+            seen_scores = np.concatenate(score_parts)
+            last[0, active] = self.sorted_scores[target - 1, active]
+            threshold = weighted_sum(last, weight_vector)[0, 0]
+            if len(seen) >= top_n:
+                kth = np.partition(seen_scores, len(seen) - top_n)[len(seen) - top_n]
+                if kth > threshold:
+                    # Candidates in position order, so the stable sort breaks ties by position
+                    candidates = np.flatnonzero(seen_scores >= kth)
+                    candidates = candidates[np.argsort(seen[candidates])]
+                    best = candidates[np.argsort(-seen_scores[candidates], kind='stable')[:top_n]]
+                    return seen[best], seen_scores[best], len(seen)
+            depth *= 2
+        
+        scores = weighted_sum(self.scores, weight_vector)[:, 0]
+        if top_n == 0:
+            return np.array([], dtype=int), scores[:0], n
+        candidates = np.flatnonzero(scores >= np.partition(scores, n - top_n)[n - top_n])
+        best = candidates[np.argsort(-scores[candidates], kind='stable')[:top_n]]
+        return best, scores[best], n
+    
+    def top_n(self, weights: Dict[str, float], top_n: Optional[int] = 200,
+              stats: Optional[Dict] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Ranks the indexed nodes under custom weights and returns the top rows.
+        
+        Args:
+            weights: Normalized weights (see validate_custom_weights)
+            top_n: Number of top-ranked nodes to return (None for all)
+            stats: Optional dict for stage timings and row counts (see
+                   StageTimer); row_counts["threshold_algorithm"] is the
+                   number of nodes scored
+            columns: Optional original columns to include (default all, see
+                     rank_nodes)
+        
+        Returns:
+            DataFrame as rank_nodes() returns, except rank_baseline, which
+            would need every node scored, is omitted. rank_scenario is exact
+            (1 + number of nodes scoring strictly higher). Empty if no nodes
+            are indexed.
+        """
+        timer = StageTimer(stats)
+        if len(self) == 0:
+            return pd.DataFrame()
+        positions, score_scenario, scored = self.top_positions(
+            weights, len(self) if top_n is None else top_n)
+        timer.mark("threshold_algorithm", scored)
+        
+        result = take_scored_rows(self.components_df, positions, columns)
+        result['score_baseline'] = weighted_sum(
+            result[BASELINE_SCORE_COLUMNS].to_numpy(dtype=float), weights_to_matrix([weights]))[:, 0]
+        result['score_scenario'] = score_scenario
+        result['rank_scenario'] = score_ranks(score_scenario)
+        timer.mark("rank", len(result))
+        return result
+    
+    def frontier(self, k: Optional[int] = None, stats: Optional[Dict] = None,
+                 cancel: Optional[CancelToken] = None) -> pd.DataFrame:
+        """
+        Finds the Pareto frontier of the indexed nodes (see pareto_frontier).
+        
+        The skyline is computed once per index and kept, and k-dominance
+        starts from it, so repeat and k-variant queries skip both component
+        scoring and the skyline.
+        
+        Args:
+            k, stats, cancel: As for pareto_frontier()
+        
+        Returns:
+            As pareto_frontier()
+        """
+        validate_dominance_k(k)
+        if len(self) == 0:
+            return pd.DataFrame()
+        positions, self._skyline = frontier_positions(self.scores, k, StageTimer(stats),
+                                                      cancel, skyline=self._skyline)
+        return self.components_df.iloc[positions]
+
+
+def build_component_index(
+    nodes_df: pd.DataFrame,
+    load_type: str,
+    location_filter: Optional[Dict],
+    resource_config: str,
+    column_bounds: Optional[Dict] = None,
+    stats: Optional[Dict] = None,
+    cancel: Optional[CancelToken] = None
+) -> ComponentIndex:
+    """
+    Scores and indexes a filtered node set for custom-weight queries.
+    
+    Runs the rank_nodes() pipeline up to the quality pre-filter (weights
+    don't affect it) and presorts each component score.
+    
+    Args:
+        nodes_df, load_type, location_filter, resource_config, column_bounds,
+        stats, cancel: As for rank_nodes()
+    
+    Returns:
+        ComponentIndex (empty if no nodes matched)
+    
+    Raises:
+        ValueError: For invalid parameters
+        RankingCancelled: If cancel is cancelled or its deadline passes
+    """
+    validate_ranking_params(load_type, resource_config, 0.0)
+    timer = StageTimer(stats)
+    check = cancel.check if cancel is not None else lambda stage: None
+    
+    check("clean")
+    df = apply_spatial_filter(validate_and_clean_data(nodes_df), location_filter)
+    timer.mark("spatial_filter", len(df))
+    
+    check("component_scores")
+    if location_filter is not None:
+        column_bounds = None
+    if len(df) > 0:
+        df = compute_component_scores(df, load_type, resource_config, column_bounds)
+    timer.mark("component_scores", len(df))
+    
+    check("index")
+    index = ComponentIndex(df if len(df) > 0 else pd.DataFrame(columns=BASELINE_SCORE_COLUMNS + SCENARIO_SCORE_COLUMNS[-1:]))
+    timer.mark("index", len(index))
+    return index
+
+
+# ============================================================================
+# PARETO FRONTIER
+# ============================================================================
+
+# Grid resolution per component for the skyline pre-filter ((levels + 1)^6 cells)
+PARETO_GRID_LEVELS = 10
+
+# Candidate block size of the sort-filter-skyline pass (grows from the minimum)
+PARETO_MIN_BLOCK = 64
+PARETO_MAX_BLOCK = 4096
+
+
+def _dominated_by(candidates: np.ndarray, points: np.ndarray, k: Optional[int] = None,
+                  chunk: int = 16) -> np.ndarray:
+    """
+    Marks candidate rows dominated by any of the given points (higher is better).
+    
+    A point dominates a candidate if it is >= on every column (on at least k
+    columns, for k-dominance) and > on at least one.
+    """
+    k = candidates.shape[1] if k is None else k
+    dominated = np.zeros(len(candidates), dtype=bool)
+    for start in range(0, len(points), chunk):
+        block = points[start:start + chunk]
+        at_least = np.zeros((len(candidates), len(block)), dtype=np.int8)
+        better = np.zeros((len(candidates), len(block)), dtype=bool)
+        for j in range(candidates.shape[1]):
+            at_least += candidates[:, j:j + 1] <= block[:, j]
+            better |= candidates[:, j:j + 1] < block[:, j]
+        dominated |= ((at_least >= k) & better).any(axis=1)
+    return dominated
+
+
+def _grid_dominated(values: np.ndarray, levels: int) -> np.ndarray:
+    """
+    Marks rows that are certainly dominated, in O(rows + cells).
+    
+    Each column is cut into `levels` equal-width bins below its maximum plus
+    one bin holding exactly the maximum (clipped scores pile up there). A
+    row is dominated if an occupied cell is strictly above its cell in every
+    column, except columns where the row has the maximum (there the other
+    row can only tie). Occupancy "at or above" each cell is a reverse
+    cumulative OR along every axis.
+    """
+    low, high = values.min(axis=0), values.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    cells = np.minimum(((values - low) / span * levels).astype(np.int64), levels - 1)
+    at_max = values >= high
+    cells[at_max] = levels
+    
+    shape = (levels + 1,) * values.shape[1]
+    above = np.zeros(np.prod(shape), dtype=bool)
+    above[np.ravel_multi_index(cells.T, shape)] = True
+    above = above.reshape(shape)
+    for axis in range(values.shape[1]):
+        above = np.flip(np.logical_or.accumulate(np.flip(above, axis), axis=axis), axis)
+    
+    target = np.where(at_max, levels, cells + 1)
+    return above.ravel()[np.ravel_multi_index(target.T, shape)] & ~at_max.all(axis=1)
+
+
+def skyline_mask(values: np.ndarray) -> np.ndarray:
+    """
+    Finds the non-dominated rows of a score matrix (higher is better).
+    
+    Rows certainly dominated are first removed with _grid_dominated().
+    Sort-filter-skyline then runs on the rest: rows are sorted by sum
+    (then lexicographically), so a row can only be dominated by rows before
+    it. Each block taken from the head keeps its rows not dominated within
+    the block; those are skyline rows, and every remaining row they dominate
+    is dropped at once.
+    
+    Args:
+        values: (rows x columns) scores
+    
+    Returns:
+        Boolean mask of skyline rows
+    """
+    mask = np.zeros(len(values), dtype=bool)
+    if len(values) == 0:
+        return mask
+    remaining = np.flatnonzero(~_grid_dominated(values, PARETO_GRID_LEVELS))
+    subset = values[remaining]
+    keys = [-subset[:, j] for j in range(subset.shape[1] - 1, -1, -1)] + [-subset.sum(axis=1)]
+    remaining = remaining[np.lexsort(keys)]
+    
+    block = PARETO_MIN_BLOCK
+    while len(remaining):
+        head, remaining = remaining[:block], remaining[block:]
+        head = head[~_dominated_by(values[head], values[head])]
+        mask[head] = True
+        if len(remaining):
+            remaining = remaining[~_dominated_by(values[remaining], values[head])]
+        block = min(2 * block, PARETO_MAX_BLOCK)
+    return mask
+
+
+def k_dominant_mask(values: np.ndarray, k: int, skyline: Optional[np.ndarray] = None,
+                    chunk: int = 1024) -> np.ndarray:
+    """
+    Finds the rows not k-dominated by any row (higher is better).
+    
+    Every such row is on the skyline, so skyline rows are the candidates and
+    each is checked against all rows (k-dominance isn't transitive, so
+    dominated rows count too). Rows are scanned by descending sum; a row
+    that k-dominates a candidate has a sum of at least the candidate's k
+    lowest scores plus the column minima elsewhere, which ends the scan
+    early. The result may be empty.
+    
+    Args:
+        values: (rows x columns) scores
+        k: Columns on which a dominating row must be at least as good
+        skyline: Optional precomputed skyline_mask(values)
+    
+    Returns:
+        Boolean mask of k-dominant skyline rows
+    """
+    skyline = skyline_mask(values) if skyline is None else skyline
+    candidates = np.flatnonzero(skyline)
+    if k >= values.shape[1] or len(candidates) == 0:
+        return skyline.copy()
+    
+    low = values.min(axis=0)
+    sums = values.sum(axis=1)
+    order = np.argsort(-sums, kind='stable')
+    # Smallest sum of a row >= the candidate on its k lowest columns
+    floor = np.sort(values[candidates] - low, axis=1)[:, :k].sum(axis=1) + low.sum()
+    alive = np.ones(len(candidates), dtype=bool)
+    for start in range(0, len(order), chunk):
+        live = np.flatnonzero(alive)
+        if len(live) == 0 or sums[order[start]] < floor[live].min() - 1e-9:
+            break
+        points = values[order[start:start + chunk]]
+        alive[live[_dominated_by(values[candidates[live]], points, k=k)]] = False
+    
+    mask = np.zeros(len(values), dtype=bool)
+    mask[candidates[alive]] = True
+    return mask
+
+
+def validate_dominance_k(k: Optional[int]):
+    """Raises ValueError unless k is None or a valid k-dominance level."""
+    if k is not None and not 1 <= k <= len(SCENARIO_SCORE_COLUMNS):
+        raise ValueError(f"k must be between 1 and {len(SCENARIO_SCORE_COLUMNS)}")
+
+
+def frontier_positions(values: np.ndarray, k: Optional[int], timer: StageTimer,
+                       cancel: Optional[CancelToken] = None,
+                       skyline: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the (k-dominant) Pareto frontier of a component score matrix.
+    
+    Args:
+        values: (n, m) component scores, higher is better
+        k: Optional k-dominance relaxation (see pareto_frontier)
+        timer: StageTimer for the "skyline" and "k_dominance" stages
+        cancel: Optional CancelToken, checked before each stage
+        skyline: skyline_mask(values), if already known
+    
+    Returns:
+        (frontier positions ordered by the sum of their scores, best first;
+        skyline mask)
+    """
+    check = cancel.check if cancel is not None else lambda stage: None
+    if skyline is None:
+        check("skyline")
+        skyline = skyline_mask(values)
+    timer.mark("skyline", int(skyline.sum()))
+    mask = skyline
+    if k is not None and k < values.shape[1]:
+        check("k_dominance")
+        mask = k_dominant_mask(values, k, skyline=skyline)
+        timer.mark("k_dominance", int(mask.sum()))
+    
+    frontier = np.flatnonzero(mask)
+    frontier = frontier[np.argsort(-values[frontier].sum(axis=1), kind='stable')]
+    print(f"Pareto frontier: {len(frontier)} of {len(values)} nodes"
+          + (f" ({k}-dominance)" if k is not None else ""))
+    return frontier, skyline
+
+
+def pareto_frontier(
+    nodes_df: pd.DataFrame,
+    load_type: str,
+    location_filter: Optional[Dict],
+    resource_config: str,
+    k: Optional[int] = None,
+    column_bounds: Optional[Dict] = None,
+    stats: Optional[Dict] = None,
+    cancel: Optional[CancelToken] = None
+) -> pd.DataFrame:
+    """
+    Finds the nodes not dominated on any scenario component score.
+    
+    The scores compared are SCENARIO_SCORE_COLUMNS of the nodes rank_nodes()
+    would rank (after the quality pre-filter). No weights are involved, so
+    load size and emissions preference don't matter.
+    
+    Args:
+        nodes_df, load_type, location_filter, resource_config, column_bounds,
+        stats, cancel: As for rank_nodes()
+        k: Optional k-dominance relaxation (1-6): a node is excluded if
+           another is at least as good on any k components and better on
+           one. Smaller k gives a smaller (possibly empty) frontier; None or
+           6 is ordinary Pareto dominance.
+    
+    Returns:
+        Frontier nodes (original columns plus component scores), ordered by
+        the sum of their component scores, best first. Empty if no nodes
+        matched or none are k-dominant.
+    
+    Raises:
+        ValueError: For invalid parameters
+        RankingCancelled: If cancel is cancelled or its deadline passes
+    """
+    validate_ranking_params(load_type, resource_config, 0.0)
+    validate_dominance_k(k)
+    
+    timer = StageTimer(stats)
+    check = cancel.check if cancel is not None else lambda stage: None
+    
+    check("clean")
+    df = apply_spatial_filter(validate_and_clean_data(nodes_df), location_filter)
+    timer.mark("spatial_filter", len(df))
+    if len(df) == 0:
+        return pd.DataFrame()
+    
+    check("component_scores")
+    if location_filter is not None:
+        column_bounds = None
+    df = compute_component_scores(df, load_type, resource_config, column_bounds)
+    timer.mark("component_scores", len(df))
+    if len(df) == 0:
+        return pd.DataFrame()
+    
+    frontier, _ = frontier_positions(df[SCENARIO_SCORE_COLUMNS].to_numpy(dtype=float), k, timer, cancel)
+    return df.iloc[frontier]
+
+
+# ============================================================================
+# MAIN RANKING FUNCTION
+# ============================================================================
+
+def rank_nodes(
+    nodes_df: pd.DataFrame,
+    load_type: str,
+    load_size_mw: float,
+    location_filter: Optional[Dict],
+    emissions_preference: float,
+    resource_config: str,
+    top_n: Optional[int] = 200,
+    column_bounds: Optional[Dict] = None,
+    stats: Optional[Dict] = None,
+    cancel: Optional[CancelToken] = None,
+    analytics: Optional[Dict] = None,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Ranks power system nodes for siting a large electric load.
+    
+    This is the main entry point for the ranking engine. It performs:
+    1. Data validation and cleaning
+    2. Spatial filtering
+    3. Component score calculation
+    4. Weight adjustment based on load characteristics
+    5. Composite scoring with baseline and scenario comparisons
+    6. Final ranking and top-N selection
+    
+    Args:
+        nodes_df: DataFrame with node data (see module docstring for required columns)
+        load_type: One of "data_center_always_on", "data_center_flexible", 
+                   "h2_electrolyzer_firm", "industrial_continuous", 
+                   "industrial_flexible", "commercial_campus"
+        load_size_mw: Load size in MW
+        location_filter: Spatial filter dict or None:
+                        - {"states": ["CA", "NY", ...]} for state filter
+                        - {"lat": x, "lon": y, "radius_km": r} for radial filter
+                        - None for no filter
+        emissions_preference: User slider 0-100 (0=don't care, 100=very sensitive)
+        resource_config: One of "none", "solar", "battery", "solar_battery", "firm_gen"
+        top_n: Number of top-ranked nodes to return (default 200, None for all)
+        column_bounds: Optional precomputed quantile bounds per raw column for
+                       the full cleaned dataset (see NodeStore.quantile_bounds).
+                       Only used when location_filter is None.
+        stats: Optional dict that receives per-stage "timings" (seconds) and
+               "row_counts" (rows remaining after each stage), see StageTimer
+        cancel: Optional CancelToken, checked before each stage
+        analytics: Optional dict that receives rank movement analytics over
+                   the full filtered set (see rank_movement_analytics)
+        columns: Optional original columns to include (default all). Callers
+                 holding the dataset can pass e.g. ["node"] and gather the
+                 rest later, which saves copying every column of every row
+                 when top_n is None.
+    
+    Returns:
+        DataFrame with top_n ranked nodes, including:
+        - All original columns (or those in columns)
+        - Component scores (cost_score, land_score, etc.)
+        - Composite scores (score_baseline, score_scenario)
+        - Rankings (rank_baseline, rank_scenario)
+    
+    Raises:
+        RankingCancelled: If cancel is cancelled or its deadline passes
+                          (DeadlineExceeded) before the ranking completes
+    """
+    timer = StageTimer(stats)
+    check = cancel.check if cancel is not None else lambda stage: None
+    
+    # Validate inputs
+    validate_ranking_params(load_type, resource_config, emissions_preference)
+    timer.mark("validate", len(nodes_df))
+    
+    # Step 1: Validate and clean data
+    check("clean")
+    print(f"Starting node ranking for {load_type} ({load_size_mw} MW)")
+    df = validate_and_clean_data(nodes_df)
+    print(f"Validated data: {len(df)} nodes")
+    timer.mark("clean", len(df))
+    
+    # Step 2: Apply spatial filtering
+    check("spatial_filter")
+    df = apply_spatial_filter(df, location_filter)
+    print(f"After spatial filter: {len(df)} nodes")
+    timer.mark("spatial_filter", len(df))
+    
+    if len(df) == 0:
+        print("Warning: No nodes remain after filtering")
+        return pd.DataFrame()
+    
+    # Steps 3-5: Compute component scores (baseline and effective variability)
+    # and apply the quality pre-filter
+    check("component_scores")
+    print("Computing component scores...")
+    if location_filter is not None:
+        column_bounds = None
+    df = compute_component_scores(df, load_type, resource_config, column_bounds)
+    print(f"After quality pre-filter: {len(df)} nodes")
+    timer.mark("component_scores", len(df))
+    
+    if len(df) == 0:
+        print("Warning: No nodes passed quality threshold")
+        return pd.DataFrame()
+    
+    # Step 6: Compute final weights
+    check("composite_scores")
+    weights = compute_final_weights(load_type, load_size_mw, emissions_preference)
+    print(f"Final weights: {weights}")
+    
+    # Step 7: Compute composite scores
+    # Baseline score (no on-site resources) and scenario score (with selected resource_config)
+    weight_matrix = weights_to_matrix([weights])
+    score_baseline = weighted_sum(df[BASELINE_SCORE_COLUMNS].to_numpy(dtype=float), weight_matrix)[:, 0]
+    score_scenario = weighted_sum(df[SCENARIO_SCORE_COLUMNS].to_numpy(dtype=float), weight_matrix)[:, 0]
+    timer.mark("composite_scores")
+    
+    # Steps 8-9: Compute ranks (1 = best), sort by scenario score and return top N
+    check("rank")
+    ranks = (score_ranks(score_baseline), score_ranks(score_scenario))
+    result = rank_scored_nodes(df, score_baseline, score_scenario, top_n, ranks=ranks, columns=columns)
+    timer.mark("rank", len(result))
+    
+    if analytics is not None:
+        analytics.update(rank_movement_analytics(df, *ranks, top_n=top_n))
+        timer.mark("analytics")
+    
+    print(f"Ranking complete. Returning top {len(result)} nodes.")
+    top = result.iloc[0]
+    location = f" in {top['state']}" if 'state' in result.columns else ""
+    print(f"Top node: {top['node']}{location} (score: {top['score_scenario']:.3f})")
+    
+    return result
+
+
+def rank_nodes_scenarios(
+    nodes_df: pd.DataFrame,
+    load_type: str,
+    load_size_mw: float,
+    location_filter: Optional[Dict],
+    emissions_preference: float,
+    resource_configs: Optional[List[str]] = None,
+    top_n: Optional[int] = 200,
+    column_bounds: Optional[Dict] = None,
+    stats: Optional[Dict] = None,
+    cancel: Optional[CancelToken] = None
+) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    Ranks nodes under several resource configs in one pass.
+    
+    Resource configs only change the effective variability score, so data
+    cleaning, filtering, the other component scores, the pre-filter and the
+    first five weighted terms are computed once. Effective variability for
+    every config is computed as one matrix (compute_variability_matrix) and
+    all scenario scores are formed together.
+    
+    Args:
+        nodes_df, load_type, load_size_mw, location_filter,
+        emissions_preference, top_n, column_bounds, stats, cancel:
+            As for rank_nodes()
+        resource_configs: Configs to compare (default: all VALID_RESOURCE_CONFIGS)
+    
+    Returns:
+        (results, comparison):
+        - results: {resource_config: DataFrame}, each identical to
+          rank_nodes(resource_config=...) output plus a rank_delta column
+          (rank_baseline - rank_scenario; positive = moves up with the resources)
+        - comparison: one row per node in any config's top_n, with
+          rank_baseline, rank_<config> and rank_delta_<config> for every
+          config and best_config (config with the best rank), ordered by
+          best rank. Empty if no nodes matched.
+    
+    Raises:
+        ValueError: For invalid parameters
+        RankingCancelled: If cancel is cancelled or its deadline passes
+    """
+    if resource_configs is None:
+        resource_configs = list(VALID_RESOURCE_CONFIGS)
+    if not resource_configs:
+        raise ValueError("resource_configs must not be empty")
+    for config in resource_configs:
+        validate_ranking_params(load_type, config, emissions_preference)
+    resource_configs = list(dict.fromkeys(resource_configs))
+    
+    timer = StageTimer(stats)
+    check = cancel.check if cancel is not None else lambda stage: None
+    timer.mark("validate", len(nodes_df))
+    
+    check("clean")
+    df = validate_and_clean_data(nodes_df)
+    timer.mark("clean", len(df))
+    
+    check("spatial_filter")
+    df = apply_spatial_filter(df, location_filter)
+    timer.mark("spatial_filter", len(df))
+    if location_filter is not None:
+        column_bounds = None
+    
+    # Shared component scores, then effective variability for every config
+    # (normalized over the same pre-filter population as in rank_nodes)
+    check("component_scores")
+    if len(df) > 0:
+        scores, pre_filter_mask = _score_components(df, load_type, "none", column_bounds)
+        effective = compute_variability_matrix(df, resource_configs, column_bounds)
+        components = pd.concat([df, scores], axis=1)[pre_filter_mask]
+        effective = effective[pre_filter_mask.to_numpy()]
+    else:
+        components = df
+    timer.mark("component_scores", len(components))
+    
+    if len(components) == 0:
+        print("Warning: No nodes remain after filtering")
+        return {config: pd.DataFrame() for config in resource_configs}, pd.DataFrame()
+    
+    # Weighted terms shared by every scenario, then each config's variability
+    # term (same accumulation order as weighted_sum, so scores match rank_nodes)
+    check("composite_scores")
+    weights = compute_final_weights(load_type, load_size_mw, emissions_preference)
+    weight_matrix = weights_to_matrix([weights])
+    shared = weighted_sum(components[BASELINE_SCORE_COLUMNS[:-1]].to_numpy(dtype=float),
+                          weight_matrix[:-1])
+    variability_weight = weight_matrix[-1, 0]
+    score_baseline = (shared + components[[BASELINE_SCORE_COLUMNS[-1]]].to_numpy(dtype=float)
+                      * variability_weight)[:, 0]
+    score_scenarios = shared + effective * variability_weight
+    timer.mark("composite_scores")
+    
+    results = {}
+    all_ranks = {}
+    for j, config in enumerate(resource_configs):
+        check(f"rank ({config})")
+        result = rank_scored_nodes(
+            components, score_baseline, score_scenarios[:, j], top_n,
+            replace_columns={"effective_price_variability_penalty_score": effective[:, j]}
+        )
+        result['rank_delta'] = result['rank_baseline'] - result['rank_scenario']
+        results[config] = result
+        all_ranks[config] = score_ranks(score_scenarios[:, j])
+    timer.mark("rank", sum(len(r) for r in results.values()))
+    
+    comparison = compare_scenario_ranks(components, score_baseline, all_ranks, results)
+    print(f"Scenario comparison complete: {len(resource_configs)} configs, "
+          f"{len(comparison)} nodes in any top {top_n}")
+    return results, comparison
+
+
+def compare_scenario_ranks(components: pd.DataFrame, score_baseline: np.ndarray,
+                           all_ranks: Dict[str, np.ndarray],
+                           results: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Builds the side-by-side rank table for rank_nodes_scenarios().
+    
+    Args:
+        components: Scored nodes (rows aligned with the rank arrays)
+        score_baseline: Baseline composite score per row
+        all_ranks: {config: scenario rank per row}
+        results: {config: top-N DataFrame}, selecting the nodes to include
+    
+    Returns:
+        DataFrame with node, state, rank_baseline and per-config rank and
+        rank_delta columns, plus best_config
+    """
+    position = pd.Series(np.arange(len(components)), index=components['node'].to_numpy())
+    position = position[~position.index.duplicated()]
+    nodes = pd.unique(np.concatenate([r['node'].to_numpy() for r in results.values()]))
+    rows = position.loc[nodes].to_numpy()
+    
+    rank_baseline = score_ranks(score_baseline)
+    table = pd.DataFrame({
+        "node": nodes,
+        "state": components['state'].to_numpy()[rows],
+        "rank_baseline": rank_baseline[rows],
+    })
+    configs = list(all_ranks)
+    rank_matrix = np.column_stack([all_ranks[config][rows] for config in configs])
+    for j, config in enumerate(configs):
+        table[f"rank_{config}"] = rank_matrix[:, j]
+        table[f"rank_delta_{config}"] = table["rank_baseline"] - rank_matrix[:, j]
+    table["best_config"] = np.array(configs)[rank_matrix.argmin(axis=1)]
+    
+    best_rank = rank_matrix.min(axis=1)
+    return table.iloc[np.lexsort((rows, best_rank))].reset_index(drop=True)
+
+
+def rank_nodes_batch(nodes_df: pd.DataFrame, requests: List[Dict],
+                     column_bounds: Optional[Dict] = None,
+                     cancel: Optional[CancelToken] = None) -> Iterator[Tuple[int, object]]:
+    """
+    Ranks nodes for many parameter sets, sharing work between them.
+    
+    Data is cleaned once for the whole batch, each distinct location filter is
+    applied once, component scores are computed once per
+    (filter, load_type, resource_config) group, and all weight vectors of a
+    group are scored together in one matrix operation. Results are yielded in
+    request order as soon as they are available.
+    
+    Args:
+        nodes_df: DataFrame with node data
+        requests: List of dicts with rank_nodes() keyword arguments
+                  (load_type, load_size_mw, location_filter,
+                  emissions_preference, resource_config, top_n)
+        column_bounds: Optional precomputed quantile bounds per raw column for
+                       the full cleaned dataset (see NodeStore.quantile_bounds).
+                       Only used for requests whose location_filter is None.
+        cancel: Optional CancelToken, checked before cleaning, before each
+                group's filtering and scoring and before each request's ranking
+    
+    Yields:
+        (index, result) where result is the ranked DataFrame (empty if no
+        nodes matched) or the exception raised for that request
+    
+    Raises:
+        RankingCancelled: If cancel is cancelled or its deadline passes
+                          (DeadlineExceeded); results already yielded stand
+    """
+    check = cancel.check if cancel is not None else lambda stage: None
+    
+    def filter_key(req):
+        return json.dumps(req.get("location_filter"), sort_keys=True, default=str)
+    
+    def group_key(req):
+        return (filter_key(req), req["load_type"], req["resource_config"])
+    
+    # Validate up front, compute weights and collect each group's members
+    errors = {}
+    weights = {}
+    groups: Dict[Tuple, List[int]] = {}
+    filter_uses: Dict[str, int] = {}
+    for i, req in enumerate(requests):
+        try:
+            validate_ranking_params(req["load_type"], req["resource_config"],
+                                    req["emissions_preference"])
+            weights[i] = compute_final_weights(req["load_type"], req["load_size_mw"],
+                                               req["emissions_preference"])
+        except (KeyError, TypeError, ValueError) as e:
+            errors[i] = e
+            continue
+        groups.setdefault(group_key(req), []).append(i)
+        filter_uses[filter_key(req)] = filter_uses.get(filter_key(req), 0) + 1
+    
+    if groups:
+        check("clean")
+    cleaned = validate_and_clean_data(nodes_df) if groups else None
+    filtered: Dict[str, pd.DataFrame] = {}
+    group_scores: Dict[Tuple, Dict] = {}
+    
+    for i, req in enumerate(requests):
+        if i in errors:
+            yield i, errors[i]
+            continue
+        
+        try:
+            gkey = group_key(req)
+            fkey = gkey[0]
+            
+            if gkey not in group_scores:
+                if fkey not in filtered:
+                    check("spatial_filter")
+                    filtered[fkey] = apply_spatial_filter(cleaned, req.get("location_filter"))
+                df = filtered[fkey]
+                
+                members = groups[gkey]
+                entry = {"remaining": len(members), "columns": {}}
+                if len(df) > 0:
+                    check("component_scores")
+                    bounds = column_bounds if req.get("location_filter") is None else None
+                    components = compute_component_scores(df, req["load_type"], req["resource_config"],
+                                                          bounds)
+                    weight_matrix = weights_to_matrix([weights[j] for j in members])
+                    entry["components"] = components
+                    entry["baseline"] = weighted_sum(
+                        components[BASELINE_SCORE_COLUMNS].to_numpy(dtype=float), weight_matrix)
+                    entry["scenario"] = weighted_sum(
+                        components[SCENARIO_SCORE_COLUMNS].to_numpy(dtype=float), weight_matrix)
+                    entry["columns"] = {j: col for col, j in enumerate(members)}
+                group_scores[gkey] = entry
+                
+                # Release the filtered frame once every group using it has been scored
+                filter_uses[fkey] -= len(members)
+                if filter_uses[fkey] == 0:
+                    del filtered[fkey]
+            
+            entry = group_scores[gkey]
+            if i in entry["columns"] and len(entry["components"]) > 0:
+                check("rank")
+                col = entry["columns"][i]
+                result = rank_scored_nodes(entry["components"], entry["baseline"][:, col],
+                                           entry["scenario"][:, col], req.get("top_n", 200))
+            else:
+                result = pd.DataFrame()
+            
+            entry["remaining"] -= 1
+            if entry["remaining"] == 0:
+                del group_scores[gkey]
+            
+            yield i, result
+        
+        except RankingCancelled:
+            raise
+        except Exception as e:
+            yield i, e
+
+
+# ============================================================================
+# CONVENIENCE FUNCTIONS
+# ============================================================================
+
+def load_nodes_from_csv(filepath: str) -> pd.DataFrame:
+    """
+    Loads node data from CSV file.
+    
+    Args:
+        filepath: Path to CSV file
+    
+    Returns:
+        DataFrame with node data
+    """
+    return pd.read_csv(filepath)
+
+
+# Plain-language names of the factors behind a ranking (WEIGHT_COMPONENTS keys)
+EXPLANATION_FACTOR_NAMES = {
+    'cost': 'low energy costs',
+    'land': 'affordable land',
+    'policy': 'strong policy support',
+    'queue': 'low interconnection queue pressure',
+    'emissions': 'low emissions intensity',
+    'variability': 'low price variability exposure',
+}
+
+# Number of top factors considered, and the smallest contribution mentioned
+EXPLANATION_TOP_FACTORS = 3
+EXPLANATION_MIN_CONTRIBUTION = 0.1
+
+
+def explain_rankings(results_df: pd.DataFrame, weights: Dict[str, float]) -> pd.DataFrame:
+    """
+    Explains why each ranked node scores well, for all rows at once.
+    
+    Builds the (nodes x 6) weighted contribution matrix (weight x scenario
+    component score, which sums to score_scenario), picks each row's top
+    EXPLANATION_TOP_FACTORS factors with one stable argsort, and keeps those
+    contributing more than EXPLANATION_MIN_CONTRIBUTION. Produces the same
+    explanation as get_ranking_explanation() row by row.
+    
+    Args:
+        results_df: Ranked results (rank_nodes() output or any subset of rows)
+        weights: Weight dictionary used in scoring
+    
+    Returns:
+        DataFrame indexed like results_df with one "<component>_contribution"
+        column per WEIGHT_COMPONENTS entry, "top_factors" (list of the
+        significant components, largest first) and "explanation"
+    """
+    n = len(results_df)
+    components = np.zeros((n, len(WEIGHT_COMPONENTS)))
+    for j, column in enumerate(SCENARIO_SCORE_COLUMNS):
+        if column in results_df.columns:
+            components[:, j] = results_df[column].to_numpy(dtype=float)
+    contributions = components * weights_to_matrix([weights])[:, 0]
+    
+    # Stable descending order: ties keep WEIGHT_COMPONENTS order, like sorted()
+    top = np.argsort(-contributions, axis=1, kind='stable')[:, :EXPLANATION_TOP_FACTORS]
+    significant = np.take_along_axis(contributions, top, axis=1) > EXPLANATION_MIN_CONTRIBUTION
+    
+    factor_keys = np.array(WEIGHT_COMPONENTS, dtype=object)
+    top_factors = [list(factor_keys[row[mask]]) for row, mask in zip(top, significant)]
+    
+    if 'node' in results_df.columns:
+        names = results_df['node'].tolist()
+    else:
+        names = ['This node'] * n
+    if 'county_state_pairs' in results_df.columns:
+        locations = results_df['county_state_pairs'].tolist()
+    elif 'state' in results_df.columns:
+        locations = results_df['state'].tolist()
+    else:
+        locations = ['Unknown'] * n
+    
+    explanations = [
+        f"{name} in {location} ranks highly due to "
+        f"{', '.join(EXPLANATION_FACTOR_NAMES[f] for f in factors)}."
+        for name, location, factors in zip(names, locations, top_factors)
+    ]
+    
+    result = pd.DataFrame(contributions, index=results_df.index,
+                          columns=[f"{c}_contribution" for c in WEIGHT_COMPONENTS])
+    result['top_factors'] = top_factors
+    result['explanation'] = explanations
+    return result
+
+
+def get_ranking_explanation(node_row: pd.Series, weights: Dict[str, float]) -> str:
+    """
+    Generates human-readable explanation for why a node ranks well.
+    
+    Explains a single row; use explain_rankings() for many rows.
+    
+    Args:
+        node_row: Series representing a single node's data
+        weights: Weight dictionary used in scoring
+    
+    Returns:
+        Explanation string
+    """
+    return explain_rankings(node_row.to_frame().T, weights)['explanation'].iloc[0]
 
 
 # ============================================================================
@@ -0,0 +1,303 @@
+"""
+Prepared Node Store
+
+Holds one versioned snapshot of the node dataset, already validated and
+cleaned, so servers can swap datasets atomically without restarting.
+
+Snapshots also keep sorted copies of the columns that robust_min_max
+normalizes, so small market-data patches refresh the normalization bounds
+without re-sorting the whole dataset.
+
+Usage:
+    from node_store import NodeStore
+
+    store = NodeStore.from_csv("final_csv_v1.csv")
+    results = rank_nodes(nodes_df=store.nodes_df, column_bounds=store.column_bounds(), ...)
+
+    store = store.patch([{"node": "N123", "avg_lmp": 41.2, "queue_pending_mw": 850}])
+"""
+
+import hashlib
+import io
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from node_ranking_engine import (
+    validate_and_clean_data,
+    NUMERIC_COLUMNS,
+    BOUNDED_COLUMNS,
+    ORDER_STAT_COLUMNS,
+)
+
+
+def sorted_quantile(sorted_values: np.ndarray, q: float) -> float:
+    """
+    Quantile of an already-sorted array in O(1).
+
+    Matches pandas Series.quantile / numpy's default 'linear' method exactly,
+    including its lerp rounding, so precomputed bounds reproduce the same
+    normalized scores.
+
+    Args:
+        sorted_values: Non-empty ascending array without NaNs
+        q: Quantile in [0, 1]
+
+    Returns:
+        Interpolated quantile value
+    """
+    n = len(sorted_values)
+    virtual = (n - 1) * q
+    prev = int(np.floor(virtual))
+    gamma = virtual - prev
+    prev = min(max(prev, 0), n - 1)
+    nxt = min(prev + 1, n - 1)
+
+    a = float(sorted_values[prev])
+    b = float(sorted_values[nxt])
+    diff = b - a
+    if gamma >= 0.5:
+        return b - diff * (1 - gamma)
+    return a + diff * gamma
+
+
+def _replace_sorted(sorted_values: np.ndarray, old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """
+    Replaces the multiset old with new in a sorted array.
+
+    Positions are located by binary search (O(k log n)), so nothing is
+    re-sorted, but np.delete and np.insert still copy the whole array: each
+    call is an O(n) memmove per column. For the small k of a patch this is
+    far cheaper than sorting again (O(n log n)).
+    """
+    old = np.sort(old)
+    # Equal old values occupy a run in sorted_values; step through the run
+    run_offset = np.arange(len(old)) - np.searchsorted(old, old, side='left')
+    remove_at = np.searchsorted(sorted_values, old, side='left') + run_offset
+    remaining = np.delete(sorted_values, remove_at)
+
+    new = np.sort(new)
+    return np.insert(remaining, np.searchsorted(remaining, new, side='left'), new)
+
+
+class NodeStore:
+    """
+    A prepared snapshot of the node dataset.
+
+    The version ID is derived from the source file's contents, so every
+    process loading the same file agrees on it and reloading an unchanged
+    file keeps the same version (and therefore the same cache keys).
+
+    Attributes:
+        nodes_df: Cleaned node DataFrame (see validate_and_clean_data)
+        version: Dataset version ID
+        source: Path the data was loaded from (None if built in memory)
+        source_mtime: Modification time of the source when it was read
+        loaded_at: Unix time the snapshot was built
+        patches_applied: Number of patches applied since the source was loaded
+    """
+
+    def __init__(self, nodes_df: pd.DataFrame, version: str,
+                 source: Optional[str] = None, source_mtime: Optional[float] = None):
+        self.nodes_df = nodes_df
+        self.version = version
+        self.source = source
+        self.source_mtime = source_mtime
+        self.loaded_at = time.time()
+        self.patches_applied = 0
+
+        # Sorted column values (None if the column has NaNs), built lazily
+        self._sorted: Dict[str, Optional[np.ndarray]] = {}
+        self._column_bounds: Optional[Dict[str, Tuple[float, float]]] = None
+        self._node_index: Optional[pd.Index] = None
+
+    @classmethod
+    def from_csv(cls, filepath: str) -> "NodeStore":
+        """
+        Loads and prepares a snapshot from a CSV file.
+
+        The file is read once, so the version always matches the parsed data
+        even if the file is replaced while loading.
+
+        Args:
+            filepath: Path to node CSV file
+
+        Returns:
+            New NodeStore
+        """
+        source_mtime = os.path.getmtime(filepath)
+        with open(filepath, "rb") as f:
+            raw = f.read()
+
+        version = hashlib.sha1(raw).hexdigest()[:12]
+        nodes_df = validate_and_clean_data(pd.read_csv(io.BytesIO(raw)))
+
+        return cls(nodes_df, version, source=filepath, source_mtime=source_mtime)
+
+    def __len__(self) -> int:
+        return len(self.nodes_df)
+
+    # ------------------------------------------------------------------------
+    # Order statistics
+    # ------------------------------------------------------------------------
+
+    def _sorted_values(self, column: str) -> Optional[np.ndarray]:
+        if column not in self._sorted:
+            values = self.nodes_df[column].to_numpy(dtype=float)
+            self._sorted[column] = None if np.isnan(values).any() else np.sort(values)
+        return self._sorted[column]
+
+    def quantile_bounds(self, column: str, clip_low: float = 0.05,
+                        clip_high: float = 0.95) -> Optional[Tuple[float, float]]:
+        """
+        Returns robust_min_max clipping bounds for a column.
+
+        Args:
+            column: Column name
+            clip_low: Lower quantile (default 5%)
+            clip_high: Upper quantile (default 95%)
+
+        Returns:
+            (q_low, q_high), or None if the column is missing, empty or has NaNs
+        """
+        if column not in self.nodes_df.columns:
+            return None
+        sorted_values = self._sorted_values(column)
+        if sorted_values is None or len(sorted_values) == 0:
+            return None
+        return sorted_quantile(sorted_values, clip_low), sorted_quantile(sorted_values, clip_high)
+
+    def column_bounds(self) -> Dict[str, Tuple[float, float]]:
+        """
+        Returns default robust_min_max bounds for every ORDER_STAT_COLUMNS column.
+
+        Valid for rankings over the full snapshot (no location filter); pass
+        as rank_nodes(column_bounds=...).
+        """
+        if self._column_bounds is None:
+            bounds = {}
+            for column in ORDER_STAT_COLUMNS:
+                column_bounds = self.quantile_bounds(column)
+                if column_bounds is not None:
+                    bounds[column] = column_bounds
+            self._column_bounds = bounds
+        return self._column_bounds
+
+    # ------------------------------------------------------------------------
+    # Patching
+    # ------------------------------------------------------------------------
+
+    def _rows_for_nodes(self, nodes: pd.Index) -> Tuple[np.ndarray, np.ndarray]:
+        """Maps node IDs to (row positions, update positions); KeyError if unknown."""
+        if self._node_index is None:
+            self._node_index = pd.Index(self.nodes_df['node'])
+
+        if self._node_index.is_unique:
+            rows = self._node_index.get_indexer(nodes)
+            found = rows >= 0
+            if not found.all():
+                missing = list(nodes[~found][:10])
+                raise KeyError(f"Unknown node(s): {missing}")
+            return rows, np.arange(len(nodes))
+
+        # Duplicate node IDs: every matching row receives the update
+        update_of_row = nodes.get_indexer(self._node_index)
+        rows = np.flatnonzero(update_of_row >= 0)
+        unmatched = np.setdiff1d(np.arange(len(nodes)), update_of_row[rows])
+        if len(unmatched) > 0:
+            raise KeyError(f"Unknown node(s): {list(nodes[unmatched][:10])}")
+        return rows, update_of_row[rows]
+
+    def nodes_unique(self) -> bool:
+        """True if every node ID appears once, so rows can be located by node ID."""
+        if self._node_index is None:
+            self._node_index = pd.Index(self.nodes_df['node'])
+        return self._node_index.is_unique
+
+    def node_positions(self, nodes) -> Optional[np.ndarray]:
+        """
+        Returns the row positions of node IDs in nodes_df.
+
+        Args:
+            nodes: Sequence of node IDs
+
+        Returns:
+            Integer positions, or None if node IDs in the dataset aren't unique
+
+        Raises:
+            KeyError: If a node ID is not in the dataset
+        """
+        if not self.nodes_unique():
+            return None
+        rows, _ = self._rows_for_nodes(pd.Index(nodes))
+        return rows
+
+    def patch(self, updates: Union[pd.DataFrame, List[Dict]]) -> "NodeStore":
+        """
+        Applies column updates for a set of nodes.
+
+        Returns a new snapshot and leaves this one untouched, so rankings
+        already running keep a consistent view. Only the patched columns are
+        copied; order statistics are carried over and updated incrementally.
+
+        Args:
+            updates: DataFrame or list of dicts with a 'node' column and one or
+                     more numeric data columns (e.g. avg_lmp, queue_pending_mw).
+                     If a node appears more than once, the last update wins.
+
+        Returns:
+            New NodeStore with a new version ID
+
+        Raises:
+            ValueError: If updates are malformed or contain non-numeric values
+            KeyError: If a node ID is not in the dataset
+        """
+        updates = pd.DataFrame(updates)
+        if 'node' not in updates.columns:
+            raise ValueError("Updates must include a 'node' column")
+
+        columns = [c for c in updates.columns if c != 'node']
+        if not columns:
+            raise ValueError("Updates must include at least one data column")
+        invalid = [c for c in columns if c not in NUMERIC_COLUMNS or c not in self.nodes_df.columns]
+        if invalid:
+            raise ValueError(f"Columns cannot be patched: {invalid}")
+
+        updates = updates.drop_duplicates(subset='node', keep='last')
+        rows, update_pos = self._rows_for_nodes(pd.Index(updates['node']))
+
+        patched_df = self.nodes_df.copy(deep=False)
+        patched_sorted = dict(self._sorted)
+        for column in columns:
+            new_values = pd.to_numeric(updates[column], errors='coerce').to_numpy(dtype=float)
+            if np.isnan(new_values).any():
+                raise ValueError(f"Column '{column}' has missing or non-numeric values")
+            if column in BOUNDED_COLUMNS:
+                new_values = np.clip(new_values, 0.0, 1.0)
+            new_values = new_values[update_pos]
+
+            current = self.nodes_df[column].to_numpy()
+            if current.dtype.kind != 'f' and not np.array_equal(new_values, np.round(new_values)):
+                current = current.astype(float)
+            values = current.copy()
+            values[rows] = new_values
+            patched_df[column] = values
+
+            sorted_values = patched_sorted.get(column)
+            if sorted_values is not None:
+                patched_sorted[column] = _replace_sorted(
+                    sorted_values, current[rows].astype(float), new_values
+                )
+
+        payload = json.dumps(updates.to_dict(orient='list'), sort_keys=True, default=str)
+        version = hashlib.sha1(f"{self.version}:{payload}".encode()).hexdigest()[:12]
+
+        patched = NodeStore(patched_df, version, source=self.source, source_mtime=self.source_mtime)
+        patched.patches_applied = self.patches_applied + 1
+        patched._sorted = patched_sorted
+        patched._node_index = self._node_index
+        return patched
@@ -0,0 +1,295 @@
+"""
+Server Metrics for Node Ranking Engine
+
+In-process request counters and latency histograms for the API servers,
+exported as JSON or in the Prometheus text format.
+
+Recording is lock-free on the hot path: every thread updates its own shard
+(plain dicts, no shared state), and shards are only merged when metrics are
+read. Each worker process keeps its own metrics.
+
+Usage:
+    from server_metrics import METRICS
+
+    METRICS.inc("http_requests_total", {"endpoint": "/api/rank", "status": "200"})
+    METRICS.observe("http_request_duration_seconds", 0.042, {"endpoint": "/api/rank"})
+    print(METRICS.render_prometheus())
+"""
+
+import bisect
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 200, 500, 1000, 5000, 20000, 100000, 1000000)
+BYTE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+# Prefix for exported metric names
+METRIC_PREFIX = "noderank_"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Thread-sharded counters and histograms.
+
+    Metrics must be declared (counter() / histogram()) before use. Shards of
+    threads that have exited are folded into a shared "retired" shard when a
+    new thread registers, so per-request threads don't accumulate shards.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, Dict]] = []
+        self._retired: Dict = {}
+        self._counters: Dict[str, str] = {}
+        self._histograms: Dict[str, Tuple[Tuple[float, ...], str]] = {}
+        self.started_at = time.time()
+
+    def counter(self, name: str, help_text: str):
+        """Declares a counter."""
+        self._counters[name] = help_text
+
+    def histogram(self, name: str, buckets: Tuple[float, ...], help_text: str):
+        """Declares a histogram with the given bucket upper bounds."""
+        self._histograms[name] = (tuple(buckets), help_text)
+
+    # ------------------------------------------------------------------------
+    # Recording (hot path, no locks after a thread's first call)
+    # ------------------------------------------------------------------------
+
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                alive = []
+                for thread, old in self._shards:
+                    if thread.is_alive():
+                        alive.append((thread, old))
+                    else:
+                        _merge_into(self._retired, old)
+                alive.append((threading.current_thread(), shard))
+                self._shards = alive
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name: str, labels: Optional[Dict[str, Any]] = None, amount: float = 1):
+        """Increments a counter."""
+        shard = self._shard()
+        key = (name, _label_key(labels))
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        """Records one histogram observation."""
+        buckets = self._histograms[name][0]
+        shard = self._shard()
+        key = (name, _label_key(labels))
+        hist = shard.get(key)
+        if hist is None:
+            # Per-bucket counts (last is +Inf), then the sum of observations
+            hist = shard[key] = [0] * (len(buckets) + 1) + [0.0]
+        hist[bisect.bisect_left(buckets, value)] += 1
+        hist[-1] += value
+
+    # ------------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------------
+
+    def _merged(self) -> Dict:
+        with self._lock:
+            shards = [self._retired] + [shard for _, shard in self._shards]
+            merged = {}
+            for shard in shards:
+                _merge_into(merged, shard)
+        return merged
+
+    def total(self, name: str) -> float:
+        """Returns a counter's value summed over all label sets."""
+        return sum(value for (metric, _), value in self._merged().items() if metric == name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns all metrics as JSON-serializable data.
+
+        Returns:
+            {"counters": {name: [{"labels", "value"}]},
+             "histograms": {name: [{"labels", "count", "sum", "mean",
+                                    "p50", "p95", "p99", "buckets"}]}}
+            Buckets are cumulative [upper_bound, count] pairs. Quantiles are
+            estimated by interpolating within buckets.
+        """
+        counters = {name: [] for name in self._counters}
+        histograms = {name: [] for name in self._histograms}
+
+        for (name, labels), value in sorted(self._merged().items()):
+            if name in self._counters:
+                counters[name].append({"labels": dict(labels), "value": value})
+                continue
+
+            buckets = self._histograms[name][0]
+            counts = value[:-1]
+            total = sum(counts)
+            histograms[name].append({
+                "labels": dict(labels),
+                "count": total,
+                "sum": value[-1],
+                "mean": value[-1] / total if total else None,
+                "p50": _bucket_quantile(buckets, counts, 0.50),
+                "p95": _bucket_quantile(buckets, counts, 0.95),
+                "p99": _bucket_quantile(buckets, counts, 0.99),
+                "buckets": [[_format_bound(b), c] for b, c in zip(buckets + (float("inf"),), _cumulative(counts))],
+            })
+
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self, gauges: Optional[Dict[str, Tuple[float, str]]] = None) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Args:
+            gauges: Extra point-in-time values, {name: (value, help_text)}
+
+        Returns:
+            Exposition text
+        """
+        merged = self._merged()
+        lines = []
+
+        for name, help_text in self._counters.items():
+            full = METRIC_PREFIX + name
+            lines += [f"# HELP {full} {help_text}", f"# TYPE {full} counter"]
+            for (metric, labels), value in sorted(merged.items()):
+                if metric == name:
+                    lines.append(f"{full}{_format_labels(labels)} {_format_value(value)}")
+
+        for name, (buckets, help_text) in self._histograms.items():
+            full = METRIC_PREFIX + name
+            lines += [f"# HELP {full} {help_text}", f"# TYPE {full} histogram"]
+            for (metric, labels), value in sorted(merged.items()):
+                if metric != name:
+                    continue
+                counts = _cumulative(value[:-1])
+                for bound, count in zip(buckets + (float("inf"),), counts):
+                    le = labels + (("le", _format_bound(bound)),)
+                    lines.append(f"{full}_bucket{_format_labels(le)} {count}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                lines.append(f"{full}_count{_format_labels(labels)} {counts[-1]}")
+
+        for name, (value, help_text) in (gauges or {}).items():
+            full = METRIC_PREFIX + name
+            lines += [f"# HELP {full} {help_text}", f"# TYPE {full} gauge",
+                      f"{full} {_format_value(value)}"]
+
+        return "\n".join(lines) + "\n"
+
+
+def _merge_into(target: Dict, shard: Dict):
+    # list() copies the items atomically, so the owning thread may keep writing
+    for key, value in list(shard.items()):
+        if isinstance(value, list):
+            existing = target.get(key)
+            if existing is None:
+                target[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    existing[i] += v
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def _cumulative(counts: List[int]) -> List[int]:
+    total = 0
+    result = []
+    for c in counts:
+        total += c
+        result.append(total)
+    return result
+
+
+def _bucket_quantile(buckets: Tuple[float, ...], counts: List[int], q: float) -> Optional[float]:
+    """Estimates a quantile from bucket counts (linear within a bucket)."""
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = q * total
+    seen = 0
+    lower = 0.0
+    for bound, count in zip(buckets, counts):
+        if count and seen + count >= rank:
+            return lower + (bound - lower) * (rank - seen) / count
+        seen += count
+        lower = bound
+    return buckets[-1]  # In the +Inf bucket: report the largest finite bound
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else _format_value(bound)
+
+
+def _format_value(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+def memory_usage() -> Dict[str, Optional[int]]:
+    """
+    Returns process memory usage in bytes.
+
+    Returns:
+        {"rss_bytes": current resident set size (None if unavailable),
+         "max_rss_bytes": peak resident set size (None if unavailable)}
+    """
+    rss = None
+    max_rss = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        import sys
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss *= 1 if sys.platform == "darwin" else 1024  # KiB on Linux
+    except ImportError:
+        pass
+    return {"rss_bytes": rss, "max_rss_bytes": max_rss}
+
+
+# ============================================================================
+# SERVER METRICS
+# ============================================================================
+
+METRICS = MetricsRegistry()
+
+METRICS.counter("http_requests_total", "HTTP requests by endpoint, method and status")
+METRICS.counter("http_requests_started_total", "HTTP requests started")
+METRICS.counter("http_requests_finished_total", "HTTP requests finished")
+METRICS.counter("admission_rejections_total", "Requests shed by admission control, by class and reason")
+METRICS.histogram("http_request_duration_seconds", LATENCY_BUCKETS_S,
+                  "Time to produce the response (headers, for streamed responses)")
+METRICS.histogram("http_response_bytes", BYTE_BUCKETS, "Response body size (non-streamed responses)")
+METRICS.histogram("result_rows", ROW_BUCKETS, "Result rows returned per request")
+METRICS.histogram("admission_wait_seconds", LATENCY_BUCKETS_S,
+                  "Time spent waiting for an admission slot, by priority class")
+METRICS.histogram("rank_stage_duration_seconds", LATENCY_BUCKETS_S,
+                  "Time spent in each rank_nodes stage (computed rankings only)")
@@ -0,0 +1,421 @@
+"""
+Background Sweep Jobs for Node Ranking Engine
+
+Runs large parameter sweeps (locations x load types x resource configs x
+sizes x emissions preferences, often thousands of rankings) on a process
+pool in the background. Partial results are written to local disk as each
+task finishes, progress can be polled, and completed jobs are merged into a
+single columnar file (Parquet if pyarrow is installed, otherwise CSV).
+
+Job state lives in one directory per job under the jobs directory, so any
+worker process on the host can report status and serve results.
+
+Usage:
+    from sweep_jobs import SweepJobManager, expand_sweep
+
+    manager = SweepJobManager("jobs", workers=4)
+    requests = expand_sweep({"states": "all", "emissions_preferences": [0, 50, 100]}, all_states)
+    job = manager.submit(requests, store)
+    manager.status(job["job_id"])
+"""
+
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from node_ranking_engine import (
+    rank_nodes_batch,
+    VALID_LOAD_TYPES,
+    VALID_RESOURCE_CONFIGS,
+    BASELINE_SCORE_COLUMNS,
+    SCENARIO_SCORE_COLUMNS,
+)
+from node_store import NodeStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Sweep parameter columns identifying each result row's ranking
+JOB_PARAM_COLUMNS = ["ranking", "location", "load_type", "resource_config",
+                     "load_size_mw", "emissions_preference"]
+
+# Columns written for every ranked node, after the sweep parameter columns
+JOB_RESULT_COLUMNS = ["node", "state", "iso", "score_baseline", "score_scenario",
+                      "rank_baseline", "rank_scenario"] + \
+    list(dict.fromkeys(BASELINE_SCORE_COLUMNS + SCENARIO_SCORE_COLUMNS))
+
+# Types of the job columns that aren't float64. Parts with no rows are built
+# with them, since untyped empty columns would be written as Arrow null and
+# no longer match the schema of the other parts.
+JOB_COLUMN_DTYPES = {"ranking": "int64", "location": "string", "load_type": "string",
+                     "resource_config": "string", "node": "string", "state": "string",
+                     "iso": "string", "rank_baseline": "int64", "rank_scenario": "int64"}
+
+# Maximum rankings per pool task; rankings sharing a location filter, load
+# type and resource config are kept together so they share component scores
+JOB_TASK_RANKINGS = 150
+
+
+# ============================================================================
+# SWEEP SPECIFICATION
+# ============================================================================
+
+def expand_sweep(spec: Dict[str, Any], all_states: List[str]) -> List[Dict[str, Any]]:
+    """
+    Expands a sweep specification into individual rank_nodes() requests.
+
+    Spec fields (all optional):
+        load_types: List of load types (default: all)
+        resource_configs: List of resource configs (default: all)
+        load_sizes_mw: List of load sizes (default: [100])
+        emissions_preferences: List of slider values (default: [50])
+        states: List of state codes, each ranked separately, or "all" for
+                every state in the dataset
+        location_filters: Explicit list of location filters (null = nationwide);
+                          overrides states. Default: nationwide only.
+        top_n: Results kept per ranking (default 200)
+
+    Args:
+        spec: Sweep specification
+        all_states: State codes available in the dataset (for "all")
+
+    Returns:
+        List of dicts with rank_nodes() keyword arguments
+
+    Raises:
+        ValueError: If a field has the wrong shape
+    """
+    def as_list(name, default):
+        value = spec.get(name, default)
+        if not isinstance(value, list) or not value:
+            raise ValueError(f"{name} must be a non-empty list")
+        return value
+
+    load_types = as_list("load_types", VALID_LOAD_TYPES)
+    resource_configs = as_list("resource_configs", VALID_RESOURCE_CONFIGS)
+    sizes = as_list("load_sizes_mw", [100])
+    emissions = as_list("emissions_preferences", [50])
+
+    if "location_filters" in spec:
+        locations = as_list("location_filters", None)
+    elif "states" in spec:
+        states = all_states if spec["states"] == "all" else as_list("states", None)
+        locations = [{"states": [state]} for state in states]
+    else:
+        locations = [None]
+
+    top_n = spec.get("top_n", 200)
+    return [
+        {
+            "location_filter": location,
+            "load_type": load_type,
+            "resource_config": resource_config,
+            "load_size_mw": size,
+            "emissions_preference": emission,
+            "top_n": top_n
+        }
+        for location, load_type, resource_config, size, emission
+        in itertools.product(locations, load_types, resource_configs, sizes, emissions)
+    ]
+
+
+def plan_tasks(requests: List[Dict[str, Any]], max_rankings: int = JOB_TASK_RANKINGS) -> List[List[int]]:
+    """
+    Splits request indices into pool tasks that keep shared work together.
+
+    Requests are ordered by (location filter, load type, resource config) so
+    each task's batch shares data filtering and component scoring.
+    """
+    def group_key(i):
+        req = requests[i]
+        return (json.dumps(req["location_filter"], sort_keys=True), req["load_type"], req["resource_config"])
+
+    order = sorted(range(len(requests)), key=group_key)
+    return [order[i:i + max_rankings] for i in range(0, len(order), max_rankings)]
+
+
+# ============================================================================
+# FILE OUTPUT
+# ============================================================================
+
+def result_format() -> str:
+    """Format of job result files: "parquet" if pyarrow is available, else "csv"."""
+    return "parquet" if pq is not None else "csv"
+
+
+def write_frame(df: pd.DataFrame, path: str):
+    """Writes a DataFrame in the job result format."""
+    if pq is not None:
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+    else:
+        df.to_csv(path, index=False)
+
+
+def empty_part() -> pd.DataFrame:
+    """A part with no rows, typed like the parts that have results."""
+    return pd.DataFrame({
+        column: pd.Series(dtype=JOB_COLUMN_DTYPES.get(column, "float64"))
+        for column in JOB_PARAM_COLUMNS + JOB_RESULT_COLUMNS
+    })
+
+
+def merge_parts(part_paths: List[str], path: str) -> int:
+    """
+    Concatenates part files into one result file, one part in memory at a time.
+
+    Returns:
+        Total rows written
+    """
+    rows = 0
+    if pq is not None:
+        writer = None
+        try:
+            for part in part_paths:
+                table = pq.read_table(part)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+                rows += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(path, "w") as out:
+            for i, part in enumerate(part_paths):
+                with open(part) as f:
+                    header = f.readline()
+                    if i == 0:
+                        out.write(header)
+                    for line in f:
+                        out.write(line)
+                        rows += 1
+    return rows
+
+
+# ============================================================================
+# WORKER PROCESS FUNCTIONS
+# ============================================================================
+
+# Node data of the snapshot being swept, inside each pool worker
+_JOB_NODES_DF = None
+
+
+def _init_job_worker(nodes_df: pd.DataFrame):
+    """Process pool initializer - receives the snapshot's node data."""
+    global _JOB_NODES_DF
+    _JOB_NODES_DF = nodes_df
+
+
+def _run_task(task_index: int, request_ids: List[int], requests: List[Dict[str, Any]],
+              path: str) -> Dict[str, int]:
+    """
+    Ranks one task's requests and writes their results to a part file.
+
+    Args:
+        task_index: Task number (for progress reporting)
+        request_ids: Sweep-wide index of each request
+        requests: rank_nodes() keyword arguments, aligned with request_ids
+        path: Part file to write
+
+    Returns:
+        {"task", "rankings", "failed", "rows"}
+    """
+    parts = []
+    failed = 0
+    for i, result in rank_nodes_batch(_JOB_NODES_DF, requests):
+        if isinstance(result, Exception):
+            failed += 1
+            continue
+        if len(result) == 0:
+            continue
+        req = requests[i]
+        part = result.reindex(columns=JOB_RESULT_COLUMNS)
+        part.insert(0, "ranking", request_ids[i])
+        part.insert(1, "location", json.dumps(req["location_filter"], sort_keys=True))
+        part.insert(2, "load_type", req["load_type"])
+        part.insert(3, "resource_config", req["resource_config"])
+        part.insert(4, "load_size_mw", float(req["load_size_mw"]))
+        part.insert(5, "emissions_preference", float(req["emissions_preference"]))
+        parts.append(part)
+
+    df = pd.concat(parts, ignore_index=True) if parts else empty_part()
+    write_frame(df, path)
+    return {"task": task_index, "rankings": len(request_ids), "failed": failed, "rows": len(df)}
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# ============================================================================
+# JOB MANAGER
+# ============================================================================
+
+class SweepJobManager:
+    """
+    Queues sweep jobs and runs them one at a time on a process pool.
+
+    Each job gets a directory under job_dir holding job.json (status and
+    progress, rewritten atomically as tasks finish), one part file per
+    finished task, and finally the merged result file. Status is read from
+    disk, so every worker process on the host can answer polls.
+
+    Jobs run on a thread of the process that accepted them. If that process
+    exits (e.g. a gunicorn worker recycled by max_requests), its queued and
+    running jobs stop and report status "failed" with an "Interrupted" error.
+    """
+
+    def __init__(self, job_dir: str, workers: int):
+        self.job_dir = job_dir
+        self.workers = workers
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._runner: Optional[threading.Thread] = None
+        self._runner_pid = None
+
+    def _path(self, job_id: str, name: str = "") -> str:
+        return os.path.join(self.job_dir, job_id, name)
+
+    def _save(self, job: Dict[str, Any]):
+        path = self._path(job["job_id"], "job.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp, path)
+
+    def submit(self, requests: List[Dict[str, Any]], store: NodeStore) -> Dict[str, Any]:
+        """
+        Queues a sweep over a dataset snapshot.
+
+        Args:
+            requests: rank_nodes() keyword arguments (see expand_sweep)
+            store: Snapshot to rank; the job keeps using it even if the
+                   dataset is reloaded meanwhile
+
+        Returns:
+            Initial job status
+        """
+        job_id = uuid.uuid4().hex[:16]
+        os.makedirs(self._path(job_id))
+        tasks = plan_tasks(requests)
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "dataset_version": store.version,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "total_rankings": len(requests),
+            "completed_rankings": 0,
+            "failed_rankings": 0,
+            "total_tasks": len(tasks),
+            "completed_tasks": 0,
+            "rows": 0,
+            "result_format": result_format(),
+            "error": None,
+            "pid": os.getpid()
+        }
+        self._save(job)
+        initial = dict(job)  # The runner thread updates job in place
+        self._queue.put((job, requests, tasks, store))
+        self._ensure_runner()
+        return initial
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a job's status, or None if unknown."""
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id, "job.json")) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job["status"] in ("queued", "running") and not _process_alive(job["pid"]):
+            job.update(status="failed", error="Interrupted: the server process running the job exited")
+        return job
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Returns the status of every job, newest first."""
+        if not os.path.isdir(self.job_dir):
+            return []
+        jobs = [self.status(job_id) for job_id in os.listdir(self.job_dir)]
+        return sorted([j for j in jobs if j], key=lambda j: j["created_at"], reverse=True)
+
+    def result_path(self, job_id: str) -> Optional[str]:
+        """Returns the merged result file of a finished job, or None."""
+        job = self.status(job_id)
+        if job is None or job["status"] != "done":
+            return None
+        return self._path(job_id, "results." + job["result_format"])
+
+    def _ensure_runner(self):
+        # Threads don't survive fork: start one runner per process
+        with self._lock:
+            if self._runner is None or self._runner_pid != os.getpid() or not self._runner.is_alive():
+                self._runner = threading.Thread(target=self._run_jobs, name="sweep-jobs", daemon=True)
+                self._runner_pid = os.getpid()
+                self._runner.start()
+
+    def _run_jobs(self):
+        while True:
+            job, requests, tasks, store = self._queue.get()
+            try:
+                self._run_job(job, requests, tasks, store)
+            except Exception as e:
+                traceback.print_exc()
+                job.update(status="failed", error=str(e), finished_at=time.time())
+                self._save(job)
+
+    def _run_job(self, job: Dict[str, Any], requests: List[Dict[str, Any]],
+                 tasks: List[List[int]], store: NodeStore):
+        job.update(status="running", started_at=time.time())
+        self._save(job)
+        print(f"Sweep job {job['job_id']}: {len(requests)} rankings in {len(tasks)} tasks")
+
+        ext = job["result_format"]
+        part_paths = [self._path(job["job_id"], f"part-{i:05d}.{ext}") for i in range(len(tasks))]
+        methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+        # A fresh pool per job: workers get this job's snapshot (inherited
+        # without copying when forked)
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context,
+                                 initializer=_init_job_worker, initargs=(store.nodes_df,)) as pool:
+            futures = [
+                pool.submit(_run_task, i, ids, [requests[r] for r in ids], part_paths[i])
+                for i, ids in enumerate(tasks)
+            ]
+            for future in as_completed(futures):
+                done = future.result()
+                job["completed_tasks"] += 1
+                job["completed_rankings"] += done["rankings"]
+                job["failed_rankings"] += done["failed"]
+                self._save(job)
+
+        job["rows"] = merge_parts(part_paths, self._path(job["job_id"], "results." + ext))
+        for path in part_paths:
+            os.remove(path)
+        job.update(status="done", finished_at=time.time())
+        self._save(job)
+        print(f"Sweep job {job['job_id']} done: {job['rows']} rows "
+              f"in {job['finished_at'] - job['started_at']:.1f}s")
@@ -8,15 +8,70 @@ import pandas as pd
 import numpy as np
 from node_ranking_engine import (
     rank_nodes,
+    rank_nodes_batch,
+    rank_nodes_scenarios,
     load_nodes_from_csv,
     robust_min_max,
+    robust_min_max_matrix,
+    kendall_tau_b,
+    rank_stability,
+    rank_data_uncertainty,
+    emissions_breakpoints,
+    top_nodes_at,
+    build_component_index,
+    validate_custom_weights,
+    pareto_frontier,
+    skyline_mask,
+    k_dominant_mask,
+    explain_rankings,
+    get_ranking_explanation,
+    SCENARIO_SCORE_COLUMNS,
+    RankAccumulator,
+    sample_weights,
+    weighted_sum,
+    weights_to_matrix,
     invert_score,
     compute_final_weights,
     get_load_type_multipliers,
     get_size_multipliers,
     validate_and_clean_data,
-    haversine_distance_vectorized
+    haversine_distance_vectorized,
+    CancelToken,
+    DeadlineExceeded,
+    RankingCancelled,
+    ORDER_STAT_COLUMNS
 )
+from node_store import NodeStore
+from disk_cache import CompactResults, DiskResultCache
+
+
+def make_synthetic_nodes(n=2000, seed=0):
+    """Builds a synthetic node dataset with all columns used by the engine."""
+    rng = np.random.default_rng(seed)
+    states = rng.choice(["CA", "TX", "NY", "WI", "CO"], n)
+    return pd.DataFrame({
+        'node': [f"NODE_{i}" for i in range(n)],
+        'state': states,
+        'iso': rng.choice(["CAISO", "ERCOT", "NYISO", "MISO"], n),
+        'county_state_pairs': [f"County {i % 50}, {s}" for i, s in enumerate(states)],
+        'latitude': rng.uniform(25, 49, n),
+        'longitude': rng.uniform(-124, -70, n),
+        'avg_lmp': rng.normal(40, 15, n),
+        'avg_congestion': rng.normal(1, 3, n),
+        'avg_price_per_acre': rng.lognormal(9, 0.8, n),
+        'county_emissions_intensity_kg_per_mwh': rng.uniform(50, 900, n),
+        'queue_pending_mw': rng.exponential(500, n),
+        'queue_advanced_share': rng.uniform(0, 1, n),
+        'queue_renewable_storage_share': rng.uniform(0, 1, n),
+        'queue_pressure_index': rng.uniform(0, 1, n),
+        'price_variance_score': np.where(rng.uniform(size=n) < 0.1, 1.0, rng.uniform(0, 5, n)),
+        'policy_fit_electrolyzer': rng.uniform(0, 1, n),
+        'policy_fit_datacenter': rng.uniform(0, 1, n),
+        'is_h2_hub_state': rng.integers(0, 2, n),
+        'state_dc_incentive_level': rng.uniform(0, 1, n),
+        'state_clean_energy_friendly': rng.uniform(0, 1, n),
+        'has_hosting_capacity_map': rng.integers(0, 2, n),
+    })
 
 
 def test_normalization():
@@ -300,6 +355,1306 @@ def test_score_properties():
         traceback.print_exc()
 
 
+def test_single_flight():
+    """Test request coalescing of identical concurrent rankings."""
+    import threading
+    import time
+    from api_server import SingleFlight
+    
+    print("\n" + "=" * 80)
+    print("TEST 7: Request Coalescing")
+    print("=" * 80)
+    
+    def run_concurrently(flights, fn, num_callers, timeout=10.0):
+        """Starts a leader, then num_callers - 1 waiters once the leader is running."""
+        results = [None] * num_callers
+        
+        def call(i):
+            try:
+                results[i] = flights.do("key", fn, timeout=timeout)
+            except Exception as e:
+                results[i] = e
+        
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(num_callers)]
+        threads[0].start()
+        assert started.wait(5), "Leader should start computing"
+        for thread in threads[1:]:
+            thread.start()
+        return threads, results
+    
+    print("\n7.1 Concurrent identical calls share one computation...")
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    
+    def slow():
+        calls.append(1)
+        number = len(calls)
+        if number == 1:
+            started.set()
+            release.wait(5)
+        return number
+    
+    threads, results = run_concurrently(flights, slow, 8)
+    time.sleep(0.2)  # Let the waiters block on the leader
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1, "Only the leader should compute"
+    assert [r[0] for r in results] == [1] * 8
+    assert [r[1] for r in results].count(False) == 1, "Only the leader's result is unshared"
+    assert flights.stats["leaders"] == 1 and flights.stats["coalesced"] == 7
+    assert flights.in_flight() == 0
+    print("  ✓ Passed: 8 callers, 1 computation")
+    
+    print("\n7.2 Waiters time out and compute independently...")
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    threads, results = run_concurrently(flights, slow, 2, timeout=0.05)
+    threads[1].join()
+    assert results[1] == (2, False), "Timed-out waiter should compute its own result"
+    release.set()
+    threads[0].join()
+    assert results[0] == (1, False)
+    assert flights.stats["timeouts"] == 1
+    print("  ✓ Passed: Fallback after the wait timeout")
+    
+    print("\n7.3 Waiters recompute when the leader is cancelled...")
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    
+    def cancelled_leader():
+        calls.append(1)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+            raise DeadlineExceeded("leader deadline")
+        return "recomputed"
+    
+    threads, results = run_concurrently(flights, cancelled_leader, 4)
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert isinstance(results[0], DeadlineExceeded), "The leader sees its own cancellation"
+    assert results[1:] == [("recomputed", False)] * 3, "Waiters must not inherit the leader's deadline"
+    assert len(calls) == 4
+    print("  ✓ Passed: Leader cancellation isn't shared")
+
+
+def test_asgi_server():
+    """Test the asyncio server's pool dispatch, coalescing and backpressure."""
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from contextlib import asynccontextmanager
+    from starlette.applications import Starlette
+    from starlette.testclient import TestClient
+    import asgi_server
+    
+    print("\n" + "=" * 80)
+    print("TEST 8: ASGI Server")
+    print("=" * 80)
+    
+    gate = threading.Event()
+    calls = []
+    original_rank = asgi_server._worker_rank
+    
+    def gated_rank(params):
+        calls.append(params["load_size_mw"])
+        gate.wait(10)
+        return original_rank(params)
+    
+    @asynccontextmanager
+    async def lifespan(app):
+        # Thread pool in place of the process pool, so workers see the patches
+        app.state.nodes_loaded = len(asgi_server._WORKER_NODES_DF)
+        app.state.dispatcher = asgi_server.RankingDispatcher(ThreadPoolExecutor(4), queue_limit=2)
+        yield
+        app.state.dispatcher.pool.shutdown(wait=False)
+    
+    def body(size_mw):
+        return {"load_type": "data_center_always_on", "load_size_mw": size_mw,
+                "emissions_preference": 50, "resource_config": "solar", "top_n": 10}
+    
+    original_nodes = asgi_server._WORKER_NODES_DF
+    asgi_server._WORKER_NODES_DF = validate_and_clean_data(make_synthetic_nodes())
+    asgi_server._worker_rank = gated_rank
+    app = Starlette(routes=asgi_server.app.routes, lifespan=lifespan)
+    try:
+        with TestClient(app) as client:
+            dispatcher = app.state.dispatcher
+            
+            print("\n8.1 Malformed submission...")
+            response = client.post("/api/submit", json={"loadConfig": {"sizeMW": "large"}})
+            assert response.status_code == 400 and response.json()["success"] is False
+            print("  ✓ Passed: Rejected with 400 before reaching the pool")
+            
+            responses = {}
+            
+            def post(name, size_mw):
+                responses[name] = client.post("/api/rank", json=body(size_mw))
+            
+            def wait_for(condition):
+                deadline = time.time() + 5
+                while not condition() and time.time() < deadline:
+                    time.sleep(0.01)
+                assert condition(), "Timed out waiting for the dispatcher"
+            
+            print("\n8.2 Health check while a ranking is pending...")
+            threads = [threading.Thread(target=post, args=("first", 100))]
+            threads[0].start()
+            wait_for(lambda: len(calls) == 1)
+            health = client.get("/api/health")
+            assert health.status_code == 200 and health.json()["rankings_pending"] == 1
+            print("  ✓ Passed: Answered on the event loop")
+            
+            print("\n8.3 Identical requests are coalesced...")
+            threads.append(threading.Thread(target=post, args=("second", 100)))
+            threads[1].start()
+            time.sleep(0.2)
+            assert dispatcher.pending == 1, "The identical request must not take a pool task"
+            print("  ✓ Passed: Second request waits on the first one's task")
+            
+            print("\n8.4 Queue limit...")
+            threads.append(threading.Thread(target=post, args=("third", 200)))
+            threads[2].start()
+            wait_for(lambda: dispatcher.pending == 2)
+            response = client.post("/api/rank", json=body(300))
+            assert response.status_code == 503 and response.json()["success"] is False
+            print("  ✓ Passed: 503 once pending reaches queue_limit")
+            
+            gate.set()
+            for t in threads:
+                t.join()
+            assert [responses[name].status_code for name in ("first", "second", "third")] == [200] * 3
+            assert responses["first"].json() == responses["second"].json()
+            assert sorted(calls) == [100, 200], "Coalesced requests run one ranking"
+            assert dispatcher.pending == 0
+            print("  ✓ Passed: Coalesced responses are identical")
+    finally:
+        gate.set()
+        asgi_server._worker_rank = original_rank
+        asgi_server._WORKER_NODES_DF = original_nodes
+
+
+def test_batch_ranking():
+    """Test that batch ranking matches individual rank_nodes calls."""
+    print("\n" + "=" * 80)
+    print("TEST 9: Batch Ranking")
+    print("=" * 80)
+    
+    nodes_df = make_synthetic_nodes()
+    requests = [
+        {"load_type": "data_center_always_on", "load_size_mw": 250,
+         "location_filter": {"states": ["CA", "TX"]}, "emissions_preference": pref,
+         "resource_config": "solar", "top_n": 25}
+        for pref in (0, 50, 90)
+    ] + [
+        {"load_type": "h2_electrolyzer_firm", "load_size_mw": 40,
+         "location_filter": None, "emissions_preference": 60,
+         "resource_config": "battery", "top_n": 10},
+        {"load_type": "not_a_load_type", "load_size_mw": 40,
+         "location_filter": None, "emissions_preference": 60,
+         "resource_config": "battery", "top_n": 10},
+        {"load_type": "commercial_campus", "load_size_mw": 40,
+         "location_filter": {"states": ["ZZ"]}, "emissions_preference": 60,
+         "resource_config": "none", "top_n": 10},
+    ]
+    
+    print("\n9.1 Comparing batch results with individual rankings...")
+    results = list(rank_nodes_batch(nodes_df, requests))
+    assert [i for i, _ in results] == list(range(len(requests))), "Results should be in request order"
+    
+    for (i, result), req in zip(results, requests):
+        if req["load_type"] == "not_a_load_type":
+            assert isinstance(result, ValueError), "Invalid request should be reported inline"
+            continue
+        expected = rank_nodes(nodes_df=nodes_df, **req)
+        assert len(result) == len(expected), f"Request {i}: row count mismatch"
+        if len(expected) > 0:
+            assert result['node'].tolist() == expected['node'].tolist(), f"Request {i}: order mismatch"
+            assert np.array_equal(result['score_scenario'].values, expected['score_scenario'].values)
+            assert np.array_equal(result['rank_baseline'].values, expected['rank_baseline'].values)
+    print("  ✓ Passed: Batch results identical to individual rankings")
+    
+    print("\n9.2 Precomputed bounds for unfiltered requests...")
+    store = NodeStore(validate_and_clean_data(nodes_df), "v0")
+    column_bounds = store.column_bounds()
+    for (i, result), req in zip(rank_nodes_batch(store.nodes_df, requests, column_bounds=column_bounds),
+                                requests):
+        if isinstance(result, Exception) or len(result) == 0:
+            continue
+        expected = rank_nodes(nodes_df=store.nodes_df, column_bounds=column_bounds, **req)
+        assert result['node'].tolist() == expected['node'].tolist(), f"Request {i}: order mismatch"
+        assert np.array_equal(result['score_scenario'].values, expected['score_scenario'].values)
+    print("  ✓ Passed: Batch results match rank_nodes with the same bounds")
+    
+    print("\n9.3 Cancelling a batch between requests...")
+    token = CancelToken()
+    ranked = rank_nodes_batch(nodes_df, requests, cancel=token)
+    first_index, first = next(ranked)
+    assert first_index == 0 and len(first) > 0
+    token.cancel()
+    try:
+        next(ranked)
+        assert False, "Should have raised RankingCancelled"
+    except RankingCancelled as e:
+        assert not isinstance(e, DeadlineExceeded)
+    print("  ✓ Passed: Stops at the next request once cancelled")
+    
+    print("\n9.4 Batch endpoint past its deadline...")
+    import json
+    _, client = make_api_client()
+    response = client.post("/api/rank/batch", json={"requests": [{"load_type": "bogus"}] + requests[:3]},
+                           headers={"X-Request-Timeout": "0.000001"})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0]["index"] == 0 and lines[0]["success"] is False
+    assert lines[-1] == {"success": False, "error": "Request timed out", "num_completed": 1}
+    print("  ✓ Passed: Stream ends with a timeout line")
+
+
+def make_api_client(version="test-v1"):
+    """Points api_server at a synthetic snapshot and returns (api_server, test client)."""
+    import api_server
+    api_server._STORE = NodeStore(validate_and_clean_data(make_synthetic_nodes()), version)
+    api_server.NODES_DF = api_server._STORE.nodes_df
+    api_server.RANKING_CACHE.clear()
+    return api_server, api_server.app.test_client()
+
+
+def test_streaming_responses():
+    """Test that streamed /api/rank responses match the regular response."""
+    import json
+    
+    print("\n" + "=" * 80)
+    print("TEST 10: Streaming Responses")
+    print("=" * 80)
+    
+    api_server, client = make_api_client()
+    body = {"load_type": "data_center_flexible", "load_size_mw": 120, "emissions_preference": 45,
+            "resource_config": "battery", "location_filter": {"states": ["CA", "TX", "NY"]}, "top_n": 700}
+    
+    for label, extra in [("engine weights", {}), ("custom weights", {"weights": {"cost": 2, "queue": 1}})]:
+        request_body = dict(body, include_explanations=True, **extra)
+        expected = client.post("/api/rank", json=request_body).get_json()
+        assert expected["num_results"] == 700
+        
+        print(f"\n10.1 NDJSON stream ({label})...")
+        response = client.post("/api/rank", json=dict(request_body, stream="ndjson"))
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        header, records, trailer = lines[0], lines[1:-1], lines[-1]
+        assert header["success"] and header["weights"] == expected["weights"]
+        assert records == expected["results"], "Streamed records must match the regular response"
+        assert trailer == {"num_results": 700}
+        print(f"  ✓ Passed: Header, {len(records)} records and trailer")
+        
+        print(f"\n10.2 JSON array stream ({label})...")
+        response = client.post("/api/rank", json=request_body, query_string={"stream": "json"})
+        document = json.loads(response.get_data(as_text=True))
+        assert document["results"] == expected["results"]
+        assert document["num_results"] == 700 and document["parameters"] == expected["parameters"]
+        print("  ✓ Passed: Chunked array parses to the same document")
+    
+    print("\n10.3 Invalid stream format...")
+    assert client.post("/api/rank", json=dict(body, stream="csv")).status_code == 400
+    print("  ✓ Passed: Rejected with 400")
+
+
+def test_admin_endpoints():
+    """Test admin endpoint auth, snapshot version swaps and cache re-keying."""
+    import os
+    import tempfile
+    
+    print("\n" + "=" * 80)
+    print("TEST 11: Admin Endpoints")
+    print("=" * 80)
+    
+    api_server, client = make_api_client()
+    original_token = api_server.ADMIN_TOKEN
+    original_file = api_server.DATA_FILE
+    original_warmup = api_server.WARMUP_ENABLED
+    body = {"load_type": "data_center_always_on", "load_size_mw": 250, "emissions_preference": 70,
+            "resource_config": "solar_battery", "top_n": 20}
+    patch = {"updates": [{"node": None, "avg_lmp": 500.0}]}
+    
+    try:
+        print("\n11.1 Admin endpoints without ADMIN_TOKEN...")
+        api_server.ADMIN_TOKEN = None
+        assert client.post("/api/admin/reload", json={"wait": True}).status_code == 404
+        assert client.post("/api/admin/patch", json=patch).status_code == 404
+        assert api_server.get_store().version == "test-v1"
+        print("  ✓ Passed: Disabled with 404")
+        
+        print("\n11.2 Missing or wrong token...")
+        api_server.ADMIN_TOKEN = "s3cret"
+        for headers in ({}, {"X-Admin-Token": "wrong"}):
+            assert client.post("/api/admin/reload", json={}, headers=headers).status_code == 403
+            assert client.post("/api/admin/patch", json=patch, headers=headers).status_code == 403
+        print("  ✓ Passed: Rejected with 403")
+        
+        print("\n11.3 Patch swaps the version and re-keys cached rankings...")
+        before = client.post("/api/rank", json=body).get_json()
+        top_node = before["results"][0]["node"]
+        patch["updates"][0]["node"] = top_node
+        response = client.post("/api/admin/patch", json=patch, headers={"X-Admin-Token": "s3cret"})
+        patched_version = response.get_json()["dataset_version"]
+        assert response.status_code == 200 and patched_version != before["dataset_version"]
+        after = client.post("/api/rank", json=body).get_json()
+        assert after["dataset_version"] == patched_version
+        assert after["ranking_id"] != before["ranking_id"], "Rankings must be keyed by dataset version"
+        assert top_node not in [r["node"] for r in after["results"]], "Patched node should drop out"
+        page = client.get("/api/rank/page", query_string={"cursor": before["next_cursor"]}).get_json()
+        assert page["dataset_version"] == before["dataset_version"], "Old cursors keep their snapshot"
+        print("  ✓ Passed: New version, new ranking_id, old pages unchanged")
+        
+        print("\n11.4 Reload replaces the patched snapshot...")
+        api_server.WARMUP_ENABLED = False
+        with tempfile.TemporaryDirectory() as tmpdir:
+            api_server.DATA_FILE = os.path.join(tmpdir, "nodes.csv")
+            make_synthetic_nodes().to_csv(api_server.DATA_FILE, index=False)
+            response = client.post("/api/admin/reload", json={"wait": True},
+                                   headers={"X-Admin-Token": "s3cret"})
+            reloaded = response.get_json()
+            assert response.status_code == 200 and reloaded["status"] == "completed"
+            assert reloaded["dataset_version"] == NodeStore.from_csv(api_server.DATA_FILE).version
+            assert reloaded["dataset_version"] != patched_version
+        final = client.post("/api/rank", json=body).get_json()
+        assert final["dataset_version"] == reloaded["dataset_version"]
+        assert final["ranking_id"] not in (before["ranking_id"], after["ranking_id"])
+        print("  ✓ Passed: Reloaded version served with its own ranking_id")
+    finally:
+        api_server.ADMIN_TOKEN = original_token
+        api_server.DATA_FILE = original_file
+        api_server.WARMUP_ENABLED = original_warmup
+
+
+def test_node_store_patch():
+    """Test incremental patching and precomputed normalization bounds."""
+    print("\n" + "=" * 80)
+    print("TEST 12: Node Store Patching")
+    print("=" * 80)
+    
+    rng = np.random.default_rng(1)
+    store = NodeStore(validate_and_clean_data(make_synthetic_nodes()), "v0")
+    params = {"load_type": "data_center_always_on", "load_size_mw": 250,
+              "location_filter": None, "emissions_preference": 60,
+              "resource_config": "none", "top_n": None}
+    
+    print("\n12.1 Patching nodes and checking quantile bounds...")
+    for round_num in range(5):
+        nodes = rng.choice(store.nodes_df['node'].values, 100, replace=False)
+        updates = pd.DataFrame({
+            'node': nodes,
+            'avg_lmp': rng.normal(40, 30, 100).round(round_num % 2),
+            'avg_congestion': rng.normal(1, 3, 100),
+            'queue_pending_mw': rng.integers(0, 3000, 100),
+            'queue_advanced_share': rng.uniform(-0.2, 1.2, 100),
+        })
+        patched = store.patch(updates)
+        assert patched.version != store.version, "Patch should change the dataset version"
+        assert not store.nodes_df['avg_lmp'].equals(patched.nodes_df['avg_lmp']), \
+            "Original snapshot should be unchanged"
+        store = patched
+    
+    assert store.nodes_df['queue_advanced_share'].between(0, 1).all(), "Bounded columns should be clipped"
+    for col in ORDER_STAT_COLUMNS:
+        expected = (store.nodes_df[col].quantile(0.05), store.nodes_df[col].quantile(0.95))
+        assert store.quantile_bounds(col) == expected, f"{col}: bounds differ from pandas quantiles"
+    print("  ✓ Passed: Incremental bounds identical to full quantiles")
+    
+    print("\n12.2 Ranking with precomputed bounds...")
+    expected = rank_nodes(nodes_df=store.nodes_df, **params)
+    result = rank_nodes(nodes_df=store.nodes_df, column_bounds=store.column_bounds(), **params)
+    pd.testing.assert_frame_equal(result, expected)
+    print("  ✓ Passed: Rankings identical")
+    
+    print("\n12.3 Rejecting bad patches...")
+    for bad, error in [([{'node': 'NOT_A_NODE', 'avg_lmp': 1.0}], KeyError),
+                       ([{'node': 'NODE_1', 'avg_lmp': 'abc'}], ValueError),
+                       ([{'node': 'NODE_1', 'state': 'CA'}], ValueError)]:
+        try:
+            store.patch(bad)
+            assert False, f"Patch {bad} should fail"
+        except error:
+            pass
+    print("  ✓ Passed: Bad patches rejected")
+
+
+def test_server_metrics():
+    """Test thread-sharded metrics, Prometheus rendering and quantiles."""
+    import threading
+    from server_metrics import MetricsRegistry, _bucket_quantile
+    
+    print("\n" + "=" * 80)
+    print("TEST 13: Server Metrics")
+    print("=" * 80)
+    
+    print("\n13.1 Shards of exited threads are merged...")
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests")
+    registry.histogram("latency_seconds", (0.1, 1.0), "Latency")
+    
+    def record(n):
+        for _ in range(n):
+            registry.inc("requests_total", {"endpoint": "/api/rank"})
+        registry.observe("latency_seconds", 0.05)
+    
+    for n in (3, 4):
+        thread = threading.Thread(target=record, args=(n,))
+        thread.start()
+        thread.join()
+    record(5)  # Registering this thread retires the exited threads' shards
+    assert len(registry._shards) == 1 and registry._retired, "Dead shards should be folded"
+    assert registry.total("requests_total") == 12
+    snapshot = registry.snapshot()
+    assert snapshot["counters"]["requests_total"] == [{"labels": {"endpoint": "/api/rank"}, "value": 12}]
+    latency = snapshot["histograms"]["latency_seconds"][0]
+    assert latency["count"] == 3 and abs(latency["sum"] - 0.15) < 1e-12
+    print("  ✓ Passed: Totals include exited threads")
+    
+    print("\n13.2 Prometheus rendering...")
+    registry.observe("latency_seconds", 5.0)
+    text = registry.render_prometheus({"nodes_loaded": (2000, "Nodes")})
+    for line in ['# TYPE noderank_requests_total counter',
+                 'noderank_requests_total{endpoint="/api/rank"} 12',
+                 '# TYPE noderank_latency_seconds histogram',
+                 'noderank_latency_seconds_bucket{le="0.1"} 3',
+                 'noderank_latency_seconds_bucket{le="1"} 3',
+                 'noderank_latency_seconds_bucket{le="+Inf"} 4',
+                 'noderank_latency_seconds_count 4',
+                 '# TYPE noderank_nodes_loaded gauge',
+                 'noderank_nodes_loaded 2000']:
+        assert line in text.splitlines(), f"Missing line: {line}"
+    print("  ✓ Passed: Cumulative buckets, counts and gauges rendered")
+    
+    print("\n13.3 Bucket quantiles...")
+    buckets = (1.0, 2.0, 4.0)
+    counts = [2, 2, 0, 0]
+    assert _bucket_quantile(buckets, counts, 0.5) == 1.0
+    assert abs(_bucket_quantile(buckets, counts, 0.95) - 1.9) < 1e-12
+    assert _bucket_quantile(buckets, [0, 0, 0, 3], 0.5) == 4.0, "+Inf bucket reports the largest bound"
+    assert _bucket_quantile(buckets, [0, 0, 0, 0], 0.5) is None
+    print("  ✓ Passed: Linear interpolation within buckets")
+    
+    print("\n13.4 Ranking cache gauges...")
+    api_server, client = make_api_client()
+    body = {"load_type": "commercial_campus", "load_size_mw": 80, "emissions_preference": 60,
+            "resource_config": "battery", "location_filter": {"states": ["WI", "CO"]}, "top_n": 5}
+    total = client.post("/api/rank", json=body).get_json()["total_results"]
+    client.post("/api/rank", json=body)
+    gauges = client.get("/api/metrics").get_json()["gauges"]
+    assert gauges["ranking_cache_entries"] == len(api_server.RANKING_CACHE) == 1
+    assert gauges["ranking_cache_rows"] == api_server.RANKING_CACHE.rows == total
+    assert gauges["ranking_cache_hits"] >= 1
+    print(f"  ✓ Passed: 1 entry, {total} rows")
+
+
+def test_request_profiling():
+    """Test that ?profile=1 attaches a profile only when profiling is enabled."""
+    print("\n" + "=" * 80)
+    print("TEST 14: Request Profiling")
+    print("=" * 80)
+    
+    api_server, client = make_api_client()
+    original_enabled = api_server.PROFILING_ENABLED
+    body = {"load_type": "data_center_always_on", "load_size_mw": 100, "emissions_preference": 50,
+            "resource_config": "solar", "top_n": 10}
+    
+    try:
+        print("\n14.1 Profiling disabled...")
+        api_server.PROFILING_ENABLED = False
+        response = client.post("/api/rank", json=body, query_string={"profile": "1"})
+        assert response.status_code == 403 and "profile" not in response.get_json()
+        assert "profile" not in client.post("/api/rank", json=body).get_json()
+        print("  ✓ Passed: Rejected with 403, no profile attached")
+        
+        print("\n14.2 Profiling enabled...")
+        api_server.PROFILING_ENABLED = True
+        assert "profile" not in client.post("/api/rank", json=body).get_json(), \
+            "Only requests asking for a profile get one"
+        response = client.post("/api/rank", json=body, query_string={"profile": "1"})
+        profile = response.get_json()["profile"]
+        assert response.status_code == 200 and profile["total_seconds"] > 0
+        assert any("rank_nodes" in f["function"] for f in profile["project_functions"]), \
+            "Profiled requests bypass the cache, so the ranking itself is profiled"
+        print(f"  ✓ Passed: {len(profile['top_functions'])} functions, {profile['total_seconds']:.3f}s")
+        
+        print("\n14.3 Streamed requests...")
+        for extra, query in [({"stream": "ndjson"}, {}), ({}, {"stream": "json"})]:
+            response = client.post("/api/rank", json=dict(body, **extra),
+                                   query_string=dict(query, profile="1"))
+            assert response.status_code == 400 and "profile" not in response.get_json()
+        assert client.post("/api/rank", json=body, query_string={"profile": "1"}).status_code == 200, \
+            "The profiling lock must be free again"
+        print("  ✓ Passed: Rejected with 400")
+    finally:
+        api_server.PROFILING_ENABLED = original_enabled
+
+
+def test_slow_query_log():
+    """Test that slow requests are logged with their parameters and stage stats."""
+    import json
+    import os
+    import tempfile
+    import load_test
+    
+    print("\n" + "=" * 80)
+    print("TEST 15: Slow Query Log")
+    print("=" * 80)
+    
+    api_server, client = make_api_client()
+    original_file = api_server.SLOW_QUERY_LOG_FILE
+    original_threshold = api_server.SLOW_QUERY_THRESHOLD_S
+    body = {"load_type": "h2_electrolyzer_firm", "load_size_mw": 300, "emissions_preference": 20,
+            "resource_config": "firm_gen", "location_filter": {"states": ["TX", "CA"]}, "top_n": 15}
+    submit = {"loadConfig": {"type": "commercial", "sizeMW": 100, "carbonEmissions": 50,
+                             "configurationType": "battery"},
+              "location": {"mode": "states", "selectedStates": ["Wisconsin", "Texas"]}}
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        api_server.SLOW_QUERY_LOG_FILE = os.path.join(tmpdir, "slow.jsonl")
+        api_server.SLOW_QUERY_THRESHOLD_S = 0
+        try:
+            responses = [client.post("/api/rank", json=body), client.post("/api/rank", json=body),
+                         client.post("/api/submit", json=submit), client.get("/api/health")]
+            with open(api_server.SLOW_QUERY_LOG_FILE) as f:
+                records = [json.loads(line) for line in f]
+        finally:
+            api_server.SLOW_QUERY_LOG_FILE = original_file
+            api_server.SLOW_QUERY_THRESHOLD_S = original_threshold
+        
+        print("\n15.1 Records for ranking requests...")
+        assert [r["endpoint"] for r in records] == ["/api/rank", "/api/rank", "/api/submit"], \
+            "Only ranking requests are logged"
+        first, second = records[0], records[1]
+        assert first["payload"] == body
+        assert first["params"] == {k: v for k, v in api_server.parse_rank_params(body).items() if k != "top_n"}
+        assert first["params"]["location_filter"] == {"states": ["TX", "CA"]}
+        assert first["dataset_version"] == "test-v1" and first["status"] == 200
+        assert first["response_bytes"] == len(responses[0].get_data())
+        assert first["duration_s"] >= 0 and first["total_results"] == responses[0].get_json()["total_results"]
+        print("  ✓ Passed: Payload, canonical params, version, status and size")
+        
+        print("\n15.2 Stage timings and row counts...")
+        counts = first["row_counts"]
+        assert counts["validate"] == 2000 and counts["rank"] == first["total_results"]
+        assert counts["validate"] >= counts["clean"] >= counts["spatial_filter"] >= counts["rank"] > 0
+        assert set(counts) <= set(first["stage_timings"])
+        assert all(seconds >= 0 for seconds in first["stage_timings"].values())
+        assert not first["cached"] and second["cached"], "The repeat is served from the cache"
+        assert second["row_counts"] == counts, "Cached responses report the original stats"
+        print(f"  ✓ Passed: Stages {', '.join(first['stage_timings'])}")
+        
+        print("\n15.3 Records replay as load-test cases...")
+        cases, skipped = load_test.load_cases(os.path.join(tmpdir, "slow.jsonl"))
+        assert skipped == 0
+        assert cases == [{"endpoint": "/api/rank", "payload": body, "query": {}}] * 2 + \
+            [{"endpoint": "/api/submit", "payload": submit, "query": {}}]
+        assert load_test.parse_case(json.dumps(records[2])) == cases[2]
+        print("  ✓ Passed: Every record parses back to its original request")
+
+
+def test_startup_warmup():
+    """Test the warm-up request list and the readiness endpoint."""
+    import json
+    import os
+    import tempfile
+    import threading
+    
+    print("\n" + "=" * 80)
+    print("TEST 16: Startup Warm-up")
+    print("=" * 80)
+    
+    api_server, client = make_api_client()
+    
+    print("\n16.1 Grid and top state sets from a request log...")
+    
+    def rank_record(states, size_mw=100):
+        return {"endpoint": "/api/rank", "payload": {
+            "load_type": "industrial_flexible", "load_size_mw": size_mw, "emissions_preference": 50,
+            "resource_config": "none", "location_filter": {"states": states} if states else None}}
+    
+    submit_record = {"endpoint": "/api/submit", "payload": {
+        "loadConfig": {"type": "commercial", "sizeMW": 100},
+        "location": {"mode": "states", "selectedStates": ["Colorado"]}}}
+    log_records = [rank_record(["TX", "CA"]), rank_record(["CA", "TX"], 500), rank_record(["TX", "CA"]),
+                   rank_record(["NY"], 50), rank_record(["NY"], 50), rank_record(None),
+                   submit_record, {"endpoint": "/api/rank", "payload": {"load_type": "data_center_always_on"}}]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log_file = os.path.join(tmpdir, "requests.jsonl")
+        with open(log_file, "w") as f:
+            for record in log_records:
+                f.write(json.dumps(record) + "\n")
+            f.write("not json\n")
+        grid_only = api_server.warmup_requests(None, 20)
+        warmup = api_server.warmup_requests(log_file, 2)
+        all_sets = api_server.warmup_requests(log_file, 20)
+    
+    assert len(grid_only) == 30 and all(kind == "rank" for kind, _ in grid_only), "6 load types x 5 configs"
+    assert len({(p["load_type"], p["resource_config"]) for _, p in grid_only}) == 30
+    assert warmup[:30] == grid_only
+    assert warmup[30:] == [("rank", log_records[0]["payload"]), ("rank", log_records[3]["payload"])], \
+        "Most frequent state sets first, each with its most frequent request"
+    assert len(all_sets) == 33 and all_sets[32] == ("submit", submit_record["payload"])
+    print("  ✓ Passed: 30 grid rankings plus the top state sets")
+    
+    original_enabled = api_server.WARMUP_ENABLED
+    original_state = dict(api_server._WARMUP)
+    original_log = api_server.WARMUP_LOG_FILE
+    original_rank_entry = api_server.get_rank_entry
+    gate = threading.Event()
+    
+    def gated_rank_entry(store, params):
+        gate.wait(10)
+        return original_rank_entry(store, params)
+    
+    api_server.WARMUP_ENABLED = True
+    api_server.WARMUP_LOG_FILE = None
+    api_server._WARMUP.update(status="pending", version=None, ready=False)
+    api_server.get_rank_entry = gated_rank_entry
+    try:
+        print("\n16.2 Readiness before warm-up finishes...")
+        assert client.get("/api/ready").status_code == 503
+        store = api_server.get_store()
+        api_server.start_warmup(store)
+        api_server.start_warmup(store)
+        warmers = [t for t in threading.enumerate() if t.name == "ranking-warmup"]
+        assert len(warmers) == 1, "One warm-up per dataset version"
+        response = client.get("/api/ready")
+        assert response.status_code == 503 and response.get_json()["ready"] is False
+        assert response.get_json()["warmup"]["version"] == store.version
+        print("  ✓ Passed: 503 while warming up")
+        
+        print("\n16.3 Readiness after warm-up...")
+        gate.set()
+        warmers[0].join(60)
+        response = client.get("/api/ready")
+        status = response.get_json()["warmup"]
+        assert response.status_code == 200 and response.get_json()["ready"] is True
+        assert status["status"] == "done" and status["completed"] == 30 and status["failed"] == 0
+        assert len(api_server.RANKING_CACHE) == 30, "Every grid ranking is cached"
+        print(f"  ✓ Passed: 200 after {status['completed']} rankings in {status['seconds']}s")
+    finally:
+        gate.set()
+        api_server.get_rank_entry = original_rank_entry
+        api_server.WARMUP_ENABLED = original_enabled
+        api_server.WARMUP_LOG_FILE = original_log
+        api_server._WARMUP.update(original_state)
+
+
+def test_disk_result_cache():
+    """Test that rankings round-trip through the disk cache unchanged."""
+    import os
+    import tempfile
+    
+    print("\n" + "=" * 80)
+    print("TEST 17: Disk Result Cache")
+    print("=" * 80)
+    
+    store = NodeStore(validate_and_clean_data(make_synthetic_nodes()), "v0")
+    results = rank_nodes(nodes_df=store.nodes_df, load_type="industrial_flexible", load_size_mw=80,
+                         location_filter={"states": ["TX", "CO"]}, emissions_preference=20,
+                         resource_config="solar_battery", top_n=None)
+    results['search_point_id'] = "point-1"
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        print("\n17.1 Storing and loading a full ranking...")
+        cache = DiskResultCache(os.path.join(tmp, "results.sqlite3"), max_bytes=10 ** 8)
+        compact = CompactResults.from_frame(results, store)
+        pd.testing.assert_frame_equal(compact.rows(), results)
+        pd.testing.assert_frame_equal(compact.rows(10, 25), results.iloc[10:25])
+        assert cache.put("key-1", compact, {"timings": {"rank": 0.1}})
+        loaded, stats = cache.get("key-1", store)
+        pd.testing.assert_frame_equal(loaded.rows(), results)
+        assert stats == {"timings": {"rank": 0.1}}
+        print("  ✓ Passed: Results identical after round trip")
+        
+        print("\n17.2 Version mismatch and eviction...")
+        assert cache.get("key-1", NodeStore(store.nodes_df, "v1")) is None, \
+            "Entries must not be served for another dataset version"
+        cache.max_bytes = cache.size_bytes() + 1
+        cache.put("key-2", compact, {})
+        assert cache.get("key-1", store) is None, "Least recently used entry should be evicted"
+        assert cache.get("key-2", store) is not None
+        print("  ✓ Passed: Version-scoped lookups and LRU eviction")
+        
+        print("\n17.3 Object columns keep their value types...")
+        cache.max_bytes = 10 ** 8
+        points = results.copy()
+        points['search_point_id'] = np.resize(np.array(["p1", 7, None, 2.5], dtype=object), len(points))
+        assert cache.put("key-3", CompactResults.from_frame(points, store), {})
+        loaded, _ = cache.get("key-3", store)
+        pd.testing.assert_frame_equal(loaded.rows(), points)
+        assert loaded.rows()['search_point_id'].iloc[:4].tolist() == ["p1", 7, None, 2.5]
+        points['search_point_id'] = [object()] * len(points)
+        assert not cache.put("key-4", CompactResults.from_frame(points, store), {}), \
+            "Values JSON can't represent should not be cached"
+        print("  ✓ Passed: Null and numeric point IDs round-trip unchanged")
+
+
+def test_sweep_jobs():
+    """Test sweep expansion, task planning and a background job run."""
+    import json
+    import tempfile
+    import time
+    from sweep_jobs import SweepJobManager, expand_sweep, plan_tasks
+    
+    print("\n" + "=" * 80)
+    print("TEST 18: Sweep Jobs")
+    print("=" * 80)
+    
+    print("\n18.1 Sweep expansion...")
+    requests = expand_sweep({"load_types": ["data_center_always_on", "industrial_flexible"],
+                             "resource_configs": ["none", "solar", "battery"],
+                             "load_sizes_mw": [50, 500], "states": "all", "top_n": 25},
+                            ["CA", "TX", "NY"])
+    assert len(requests) == 2 * 3 * 2 * 3
+    assert {json.dumps(r["location_filter"]) for r in requests} == \
+        {json.dumps({"states": [s]}) for s in ["CA", "TX", "NY"]}
+    assert all(r["emissions_preference"] == 50 and r["top_n"] == 25 for r in requests)
+    defaults = expand_sweep({}, ["CA"])
+    assert len(defaults) == 6 * 5 and all(r["location_filter"] is None for r in defaults)
+    overridden = expand_sweep({"states": ["CA"], "location_filters": [None, {"states": ["TX", "NY"]}],
+                               "load_types": ["commercial_campus"]}, ["CA"])
+    assert [r["location_filter"] for r in overridden[::5]] == [None, {"states": ["TX", "NY"]}], \
+        "location_filters overrides states"
+    for spec in ({"load_types": []}, {"states": "CA"}, {"emissions_preferences": 50},
+                 {"location_filters": None}):
+        try:
+            expand_sweep(spec, ["CA"])
+            assert False, f"Should reject {spec}"
+        except ValueError:
+            pass
+    print(f"  ✓ Passed: {len(requests)} rankings, defaults, override and validation")
+    
+    print("\n18.2 Task planning...")
+    tasks = plan_tasks(requests, max_rankings=4)
+    assert sorted(i for task in tasks for i in task) == list(range(len(requests)))
+    assert all(len(task) <= 4 for task in tasks)
+    group = lambda i: (json.dumps(requests[i]["location_filter"]), requests[i]["load_type"],
+                       requests[i]["resource_config"])
+    tasks_of_group = {}
+    for k, task in enumerate(tasks):
+        for i in task:
+            tasks_of_group.setdefault(group(i), set()).add(k)
+    assert len(tasks_of_group) == 18 and all(len(ks) == 1 for ks in tasks_of_group.values()), \
+        "Both sizes of a parameter group land in the same task"
+    print(f"  ✓ Passed: {len(tasks)} tasks, groups kept together")
+    
+    print("\n18.3 Job run...")
+    store = NodeStore(validate_and_clean_data(make_synthetic_nodes()), "sweep-v1")
+    sweep = requests[:12]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = SweepJobManager(tmpdir, workers=2)
+        job = manager.submit(sweep, store)
+        assert job["status"] == "queued" and job["total_rankings"] == 12
+        deadline = time.time() + 120
+        while manager.status(job["job_id"])["status"] in ("queued", "running") and time.time() < deadline:
+            time.sleep(0.1)
+        job = manager.status(job["job_id"])
+        assert job["status"] == "done", job
+        assert job["completed_rankings"] == 12 and job["failed_rankings"] == 0
+        assert manager.list_jobs() == [job]
+        path = manager.result_path(job["job_id"])
+        merged = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+        
+        assert job["rows"] == len(merged) and sorted(merged["ranking"].unique()) == list(range(12))
+        for i, expected in rank_nodes_batch(store.nodes_df, sweep):
+            got = merged[merged["ranking"] == i]
+            assert got["node"].tolist() == expected["node"].tolist()
+            assert np.allclose(got["score_scenario"], expected["score_scenario"])
+            assert (got["rank_scenario"].values == expected["rank_scenario"].values).all()
+        print(f"  ✓ Passed: {job['rows']} merged rows match rank_nodes_batch")
+        
+        print("\n18.4 Job ID validation...")
+        for job_id in ("../" + job["job_id"], job["job_id"] + "/..", "", "job.json"):
+            assert manager.status(job_id) is None
+        print("  ✓ Passed: Non-alphanumeric IDs are unknown jobs")
+    
+    print("\n18.5 Sweep size limit...")
+    api_server, client = make_api_client()
+    original_limit = api_server.MAX_JOB_RANKINGS
+    api_server.MAX_JOB_RANKINGS = 100
+    try:
+        response = client.post("/api/jobs", json={"states": "all"})
+        assert response.status_code == 400 and "150 rankings" in response.get_json()["error"]
+        assert client.get("/api/jobs/not-a-job").status_code == 404
+    finally:
+        api_server.MAX_JOB_RANKINGS = original_limit
+    print("  ✓ Passed: 6 x 5 x 5 states rejected with 400")
+
+
+def test_cancellation():
+    """Test that rank_nodes stops on cancelled or expired tokens."""
+    print("\n" + "=" * 80)
+    print("TEST 19: Deadlines and Cancellation")
+    print("=" * 80)
+    
+    nodes_df = make_synthetic_nodes()
+    params = dict(nodes_df=nodes_df, load_type="data_center_flexible", load_size_mw=200,
+                  location_filter=None, emissions_preference=60, resource_config="battery")
+    
+    print("\n19.1 Expired deadline and explicit cancel...")
+    try:
+        rank_nodes(cancel=CancelToken(timeout_s=0), **params)
+        assert False, "Expired deadline should stop the ranking"
+    except DeadlineExceeded:
+        pass
+    token = CancelToken()
+    token.cancel("client disconnected")
+    try:
+        rank_nodes(cancel=token, **params)
+        assert False, "Cancelled token should stop the ranking"
+    except RankingCancelled as e:
+        assert not isinstance(e, DeadlineExceeded)
+    print("  ✓ Passed: Raises DeadlineExceeded / RankingCancelled")
+    
+    print("\n19.2 Unexpired deadline...")
+    token = CancelToken(timeout_s=60)
+    pd.testing.assert_frame_equal(rank_nodes(cancel=token, **params), rank_nodes(**params))
+    assert 0 < token.remaining() <= 60
+    print("  ✓ Passed: Results unchanged when the deadline isn't reached")
+
+
+def test_admission_control():
+    """Test that only ranking computations take admission slots."""
+    import threading
+    import time
+    
+    print("\n" + "=" * 80)
+    print("TEST 20: Admission Control")
+    print("=" * 80)
+    
+    api_server, _ = make_api_client()
+    original_rank = api_server.rank_nodes_from_frontend_json
+    original_queues = api_server.ADMISSION_QUEUES
+    
+    def slow_rank(*args, **kwargs):
+        time.sleep(0.3)
+        return original_rank(*args, **kwargs)
+    
+    def submit_all(payloads):
+        responses = [None] * len(payloads)
+        
+        def worker(i):
+            client = api_server.app.test_client()
+            responses[i] = client.post("/api/submit", json=payloads[i])
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(payloads))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return responses
+    
+    def payload(size_mw):
+        return {"loadConfig": {"type": "commercial", "sizeMW": size_mw, "carbonEmissions": 50,
+                               "configurationType": "battery"},
+                "location": {"mode": "states", "selectedStates": ["California", "Texas"]}}
+    
+    api_server.rank_nodes_from_frontend_json = slow_rank
+    api_server.ADMISSION_QUEUES = {"interactive": api_server.AdmissionQueue("interactive", 1, 1),
+                                   "batch": original_queues["batch"]}
+    try:
+        print("\n20.1 Identical concurrent submits (cold cache)...")
+        responses = submit_all([payload(100)] * 20)
+        assert [r.status_code for r in responses] == [200] * 20
+        assert len({r.get_json()["rankingId"] for r in responses}) == 1
+        print("  ✓ Passed: 20/20 succeeded on one admission slot")
+        
+        print("\n20.2 Identical concurrent submits (cached)...")
+        responses = submit_all([payload(100)] * 20)
+        assert [r.status_code for r in responses] == [200] * 20
+        assert api_server.ADMISSION_QUEUES["interactive"].stats["admitted"] == 1
+        print("  ✓ Passed: Cache hits never took a slot")
+        
+        print("\n20.3 Distinct concurrent submits beyond the queue...")
+        responses = submit_all([payload(200 + i) for i in range(6)])
+        statuses = sorted(r.status_code for r in responses)
+        assert statuses.count(200) >= 2 and 429 in statuses, statuses
+        for r in responses:
+            if r.status_code == 429:
+                assert int(r.headers["Retry-After"]) >= 1
+                assert r.get_json()["success"] is False
+        queue = api_server.ADMISSION_QUEUES["interactive"]
+        assert queue.active == 0 and queue.queued() == 0
+        print(f"  ✓ Passed: {statuses.count(429)} rejected with 429 + Retry-After, slots released")
+    finally:
+        api_server.rank_nodes_from_frontend_json = original_rank
+        api_server.ADMISSION_QUEUES = original_queues
+
+
+def test_scenario_comparison():
+    """Test that one-pass scenario ranking matches per-config rank_nodes calls."""
+    print("\n" + "=" * 80)
+    print("TEST 21: Resource Config Comparison")
+    print("=" * 80)
+    
+    print("\n21.1 Matrix normalization matches robust_min_max per column...")
+    rng = np.random.default_rng(3)
+    values = rng.normal(size=(300, 3))
+    values[::5, 0] = np.nan
+    values[:, 1] = 2.0
+    normalized = robust_min_max_matrix(values)
+    for j in range(values.shape[1]):
+        assert np.array_equal(normalized[:, j], robust_min_max(pd.Series(values[:, j])).to_numpy())
+    print("  ✓ Passed: Identical to Series normalization (incl. NaN and constant columns)")
+    
+    print("\n21.2 Comparing scenarios with individual rankings...")
+    nodes_df = make_synthetic_nodes()
+    params = dict(nodes_df=nodes_df, load_type="data_center_flexible", load_size_mw=150,
+                  location_filter={"states": ["TX", "CA", "NY"]}, emissions_preference=40, top_n=15)
+    results, comparison = rank_nodes_scenarios(**params)
+    for config, result in results.items():
+        expected = rank_nodes(**params, resource_config=config)
+        pd.testing.assert_frame_equal(result.drop(columns='rank_delta'), expected)
+        ranks = comparison.set_index('node').loc[expected['node'], f'rank_{config}']
+        assert ranks.tolist() == expected['rank_scenario'].tolist()
+    assert (results["none"]['rank_delta'] == 0).all(), "No resources means no rank change"
+    print("  ✓ Passed: Per-config results and rank table match rank_nodes")
+
+
+def test_rank_movement_analytics():
+    """Test rank correlations and movement analytics."""
+    print("\n" + "=" * 80)
+    print("TEST 22: Rank Movement Analytics")
+    print("=" * 80)
+    
+    print("\n22.1 Kendall tau-b against a pairwise count (with ties)...")
+    rng = np.random.default_rng(5)
+    x = rng.integers(0, 8, 80)
+    y = x + rng.integers(-3, 4, 80)
+    sx = np.sign(x[:, None] - x[None, :])[np.triu_indices(80, 1)]
+    sy = np.sign(y[:, None] - y[None, :])[np.triu_indices(80, 1)]
+    expected = (sx * sy).sum() / np.sqrt((sx != 0).sum() * (sy != 0).sum())
+    assert abs(kendall_tau_b(x, y) - expected) < 1e-12, "tau-b mismatch"
+    assert abs(kendall_tau_b(x, -x) + 1.0) < 1e-12
+    print(f"  ✓ Passed: tau-b = {expected:.4f}")
+    
+    print("\n22.2 Analytics from rank_nodes...")
+    nodes_df = make_synthetic_nodes()
+    analytics = {}
+    top = rank_nodes(nodes_df=nodes_df, load_type="data_center_flexible", load_size_mw=150,
+                     location_filter=None, emissions_preference=40, resource_config="firm_gen",
+                     top_n=20, analytics=analytics)
+    full = rank_nodes(nodes_df=nodes_df, load_type="data_center_flexible", load_size_mw=150,
+                      location_filter=None, emissions_preference=40, resource_config="firm_gen",
+                      top_n=None)
+    assert analytics["num_nodes"] == len(full)
+    deltas = full['rank_baseline'] - full['rank_scenario']
+    assert analytics["movers_up"][0]["rank_delta"] == deltas.max()
+    assert analytics["movers_down"][0]["rank_delta"] == deltas.min()
+    baseline_top = set(full.sort_values('rank_baseline', kind='stable')['node'].head(20))
+    assert analytics["top_n_overlap"]["shared"] == len(baseline_top & set(top['node']))
+    assert -1.0 <= analytics["kendall_tau_b"] <= 1.0 and -1.0 <= analytics["spearman"] <= 1.0
+    print(f"  ✓ Passed: {analytics['nodes_moved']} nodes moved, "
+          f"top-20 overlap {analytics['top_n_overlap']['shared']}")
+
+
+def test_rank_stability():
+    """Test Monte Carlo weight-uncertainty rank stability."""
+    print("\n" + "=" * 80)
+    print("TEST 23: Weight-Uncertainty Rank Stability")
+    print("=" * 80)
+    
+    nodes_df = make_synthetic_nodes()
+    params = dict(nodes_df=nodes_df, load_type="industrial_continuous", load_size_mw=300,
+                  location_filter=None, emissions_preference=70, resource_config="solar")
+    weights = compute_final_weights("industrial_continuous", 300, 70)
+    
+    print("\n23.1 Weight samples...")
+    samples = sample_weights(weights, 5000, 200.0, np.random.default_rng(0))
+    assert np.allclose(samples.sum(axis=0), 1.0) and (samples > 0).all()
+    assert np.allclose(samples.mean(axis=1), weights_to_matrix([weights])[:, 0], atol=0.005)
+    print("  ✓ Passed: Dirichlet samples sum to 1 and centre on the computed weights")
+    
+    print("\n23.2 Ranks under one sampled weight vector...")
+    single = rank_stability(**params, top_n=5, num_samples=1, seed=7)
+    sample = sample_weights(weights, 1, 100.0, np.random.default_rng(7))[:, 0]
+    full = rank_nodes(**params, top_n=None)
+    scores = full[["cost_score", "land_score", "policy_score", "queue_score", "emissions_score",
+                   "effective_price_variability_penalty_score"]].to_numpy() @ sample
+    expected = pd.Series(scores, index=full['node']).rank(method='min', ascending=False)
+    assert single['node'].tolist() == full['node'].head(10).tolist(), "Tracks the top 2 * top_n nodes"
+    assert (single['rank_best'] == single['rank_worst']).all()
+    assert single['rank_best'].tolist() == expected.loc[single['node']].astype(int).tolist()
+    print("  ✓ Passed: Sampled ranks match a direct ranking")
+    
+    print("\n23.3 Concentration controls stability...")
+    tight = rank_stability(**params, top_n=10, num_samples=500, concentration=1e10)
+    loose = rank_stability(**params, top_n=10, num_samples=500, concentration=5)
+    assert (tight['rank_p50'] == tight['rank_scenario']).all()
+    assert (loose['rank_p95'] - loose['rank_p5']).mean() > (tight['rank_p95'] - tight['rank_p5']).mean()
+    print("  ✓ Passed: Near-fixed weights reproduce ranks; looser weights spread them")
+    
+    print("\n23.4 Narrow rank histogram...")
+    ranks = np.random.default_rng(5).integers(1, 400, (8, 301))
+    narrow = RankAccumulator(8, 400, 25, width=16)
+    for start in range(0, 301, 64):
+        narrow.add(ranks[:, start:start + 64])
+    summary = narrow.summary()
+    assert narrow.counts.shape == (8, 16) and narrow.counts.dtype == np.int32
+    for q in (5, 50, 95):
+        assert np.allclose(narrow.percentile(q), np.percentile(ranks, q, axis=1))
+    assert np.allclose(summary['rank_std'], ranks.std(axis=1))
+    assert np.allclose(summary['top_n_probability'], (ranks <= 25).mean(axis=1))
+    assert (summary['rank_worst'] == ranks.max(axis=1)).all()
+    import node_ranking_engine
+    wide = rank_stability(**params, top_n=10, num_samples=300, concentration=5)
+    histogram_width = node_ranking_engine.RANK_HISTOGRAM_WIDTH
+    node_ranking_engine.RANK_HISTOGRAM_WIDTH = 4
+    try:
+        capped = rank_stability(**params, top_n=10, num_samples=300, concentration=5)
+    finally:
+        node_ranking_engine.RANK_HISTOGRAM_WIDTH = histogram_width
+    assert wide.equals(capped)
+    print("  ✓ Passed: Ranks beyond the histogram keep statistics exact")
+
+
+def test_data_uncertainty():
+    """Test Monte Carlo input-data uncertainty."""
+    print("\n" + "=" * 80)
+    print("TEST 24: Input-Data Uncertainty")
+    print("=" * 80)
+    
+    nodes_df = make_synthetic_nodes()
+    params = dict(nodes_df=nodes_df, load_type="data_center_flexible", load_size_mw=150,
+                  location_filter=None, emissions_preference=40, resource_config="battery")
+    
+    print("\n24.1 Streaming rank accumulator...")
+    ranks = np.random.default_rng(3).integers(1, 40, (6, 257))
+    accumulator = RankAccumulator(6, 40, 10)
+    accumulator.add(ranks[:, :100])
+    accumulator.add(ranks[:, 100:])
+    summary = accumulator.summary()
+    for q in (5, 50, 95):
+        assert np.allclose(accumulator.percentile(q), np.percentile(ranks, q, axis=1))
+    assert np.allclose(summary['rank_mean'], ranks.mean(axis=1))
+    assert np.allclose(summary['top_n_probability'], (ranks <= 10).mean(axis=1))
+    assert (summary['rank_best'] == ranks.min(axis=1)).all() and (summary['rank_worst'] == ranks.max(axis=1)).all()
+    print("  ✓ Passed: Histogram statistics match the raw samples")
+    
+    print("\n24.2 Zero noise reproduces the ranking...")
+    zero = {"avg_lmp": {"type": "normal", "sd": 0.0},
+            "avg_price_per_acre": {"type": "relative", "sd": 0.0},
+            "queue_pending_mw": {"type": "uniform", "width": 0.0}}
+    result = rank_data_uncertainty(**params, noise=zero, top_n=5, num_samples=20)
+    full = rank_nodes(**params, top_n=10)
+    assert result['node'].tolist() == full['node'].tolist()
+    assert np.allclose(result['score_scenario'], full['score_scenario'])
+    assert (result['rank_best'] == result['rank_worst']).all()
+    assert (result['rank_p50'] == result['rank_scenario']).all()
+    print("  ✓ Passed: Unperturbed samples rank as rank_nodes")
+    
+    print("\n24.3 Noise spreads ranks...")
+    small = rank_data_uncertainty(**params, noise={"avg_lmp": {"type": "relative", "sd": 0.01}},
+                                  top_n=10, num_samples=300)
+    large = rank_data_uncertainty(**params, noise={"avg_lmp": {"type": "relative", "sd": 0.5}},
+                                  top_n=10, num_samples=300)
+    again = rank_data_uncertainty(**params, noise={"avg_lmp": {"type": "relative", "sd": 0.5}},
+                                  top_n=10, num_samples=300)
+    assert large.equals(again), "Results are reproducible for a seed"
+    assert (large['rank_p95'] - large['rank_p5']).mean() > (small['rank_p95'] - small['rank_p5']).mean()
+    assert large['top_n_probability'].between(0, 1).all()
+    print("  ✓ Passed: Larger input noise widens rank intervals")
+    
+    print("\n24.4 Narrow rank histogram...")
+    import node_ranking_engine
+    histogram_width = node_ranking_engine.RANK_HISTOGRAM_WIDTH
+    node_ranking_engine.RANK_HISTOGRAM_WIDTH = 4
+    try:
+        capped = rank_data_uncertainty(**params, noise={"avg_lmp": {"type": "relative", "sd": 0.5}},
+                                       top_n=10, num_samples=300)
+    finally:
+        node_ranking_engine.RANK_HISTOGRAM_WIDTH = histogram_width
+    assert capped.equals(large), "Ranks beyond the histogram must not change the statistics"
+    assert (large['rank_worst'] > 4).any(), "Some ranks should fall beyond the narrow histogram"
+    print("  ✓ Passed: Same statistics with a 4-rank histogram")
+    
+    print("\n24.5 Invalid noise models...")
+    for noise in ({"county_emissions_intensity_kg_per_mwh": {"type": "normal", "sd": 1.0}},
+                  {"avg_lmp": {"type": "cauchy", "sd": 1.0}},
+                  {"avg_lmp": {"type": "uniform", "sd": 1.0}}):
+        try:
+            rank_data_uncertainty(**params, noise=noise, num_samples=5)
+            assert False, f"Should reject {noise}"
+        except ValueError:
+            pass
+    print("  ✓ Passed: Unsupported columns, types and parameters are rejected")
+
+
+def test_emissions_breakpoints():
+    """Test the emissions slider breakpoint index."""
+    print("\n" + "=" * 80)
+    print("TEST 25: Emissions Preference Breakpoints")
+    print("=" * 80)
+    
+    nodes_df = make_synthetic_nodes()
+    params = dict(nodes_df=nodes_df, load_type="commercial_campus", load_size_mw=80,
+                  location_filter=None, resource_config="solar_battery")
+    index = emissions_breakpoints(**params, top_n=8)
+    segments = index["segments"]
+    
+    print("\n25.1 Segments cover the slider...")
+    assert segments[0]["start"] == 0 and segments[-1]["end"] == 100
+    assert all(a["end"] == b["start"] for a, b in zip(segments, segments[1:]))
+    assert all(a["nodes"] != b["nodes"] for a, b in zip(segments, segments[1:]))
+    assert all(len(segment["nodes"]) == 8 for segment in segments)
+    print(f"  ✓ Passed: {len(segments)} contiguous segments, each a different top 8")
+    
+    print("\n25.2 Lookups match rank_nodes...")
+    preferences = [0, 80, 80.5, 100] + [(seg["start"] + seg["end"]) / 2 for seg in segments]
+    for preference in preferences:
+        expected = rank_nodes(**params, emissions_preference=preference, top_n=8)['node'].tolist()
+        assert top_nodes_at(index, preference) == expected, f"Top 8 differs at {preference}"
+    print(f"  ✓ Passed: Top 8 matches at {len(preferences)} slider positions")
+    
+    print("\n25.3 Small top_n and no matches...")
+    single = emissions_breakpoints(**params, top_n=1)
+    assert len(single["segments"]) <= len(segments)
+    empty = emissions_breakpoints(**dict(params, location_filter={"states": ["ZZ"]}), top_n=8)
+    assert empty["segments"] == [] and top_nodes_at(empty, 50) == []
+    print("  ✓ Passed: Edge cases handled")
+
+
+def test_custom_weights():
+    """Test custom-weight top-N from the component index."""
+    print("\n" + "=" * 80)
+    print("TEST 26: Custom Weights (Threshold Algorithm)")
+    print("=" * 80)
+    
+    nodes_df = make_synthetic_nodes()
+    
+    print("\n26.1 Weight validation...")
+    weights = validate_custom_weights({"cost": 2, "emissions": 1, "queue": 1})
+    assert abs(sum(weights.values()) - 1.0) < 1e-12 and weights["cost"] == 0.5 and weights["land"] == 0
+    for invalid in ({"cost": -1}, {"speed": 1}, {"cost": 0}, {"cost": "high"}, {}):
+        try:
+            validate_custom_weights(invalid)
+            assert False, f"Should reject {invalid}"
+        except ValueError:
+            pass
+    print("  ✓ Passed: Weights normalized, invalid weights rejected")
+    
+    print("\n26.2 Index top-N matches rank_nodes...")
+    index = build_component_index(nodes_df, "h2_electrolyzer_firm", None, "firm_gen")
+    computed = compute_final_weights("h2_electrolyzer_firm", 400, 60)
+    expected = rank_nodes(nodes_df, "h2_electrolyzer_firm", 400, None, 60, "firm_gen", top_n=50)
+    result = index.top_n(computed, 50)
+    assert result['node'].tolist() == expected['node'].tolist()
+    for column in ("score_scenario", "score_baseline", "rank_scenario"):
+        assert np.array_equal(result[column].to_numpy(), expected[column].to_numpy()), column
+    assert 'rank_baseline' not in result.columns
+    print("  ✓ Passed: Same nodes, scores and ranks as a full ranking")
+    
+    print("\n26.3 Early termination past the clipped tied heads...")
+    index = build_component_index(make_synthetic_nodes(20000), "data_center_always_on", None, "solar_battery")
+    n = len(index)
+    assert (index.tied_head >= 0.04 * n).all(), "robust_min_max clips the top ~5% of each component to 1.0"
+    for custom in ({"cost": 1}, {"cost": 2, "queue": 1}, {"land": 1, "policy": 1}):
+        custom = validate_custom_weights(custom)
+        scores = weighted_sum(index.scores, weights_to_matrix([custom]))[:, 0]
+        for top_n in (20, 100):
+            stats = {}
+            top = index.top_n(custom, top_n, stats=stats)
+            assert top.index.tolist() == index.components_df.index[np.argsort(-scores, kind='stable')[:top_n]].tolist()
+            assert np.array_equal(top['score_scenario'].to_numpy(), np.sort(scores)[::-1][:top_n])
+            assert stats["row_counts"]["threshold_algorithm"] < n / 4, (custom, top_n, stats["row_counts"])
+    print(f"  ✓ Passed: Exact top N after scoring {stats['row_counts']['threshold_algorithm']} of {n} nodes "
+          f"(tied heads of {index.tied_head.min()}-{index.tied_head.max()})")
+
+
+def test_pareto_frontier():
+    """Test the Pareto frontier (skyline) computation."""
+    print("\n" + "=" * 80)
+    print("TEST 27: Pareto Frontier")
+    print("=" * 80)
+    
+    def brute_force(values, k):
+        at_least = (values[None, :, :] >= values[:, None, :]).sum(axis=2) >= k
+        better = (values[None, :, :] > values[:, None, :]).any(axis=2)
+        return ~(at_least & better).any(axis=1)
+    
+    print("\n27.1 Skyline and k-dominance match brute force...")
+    rng = np.random.default_rng(9)
+    values = np.clip(rng.normal(0.5, 0.3, (1500, 6)), 0, 1).round(2)  # Many ties and clipped scores
+    skyline = skyline_mask(values)
+    assert np.array_equal(skyline, brute_force(values, 6))
+    for k in (4, 5):
+        assert np.array_equal(k_dominant_mask(values, k, skyline=skyline), brute_force(values, k))
+    print(f"  ✓ Passed: {skyline.sum()} skyline rows, identical to pairwise checks")
+    
+    print("\n27.2 Frontier of the ranked nodes...")
+    nodes_df = make_synthetic_nodes()
+    frontier = pareto_frontier(nodes_df, "industrial_flexible", {"states": ["CA", "TX"]}, "solar")
+    ranked = rank_nodes(nodes_df, "industrial_flexible", 100, {"states": ["CA", "TX"]}, 50, "solar", top_n=None)
+    scores = ranked[SCENARIO_SCORE_COLUMNS].to_numpy()
+    expected = set(ranked['node'][brute_force(scores, 6)])
+    assert set(frontier['node']) == expected
+    sums = frontier[SCENARIO_SCORE_COLUMNS].to_numpy().sum(axis=1)
+    assert (np.diff(sums) <= 1e-12).all(), "Ordered by component sum"
+    assert ranked['node'].iloc[0] in expected, "The top weighted node is never dominated"
+    print(f"  ✓ Passed: {len(frontier)} frontier nodes of {len(ranked)}")
+    
+    print("\n27.3 k-dominance relaxation...")
+    relaxed = pareto_frontier(nodes_df, "industrial_flexible", {"states": ["CA", "TX"]}, "solar", k=5)
+    assert set(relaxed['node']) <= set(frontier['node'])
+    try:
+        pareto_frontier(nodes_df, "industrial_flexible", None, "solar", k=7)
+        assert False, "Should reject k=7"
+    except ValueError:
+        pass
+    print(f"  ✓ Passed: 5-dominant frontier has {len(relaxed)} nodes")
+    
+    print("\n27.4 Frontier from a component index...")
+    index = build_component_index(nodes_df, "industrial_flexible", {"states": ["CA", "TX"]}, "solar")
+    assert index.frontier()['node'].tolist() == frontier['node'].tolist()
+    assert index.frontier(k=5)['node'].tolist() == relaxed['node'].tolist()
+    assert index.frontier()['node'].tolist() == frontier['node'].tolist(), "The kept skyline is reused"
+    api_server, client = make_api_client()
+    api_server.COMPONENT_INDEX_CACHE.clear()
+    hits = api_server.COMPONENT_INDEX_CACHE.stats["hits"]
+    body = {"load_type": "industrial_flexible", "resource_config": "solar",
+            "location_filter": {"states": ["CA", "TX"]}}
+    responses = [client.post("/api/rank/pareto", json=dict(body, k=k)).get_json() for k in (None, 5, None)]
+    assert [r["frontier_size"] for r in responses] == [len(frontier), len(relaxed), len(frontier)]
+    assert [r["node"] for r in responses[0]["results"]] == frontier['node'].tolist()
+    assert len(api_server.COMPONENT_INDEX_CACHE) == 1, "All k share one component index"
+    assert api_server.COMPONENT_INDEX_CACHE.stats["hits"] == hits + 2
+    assert client.post("/api/rank/pareto", json=dict(body, k=9)).status_code == 400
+    print("  ✓ Passed: Same frontier, one component index for every k")
+
+
+def test_explanations():
+    """Test vectorized ranking explanations."""
+    print("\n" + "=" * 80)
+    print("TEST 28: Ranking Explanations")
+    print("=" * 80)
+    
+    nodes_df = make_synthetic_nodes()
+    weights = compute_final_weights("data_center_always_on", 250, 80)
+    ranked = rank_nodes(nodes_df, "data_center_always_on", 250, None, 80, "solar_battery", top_n=None)
+    explained = explain_rankings(ranked, weights)
+    
+    print("\n28.1 Contributions sum to the scenario score...")
+    contributions = explained[[c for c in explained.columns if c.endswith("_contribution")]]
+    assert contributions.shape == (len(ranked), 6)
+    assert np.allclose(contributions.sum(axis=1), ranked['score_scenario'], atol=1e-12)
+    print(f"  ✓ Passed: {len(ranked)} rows x 6 contributions")
+    
+    print("\n28.2 Matches the per-row explanation...")
+    for (_, row), (_, ex) in zip(ranked.iterrows(), explained.iterrows()):
+        assert get_ranking_explanation(row, weights) == ex['explanation']
+        values = [ex[f"{f}_contribution"] for f in ex['top_factors']]
+        assert len(values) <= 3 and all(v > 0.1 for v in values)
+        assert values == sorted(values, reverse=True), "Largest factor first"
+    print(f"  ✓ Passed: e.g. '{explained['explanation'].iloc[0]}'")
+
+
 def run_all_tests():
     """Run complete test suite."""
     print("\n")
@@ -314,6 +1669,28 @@ def run_all_tests():
         ("Data Validation", test_data_validation),
         ("Full Ranking Workflow", test_full_ranking),
         ("Score Properties", test_score_properties),
+        ("Request Coalescing", test_single_flight),
+        ("ASGI Server", test_asgi_server),
+        ("Batch Ranking", test_batch_ranking),
+        ("Streaming Responses", test_streaming_responses),
+        ("Admin Endpoints", test_admin_endpoints),
+        ("Node Store Patching", test_node_store_patch),
+        ("Server Metrics", test_server_metrics),
+        ("Request Profiling", test_request_profiling),
+        ("Slow Query Log", test_slow_query_log),
+        ("Startup Warm-up", test_startup_warmup),
+        ("Disk Result Cache", test_disk_result_cache),
+        ("Sweep Jobs", test_sweep_jobs),
+        ("Deadlines and Cancellation", test_cancellation),
+        ("Admission Control", test_admission_control),
+        ("Resource Config Comparison", test_scenario_comparison),
+        ("Rank Movement Analytics", test_rank_movement_analytics),
+        ("Weight-Uncertainty Rank Stability", test_rank_stability),
+        ("Input-Data Uncertainty", test_data_uncertainty),
+        ("Emissions Preference Breakpoints", test_emissions_breakpoints),
+        ("Custom Weights", test_custom_weights),
+        ("Pareto Frontier", test_pareto_frontier),
+        ("Ranking Explanations", test_explanations),
     ]
     
     passed = 0
@@ -0,0 +1,31 @@
+"""
+Production WSGI Entry Point for Node Ranking Engine API
+
+Loads the node dataset once in the parent process and freezes it out of the
+garbage collector's tracked generations before workers are forked. Forked
+workers then share the node arrays copy-on-write instead of each loading its
+own copy of NODES_DF. Warm-up rankings (WARMUP_ENABLED) are computed here
+too, so every worker starts with a warm ranking cache and reports ready.
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Must be served with preloading enabled (preload_app = True in
+gunicorn.conf.py) so this module is imported in the parent before forking.
+"""
+
+import gc
+
+from api_server import app, load_data, get_store, run_warmup, WARMUP_ENABLED
+
+
+# Load data in the parent process before workers fork
+load_data()
+if WARMUP_ENABLED:
+    run_warmup(get_store())
+
+# Move everything allocated so far into the permanent generation. Without this,
+# the cyclic GC in each worker walks (and writes refcount/GC headers of) the
+# shared objects, which dirties their pages and defeats copy-on-write sharing.
+gc.collect()
+gc.freeze()